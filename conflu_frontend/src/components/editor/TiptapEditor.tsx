@@ -45,9 +45,10 @@ interface TiptapEditorProps {
   onChange: (newContentJson: string, newContentHtml: string) => void;
   onTitleChange?: (newTitle: string) => void; // Optional: if title is managed on the same page
   pageTitle?: string; // Optional: if title is managed on the same page
+  pageId?: number; // Page being edited; fallback macro placeholders load their details per page
 }
 
-const TiptapEditor: React.FC<TiptapEditorProps> = ({ content, onChange, pageTitle, onTitleChange }) => {
+const TiptapEditor: React.FC<TiptapEditorProps> = ({ content, onChange, pageTitle, onTitleChange, pageId }) => {
   let initialContent: any = content;
   try {
     // Attempt to parse if it's a JSON string, otherwise use as is (HTML string)
@@ -120,7 +121,7 @@ const TiptapEditor: React.FC<TiptapEditorProps> = ({ content, onChange, pageTitl
       CodeBlockLowlight.configure({
         lowlight,
       }),
-      FallbackMacroPlaceholderExtension,
+      FallbackMacroPlaceholderExtension.configure({ pageId: pageId ?? null }),
       MermaidDiagramExtension,
       DrawioDiagramExtension, // Add the Drawio extension
     ],
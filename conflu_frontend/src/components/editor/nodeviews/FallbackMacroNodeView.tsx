@@ -1,26 +1,50 @@
 import React, { useState, useEffect } from 'react'; // Added useEffect
 import { NodeViewWrapper, NodeViewProps } from '@tiptap/react';
-import { getFallbackMacroDetails } from '../../../services/api';
-import { FallbackMacro } from '../../../types/apiModels'; // Ensure FallbackMacro type is defined
+import { getFallbackMacroDetails, getFallbackMacrosForPage } from '../../../services/api';
+import { FallbackMacro, FallbackMacroBatch } from '../../../types/apiModels'; // Ensure FallbackMacro type is defined
 import styles from './FallbackMacroNodeView.module.css';
 
-const FallbackMacroNodeView: React.FC<NodeViewProps> = ({ node, editor, getPos }) => {
-  const { macroName, fallbackMacroId } = node.attrs;
+// One request per page, shared by all of its placeholders (keyed by placeholder_id_in_content).
+const pageMacroRequests = new Map<number, Promise<FallbackMacroBatch>>();
+
+const loadPageMacros = (pageId: number): Promise<FallbackMacroBatch> => {
+  let request = pageMacroRequests.get(pageId);
+  if (!request) {
+    request = getFallbackMacrosForPage(pageId);
+    request.catch(() => pageMacroRequests.delete(pageId)); // Let a later click retry
+    pageMacroRequests.set(pageId, request);
+  }
+  return request;
+};
+
+const FallbackMacroNodeView: React.FC<NodeViewProps> = ({ node, editor, getPos, extension }) => {
+  const { macroName, fallbackMacroId, placeholderId } = node.attrs;
+  const pageId: number | null = extension.options.pageId;
+  const canLoad = (placeholderId && pageId != null) || fallbackMacroId != null;
   const [details, setDetails] = useState<FallbackMacro | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [showDetails, setShowDetails] = useState(false);
 
   const fetchDetails = async () => {
-    if (!fallbackMacroId) {
+    if (!canLoad) {
       setError('No Fallback ID available.');
       return;
     }
     setIsLoading(true);
     setError(null);
     try {
-      const data = await getFallbackMacroDetails(fallbackMacroId);
-      setDetails(data);
+      if (placeholderId && pageId != null) {
+        const batch = await loadPageMacros(pageId);
+        const macro = batch.macros[placeholderId];
+        if (!macro) {
+          setError('Macro not found for this page.');
+          return;
+        }
+        setDetails(macro);
+      } else {
+        setDetails(await getFallbackMacroDetails(fallbackMacroId));
+      }
     } catch (err) {
       setError('Failed to fetch details.');
       console.error(err);
@@ -33,7 +57,7 @@ const FallbackMacroNodeView: React.FC<NodeViewProps> = ({ node, editor, getPos }
     event.preventDefault(); // Prevent editor focus issues or other default behaviors
     const newShowDetails = !showDetails;
     setShowDetails(newShowDetails);
-    if (newShowDetails && !details && fallbackMacroId) {
+    if (newShowDetails && !details && canLoad) {
       fetchDetails();
     }
   };
@@ -57,13 +81,13 @@ const FallbackMacroNodeView: React.FC<NodeViewProps> = ({ node, editor, getPos }
     >
       <div className={styles.header} contentEditable={false}> {/* contentEditable false for UI elements */}
         <strong>Unsupported Macro: {macroName}</strong>
-        {fallbackMacroId != null && ( // Check for null or undefined explicitly
+        {canLoad && (
           <button onClick={handleToggleDetails} className={styles.toggleButton}>
-            {showDetails ? 'Hide' : 'Show'} Details (ID: {fallbackMacroId})
+            {showDetails ? 'Hide' : 'Show'} Details{fallbackMacroId != null ? ` (ID: ${fallbackMacroId})` : ''}
           </button>
         )}
       </div>
-      {showDetails && fallbackMacroId != null && (
+      {showDetails && canLoad && (
         <div className={styles.details} contentEditable={false}>
           {isLoading && <p>Loading details...</p>}
           {error && <p className={styles.error}>{error}</p>}
@@ -4,6 +4,7 @@ import FallbackMacroNodeView from '../../components/editor/nodeviews/FallbackMac
 
 export interface FallbackMacroPlaceholderOptions {
   HTMLAttributes: Record<string, any>;
+  pageId: number | null; // Page whose fallback macros the node views look up by placeholderId
 }
 
 declare module '@tiptap/core' {
@@ -12,7 +13,7 @@ declare module '@tiptap/core' {
       /**
        * Add a fallbackMacroPlaceholder node
        */
-      setFallbackMacroPlaceholder: (attributes: { macroName: string; fallbackMacroId: number }) => ReturnType;
+      setFallbackMacroPlaceholder: (attributes: { macroName: string; fallbackMacroId?: number | null; placeholderId?: string | null }) => ReturnType;
     };
   }
 }
@@ -26,6 +27,7 @@ export default Node.create<FallbackMacroPlaceholderOptions>({
   addOptions() {
     return {
       HTMLAttributes: {},
+      pageId: null,
     };
   },
 
@@ -44,6 +46,12 @@ export default Node.create<FallbackMacroPlaceholderOptions>({
         },
         renderHTML: attributes => ({ 'data-fallback-id': attributes.fallbackMacroId }),
       },
+      // UUID written by the importer; matches FallbackMacro.placeholder_id_in_content
+      placeholderId: {
+        default: null,
+        parseHTML: element => element.getAttribute('data-placeholder-id'),
+        renderHTML: attributes => (attributes.placeholderId ? { 'data-placeholder-id': attributes.placeholderId } : {}),
+      },
     };
   },
 
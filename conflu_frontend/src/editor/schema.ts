@@ -185,6 +185,7 @@ export const appSchema = new Schema({
       attrs: {
         macroName: { default: 'Unknown Macro' },
         fallbackMacroId: { default: null },
+        placeholderId: { default: null },
       },
       draggable: true,
       toDOM: node => [
@@ -193,6 +194,7 @@ export const appSchema = new Schema({
           'data-type': 'fallback-macro-placeholder',
           'data-macro-name': node.attrs.macroName,
           'data-fallback-id': String(node.attrs.fallbackMacroId),
+          'data-placeholder-id': node.attrs.placeholderId ?? '',
           class: 'fallback-macro-node ProseMirror-widget',
         },
         `[Unsupported Macro: ${node.attrs.macroName}]`
@@ -205,6 +207,7 @@ export const appSchema = new Schema({
             return {
               macroName: element.getAttribute('data-macro-name') || 'Unknown Macro',
               fallbackMacroId: parseInt(element.getAttribute('data-fallback-id') || '0', 10) || null,
+              placeholderId: element.getAttribute('data-placeholder-id') || null,
             };
           },
         },
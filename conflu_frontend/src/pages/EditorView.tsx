@@ -334,6 +334,7 @@ const EditorView: React.FC = () => {
         <TiptapEditor
           content={editorContentJson}
           onChange={handleEditorChange}
+          pageId={pageId ? Number(pageId) : undefined}
           // pageTitle={pageTitle}
           // onTitleChange={setPageTitle} // TiptapEditor no longer manages title directly
         />
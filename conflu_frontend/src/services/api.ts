@@ -176,6 +176,12 @@ export const getFallbackMacroDetails = async (macroId: number): Promise<ApiModel
   return response.data;
 };
 
+// All fallback macros referenced by a page's content in one request, keyed by placeholder ID.
+export const getFallbackMacrosForPage = async (pageId: number): Promise<ApiModels.FallbackMacroBatch> => {
+  const response = await apiClient.get<ApiModels.FallbackMacroBatch>('/io/fallback-macros/', { params: { page: pageId } });
+  return response.data;
+};
+
 // Diagram Validation API
 export const validateMermaidSyntax = async (syntax: string): Promise<ApiModels.MermaidValidationResponse> => {
   const payload: ApiModels.MermaidValidationRequest = { syntax };
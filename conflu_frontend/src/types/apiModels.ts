@@ -94,6 +94,13 @@ export interface FallbackMacro {
   page_title?: string | null;
 }
 
+// Response of GET /io/fallback-macros/?page=<id> (or ?page_version=<id>)
+export interface FallbackMacroBatch {
+  page: number;
+  page_version: number | null;
+  macros: Record<string, FallbackMacro>; // Keyed by placeholder_id_in_content
+}
+
 // --- Diagram Validation Types ---
 export interface MermaidValidationRequest {
   syntax: string;
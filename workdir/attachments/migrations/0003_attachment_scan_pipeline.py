@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0002_alter_attachment_file'),
+        ('pages', '0009_page_render'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='scan_priority',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='attachment',
+            index=models.Index(fields=['scan_status', '-scan_priority', 'created_at'], name='attachment_scan_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0003_attachment_scan_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
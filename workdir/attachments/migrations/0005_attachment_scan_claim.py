@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0004_attachment_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='scan_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='attachment',
+            name='scan_status',
+            field=models.CharField(choices=[('pending', 'Pending Scan'), ('scanning', 'Scanning'), ('clean', 'Scan Clean'), ('infected', 'Scan Infected'), ('error', 'Scan Error'), ('skipped', 'Scan Skipped')], db_index=True, default='pending', max_length=20),
+        ),
+    ]
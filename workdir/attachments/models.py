@@ -2,15 +2,24 @@ from django.db import models
 from django.conf import settings
 from pages.models import Page
 class Attachment(models.Model):
-    SCAN_STATUS_CHOICES = [('pending', 'Pending Scan'), ('clean', 'Scan Clean'), ('infected', 'Scan Infected'), ('error', 'Scan Error'), ('skipped', 'Scan Skipped')]
+    SCAN_STATUS_CHOICES = [('pending', 'Pending Scan'), ('scanning', 'Scanning'), ('clean', 'Scan Clean'), ('infected', 'Scan Infected'), ('error', 'Scan Error'), ('skipped', 'Scan Skipped')]
+    # Higher values are scanned first (attachments.tasks.scan_pending_attachments).
+    SCAN_PRIORITY_BULK = 0
+    SCAN_PRIORITY_INTERACTIVE = 10
     page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name='attachments')
     uploader = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='uploaded_attachments')
     file_name = models.CharField(max_length=255)
     file = models.FileField(upload_to='attachments/%Y/%m/%d/')
     mime_type = models.CharField(max_length=100)
     size_bytes = models.BigIntegerField()
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True) # Hex SHA-256; '' until hashed
     scan_status = models.CharField(max_length=20, choices=SCAN_STATUS_CHOICES, default='pending', db_index=True)
+    scan_priority = models.PositiveSmallIntegerField(default=SCAN_PRIORITY_BULK)
     scanned_at = models.DateTimeField(null=True, blank=True)
+    scan_claimed_at = models.DateTimeField(null=True, blank=True) # Set with scan_status='scanning' by the worker scanning the file
+    derivatives = models.JSONField(default=dict, blank=True) # Resized image copies (core.image_derivatives)
     created_at = models.DateTimeField(auto_now_add=True)
     def __str__(self): return self.file_name
-    class Meta: ordering = ['-created_at']; verbose_name = "Attachment"; verbose_name_plural = "Attachments"
+    class Meta:
+        ordering = ['-created_at']; verbose_name = "Attachment"; verbose_name_plural = "Attachments"
+        indexes = [models.Index(fields=['scan_status', '-scan_priority', 'created_at'], name='attachment_scan_queue_idx')]
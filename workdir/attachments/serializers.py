@@ -1,24 +1,27 @@
+from django.urls import reverse
 from rest_framework import serializers
 from .models import Attachment
+from .scanning import hash_file
 from pages.models import Page
 
 class AttachmentSerializer(serializers.ModelSerializer):
     uploader_username = serializers.ReadOnlyField(source='uploader.username')
     file_url = serializers.SerializerMethodField()
+    thumbnail_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = Attachment
         fields = [
             'id', 'page', 'uploader', 'uploader_username',
             'file_name', 'file', 'file_url', 'mime_type', 'size_bytes',
-            'scan_status', 'scanned_at', 'created_at'
+            'scan_status', 'scanned_at', 'created_at', 'thumbnail_urls'
         ]
         read_only_fields = [
             'uploader', 'uploader_username',
             'mime_type', 'size_bytes',
             'scan_status', 'scanned_at',
             'created_at',
-            'file_url'
+            'file_url', 'thumbnail_urls'
         ]
         extra_kwargs = {
             'file': {'write_only': True, 'required': True},
@@ -32,9 +35,22 @@ class AttachmentSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.file.url)
         return None
 
+    def get_thumbnail_urls(self, obj):
+        """Width -> download URL of each resized derivative; the 'v' token makes them cacheable forever."""
+        derivatives = obj.derivatives or {}
+        request = self.context.get('request')
+        urls = {}
+        for key, entry in derivatives.get('widths', {}).items():
+            url = f"{reverse('attachment-download', kwargs={'pk': obj.pk})}?w={entry['width']}&v={derivatives['version']}"
+            urls[key] = request.build_absolute_uri(url) if request else url
+        return urls
+
     def create(self, validated_data):
         uploaded_file = validated_data.get('file')
         if uploaded_file:
             validated_data['mime_type'] = uploaded_file.content_type if uploaded_file.content_type else 'application/octet-stream'
             validated_data['size_bytes'] = uploaded_file.size
+            # Hashed while the upload is still local, so the scanner can skip content it has already seen.
+            validated_data['content_hash'] = hash_file(uploaded_file)
+            uploaded_file.seek(0)
         return super().create(validated_data)
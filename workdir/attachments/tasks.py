@@ -1,36 +1,153 @@
+from datetime import timedelta
 
 from celery import shared_task
-from django.utils import timezone
 from django.apps import apps
-import time
-import random
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.image_derivatives import build_for_queryset, is_supported as is_derivative_source
+from .scanning import ScanResult, get_scanner, hash_file
+
+# Set while a scan_pending_attachments run is queued, so a burst of uploads dispatches one task, not one each.
+SCAN_SCHEDULED_KEY = 'attachments:scan-scheduled'
+
+
+def schedule_scan():
+    """Queues a batch scan of pending attachments unless one is already queued."""
+    if cache.add(SCAN_SCHEDULED_KEY, True, timeout=settings.CC_ATTACHMENT_SCAN_SCHEDULE_TIMEOUT):
+        scan_pending_attachments.delay()
+
+
+def _known_verdicts(Attachment, hashes, exclude_pks):
+    """content_hash -> verdict of files already scanned; 'infected' wins if verdicts disagree."""
+    verdicts = {}
+    rows = Attachment.objects.filter(
+        content_hash__in=hashes, scan_status__in=('clean', 'infected')
+    ).exclude(pk__in=exclude_pks).values_list('content_hash', 'scan_status').distinct()
+    for content_hash, scan_status in rows:
+        if verdicts.get(content_hash) != 'infected':
+            verdicts[content_hash] = scan_status
+    return verdicts
+
+
+def _claim_batch(queryset, batch_size):
+    """
+    Marks up to `batch_size` scannable attachments of `queryset` as 'scanning' (interactive
+    uploads first) and commits, so the rows are not locked while their files are read.
+    Rows locked by a concurrent claim are skipped; claims older than
+    CC_ATTACHMENT_SCAN_CLAIM_TIMEOUT (a worker that died mid-scan) are taken over.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.CC_ATTACHMENT_SCAN_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        batch = list(
+            queryset.filter(Q(scan_status='pending') | Q(scan_status='scanning', scan_claimed_at__lt=stale_before))
+            .select_for_update(skip_locked=True)
+            .order_by('-scan_priority', 'created_at')[:batch_size]
+        )
+        if batch:
+            queryset.model.objects.filter(pk__in=[a.pk for a in batch]).update(scan_status='scanning', scan_claimed_at=now)
+    for attachment in batch:
+        attachment.scan_status, attachment.scan_claimed_at = 'scanning', now
+    return batch
+
+
+def _scan_batch(queryset, batch_size):
+    """
+    Claims up to `batch_size` pending attachments from `queryset`, hashes and scans the ones
+    whose content has not been scanned before outside any transaction, then writes all
+    verdicts with a single bulk_update. Returns the number claimed.
+    """
+    Attachment = apps.get_model('attachments', 'Attachment')
+    batch = _claim_batch(queryset, batch_size)
+    if not batch:
+        return 0
+
+    verdicts_by_pk = {}
+    for attachment in batch:
+        if not attachment.content_hash: # Rows created before hashing on upload, or outside the API
+            try:
+                with attachment.file.open('rb') as fh:
+                    attachment.content_hash = hash_file(fh)
+            except Exception as e:
+                print(f"[Celery Task] Could not read attachment {attachment.pk} for hashing: {e}")
+                verdicts_by_pk[attachment.pk] = 'error'
+
+    hashes = {a.content_hash for a in batch if a.content_hash}
+    verdicts = _known_verdicts(Attachment, hashes, [a.pk for a in batch])
+    scanner = get_scanner()
+    scanned = 0
+    for attachment in batch:
+        if attachment.pk in verdicts_by_pk:
+            continue
+        verdict = verdicts.get(attachment.content_hash)
+        if verdict is None:
+            try:
+                with attachment.file.open('rb') as fh:
+                    result = scanner.scan(fh)
+            except Exception as e:
+                result = ScanResult('error', str(e))
+            scanned += 1
+            verdict = result.verdict
+            if verdict in ('clean', 'infected'): # Later duplicates in this batch reuse it
+                verdicts[attachment.content_hash] = verdict
+            if verdict != 'clean':
+                print(f"[Celery Task] Attachment {attachment.pk} scan verdict '{verdict}': {result.detail}")
+        verdicts_by_pk[attachment.pk] = verdict
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Rows whose claim was taken over meanwhile (this run outlived the claim timeout) are left to the new owner.
+        owned = set(Attachment.objects.select_for_update().filter(
+            pk__in=[a.pk for a in batch], scan_status='scanning', scan_claimed_at=batch[0].scan_claimed_at,
+        ).values_list('pk', flat=True))
+        finished = [a for a in batch if a.pk in owned]
+        for attachment in finished:
+            attachment.scan_status, attachment.scanned_at, attachment.scan_claimed_at = verdicts_by_pk[attachment.pk], now, None
+        Attachment.objects.bulk_update(finished, ['content_hash', 'scan_status', 'scanned_at', 'scan_claimed_at'])
+        # Only files that scanned clean are handed to the image decoder.
+        image_ids = [a.pk for a in finished if a.scan_status == 'clean' and is_derivative_source(a.mime_type) and not a.derivatives]
+        if image_ids:
+            transaction.on_commit(lambda: generate_attachment_derivatives.delay(image_ids))
+    print(f"[Celery Task] Scan batch: {len(batch)} attachments, {scanned} scanned, {len(batch) - scanned} deduplicated/failed.")
+    return len(batch)
+
+
+@shared_task(bind=True)
+def scan_pending_attachments(self, batch_size=None, max_batches=None):
+    """
+    Scans pending attachments batch by batch. After `max_batches` the task re-queues itself
+    instead of looping on, so a large import backlog does not monopolise a worker.
+    """
+    Attachment = apps.get_model('attachments', 'Attachment')
+    cache.delete(SCAN_SCHEDULED_KEY) # Uploads arriving from now on queue a follow-up run
+    batch_size = batch_size or settings.CC_ATTACHMENT_SCAN_BATCH_SIZE
+    total = 0
+    for _ in range(max_batches or settings.CC_ATTACHMENT_SCAN_MAX_BATCHES):
+        claimed = _scan_batch(Attachment.objects.all(), batch_size)
+        if not claimed:
+            break
+        total += claimed
+    else:
+        schedule_scan()
+    return f"Processed {total} pending attachments."
+
 
-# Barebones Celery task for virus scanning.
-# Actual logic and error handling will be fleshed out later.
 @shared_task(bind=True)
 def scan_attachment_file(self, attachment_pk):
-    print(f"[Celery Task] scan_attachment_file (barebones) called for pk: {attachment_pk}")
+    """Scans a single attachment now (e.g. a manual re-scan); regular uploads go through scan_pending_attachments."""
+    Attachment = apps.get_model('attachments', 'Attachment')
+    if not _scan_batch(Attachment.objects.filter(pk=attachment_pk), 1):
+        return f"Attachment {attachment_pk} not found or not pending."
+    return f"Attachment {attachment_pk} scanned. Status: {Attachment.objects.values_list('scan_status', flat=True).get(pk=attachment_pk)}"
+
+
+@shared_task(bind=True)
+def generate_attachment_derivatives(self, attachment_ids):
+    """Generates resized derivatives (core.image_derivatives) for clean image attachments."""
     Attachment = apps.get_model('attachments', 'Attachment')
-    try:
-        attachment = Attachment.objects.get(pk=attachment_pk)
-        # Simulate scan
-        time.sleep(1) # Minimal sleep
-        simulated_outcome = random.choice(['clean', 'error'])
-        attachment.scan_status = simulated_outcome
-        attachment.scanned_at = timezone.now()
-        attachment.save(update_fields=['scan_status', 'scanned_at'])
-        print(f"[Celery Task] Attachment {attachment_pk} (barebones) processed. Status: {simulated_outcome}")
-        return f"Attachment {attachment_pk} scan attempted (barebones). Status: {simulated_outcome}"
-    except Attachment.DoesNotExist:
-        print(f"[Celery Task] Attachment {attachment_pk} (barebones) not found.")
-        return f"Attachment {attachment_pk} not found (barebones)."
-    except Exception as e:
-        print(f"[Celery Task] Error (barebones) scanning attachment {attachment_pk}: {e}")
-        try:
-            attachment_for_error = Attachment.objects.get(pk=attachment_pk)
-            attachment_for_error.scan_status = 'error'
-            attachment_for_error.scanned_at = timezone.now()
-            attachment_for_error.save(update_fields=['scan_status', 'scanned_at'])
-        except Exception:
-            pass
-        return f"Error scanning attachment {attachment_pk} (barebones)."
+    updated = build_for_queryset(Attachment.objects.filter(pk__in=attachment_ids, scan_status='clean'))
+    return f"Generated derivatives for {len(updated)} of {len(attachment_ids)} attachments."
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
@@ -45,6 +46,7 @@ class AttachmentAPIPermissionTests(APITestCase):
         assign_perm('pages.view_page', cls.other_user, cls.page) # Object perm for page
 
     def setUp(self):
+        cache.clear() # Cached permission sets would outlive the previous test's rollback
         self.client_uploader = APIClient()
         self.client_uploader.force_authenticate(user=self.uploader)
 
@@ -110,3 +112,237 @@ class AttachmentAPIPermissionTests(APITestCase):
         # DjangoObjectPermissions.has_object_permission raises Http404 in this case for SAFE_METHODS
         response = self.anon_client.get(self.attachment1_download_url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND) # Changed from 403 to 404
+
+
+class AttachmentDownloadServingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='range_user', password='password123')
+        cls.space = Space.objects.create(key='RANGESPACE', name='Range Space', owner=cls.user)
+        cls.page = Page.objects.create(space=cls.space, title='Range Page', content_json={'type': 'doc'}, author=cls.user)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.content = bytes(range(256)) * 4 # 1024 bytes
+        self.attachment = Attachment.objects.create(
+            page=self.page, uploader=self.user, file_name='data.bin', mime_type='application/octet-stream',
+            size_bytes=len(self.content), file=SimpleUploadedFile('data.bin', self.content), scan_status='clean',
+        )
+        assign_perm('attachments.view_attachment', self.user, self.attachment)
+        self.url = reverse('attachment-download', kwargs={'pk': self.attachment.pk})
+
+    def tearDown(self):
+        self.attachment.file.delete(save=False)
+
+    def test_full_download_advertises_ranges(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_range_request_returns_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-24')
+        self.assertEqual(b''.join(suffix.streaming_content), self.content[-24:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_range_on_empty_file_is_unsatisfiable(self):
+        from core.file_serving import parse_range
+        self.assertEqual(parse_range('bytes=-5', 0), 'unsatisfiable')
+        self.assertEqual(parse_range('bytes=0-', 0), 'unsatisfiable')
+        self.assertEqual(parse_range('bytes=-5', 3), (0, 2))
+
+    def test_header_modes_fall_back_to_streaming_off_local_storage(self):
+        from unittest import mock
+        from django.test import override_settings
+        from core import file_serving
+        with override_settings(CC_ATTACHMENT_SERVE_MODE='x-sendfile'), mock.patch.object(file_serving, '_is_local', return_value=False):
+            response = self.client.get(self.url)
+            self.assertFalse(response.has_header('X-Sendfile'))
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+            self.assertEqual([warning.id for warning in file_serving.check_serve_mode(None)], ['core.W001'])
+
+    def test_x_accel_redirect_mode_still_checks_scan_status(self):
+        from django.test import override_settings
+        with override_settings(CC_ATTACHMENT_SERVE_MODE='x-accel-redirect', CC_ATTACHMENT_ACCEL_PREFIX='/protected-media/'):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.attachment.file.name)
+            self.assertEqual(response.content, b'')
+
+            self.attachment.scan_status = 'infected'
+            self.attachment.save()
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertFalse(response.has_header('X-Accel-Redirect'))
+
+
+class AttachmentScanPipelineTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='scan_user', password='password123')
+        cls.space = Space.objects.create(key='SCANSPACE', name='Scan Space', owner=cls.user)
+        cls.page = Page.objects.create(space=cls.space, title='Scan Page', content_json={'type': 'doc'}, author=cls.user)
+
+    def setUp(self):
+        self.created = []
+
+    def tearDown(self):
+        for attachment in self.created:
+            attachment.file.delete(save=False)
+
+    def _attachment(self, name, content, **kwargs):
+        attachment = Attachment.objects.create(
+            page=self.page, uploader=self.user, file_name=name, mime_type='application/octet-stream',
+            size_bytes=len(content), file=SimpleUploadedFile(name, content), **kwargs
+        )
+        self.created.append(attachment)
+        return attachment
+
+    def test_batch_scan_detects_eicar_and_dedupes(self):
+        from unittest.mock import patch
+        from .scanning import EICAR_SIGNATURE, LocalSignatureScanner
+        from .tasks import scan_pending_attachments
+        # Signature straddling the scanner's chunk boundary.
+        infected = self._attachment('eicar.com', b'x' * (64 * 1024 - 10) + EICAR_SIGNATURE)
+        clean_a = self._attachment('a.txt', b'same content')
+        clean_b = self._attachment('b.txt', b'same content')
+
+        with patch.object(LocalSignatureScanner, 'scan', autospec=True, side_effect=LocalSignatureScanner.scan) as scan:
+            scan_pending_attachments.delay(batch_size=10)
+        self.assertEqual(scan.call_count, 2) # The duplicate reuses the first verdict
+
+        statuses = dict(Attachment.objects.filter(pk__in=[infected.pk, clean_a.pk, clean_b.pk]).values_list('pk', 'scan_status'))
+        self.assertEqual(statuses, {infected.pk: 'infected', clean_a.pk: 'clean', clean_b.pk: 'clean'})
+        clean_a.refresh_from_db()
+        self.assertEqual(len(clean_a.content_hash), 64)
+        self.assertIsNotNone(clean_a.scanned_at)
+
+        # Content already scanned is not read by the scanner again.
+        again = self._attachment('c.txt', b'same content')
+        with patch.object(LocalSignatureScanner, 'scan', autospec=True) as scan:
+            scan_pending_attachments.delay()
+        scan.assert_not_called()
+        again.refresh_from_db()
+        self.assertEqual(again.scan_status, 'clean')
+
+    def test_interactive_uploads_are_scanned_first(self):
+        from .tasks import _scan_batch
+        bulk = self._attachment('bulk.txt', b'bulk')
+        interactive = self._attachment('mine.txt', b'mine', scan_priority=Attachment.SCAN_PRIORITY_INTERACTIVE)
+        _scan_batch(Attachment.objects.all(), 1)
+        bulk.refresh_from_db()
+        interactive.refresh_from_db()
+        self.assertEqual(interactive.scan_status, 'clean')
+        self.assertEqual(bulk.scan_status, 'pending')
+
+    def test_claims_are_committed_and_stale_claims_taken_over(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .tasks import _scan_batch
+        fresh = self._attachment('fresh.txt', b'fresh')
+        stale = self._attachment('stale.txt', b'stale')
+        Attachment.objects.filter(pk=fresh.pk).update(scan_status='scanning', scan_claimed_at=timezone.now())
+        Attachment.objects.filter(pk=stale.pk).update(scan_status='scanning', scan_claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(_scan_batch(Attachment.objects.all(), 10), 1) # The fresh claim belongs to a running worker
+        fresh.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((fresh.scan_status, stale.scan_status), ('scanning', 'clean'))
+        self.assertIsNone(stale.scan_claimed_at)
+
+    def test_upload_schedules_one_scan_after_commit(self):
+        self.client.force_authenticate(user=self.user)
+        from django.contrib.auth.models import Permission
+        self.user.user_permissions.add(Permission.objects.get(codename='add_attachment', content_type__app_label='attachments'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('attachment-list'), {
+                'page': self.page.pk, 'file_name': 'up.txt',
+                'file': SimpleUploadedFile('up.txt', b'uploaded', content_type='text/plain'),
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        attachment = Attachment.objects.get(pk=response.data['id'])
+        self.created.append(attachment)
+        self.assertEqual(attachment.scan_priority, Attachment.SCAN_PRIORITY_INTERACTIVE)
+        self.assertEqual(attachment.scan_status, 'clean')
+
+
+class AttachmentDerivativeTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='thumb_user', password='password123')
+        cls.space = Space.objects.create(key='THUMBSPACE', name='Thumb Space', owner=cls.user)
+        cls.page = Page.objects.create(space=cls.space, title='Thumb Page', content_json={'type': 'doc'}, author=cls.user)
+
+    def setUp(self):
+        from django.core.files.base import ContentFile
+        self.client.force_authenticate(user=self.user)
+        self.attachment = Attachment.objects.create(
+            page=self.page, uploader=self.user, file_name='shot.png', mime_type='image/png',
+            size_bytes=8, file=SimpleUploadedFile('shot.png', b'original'), scan_status='clean',
+        )
+        storage = self.attachment.file.storage
+        small = storage.save(self.attachment.file.name[:-4] + '.w320.webp', ContentFile(b'small'))
+        large = storage.save(self.attachment.file.name[:-4] + '.w800.webp', ContentFile(b'large'))
+        self.attachment.derivatives = {
+            'version': 'abc123', 'source_width': 2000, 'source_height': 1000, 'format': 'webp',
+            'widths': {'320': {'name': small, 'width': 320, 'height': 160, 'size': 5},
+                       '800': {'name': large, 'width': 800, 'height': 400, 'size': 5}},
+        }
+        self.attachment.save()
+        assign_perm('attachments.view_attachment', self.user, self.attachment)
+        self.url = reverse('attachment-download', kwargs={'pk': self.attachment.pk})
+
+    def tearDown(self):
+        from core.image_derivatives import delete_derivatives
+        delete_derivatives(self.attachment.file, self.attachment.derivatives)
+        self.attachment.file.delete(save=False)
+
+    def test_width_parameter_serves_closest_derivative(self):
+        response = self.client.get(self.url, {'w': 300, 'v': 'abc123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'small')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(self.url, {'w': 500})
+        self.assertEqual(b''.join(response.streaming_content), b'large')
+        self.assertNotIn('immutable', response.get('Cache-Control', ''))
+
+        # Wider than the source: the original is the best match.
+        response = self.client.get(self.url, {'w': 4000})
+        self.assertEqual(b''.join(response.streaming_content), b'original')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+
+    def test_width_parameter_keeps_scan_check(self):
+        self.attachment.scan_status = 'pending'
+        self.attachment.save()
+        self.assertEqual(self.client.get(self.url, {'w': 300}).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_width(self):
+        self.assertEqual(self.client.get(self.url, {'w': 'big'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_serializer_lists_versioned_thumbnail_urls(self):
+        response = self.client.get(reverse('attachment-detail', kwargs={'pk': self.attachment.pk}))
+        self.assertTrue(response.data['thumbnail_urls']['320'].endswith(f'{self.url}?w=320&v=abc123'))
+
+    def test_generate_derivatives_with_pillow(self):
+        from core import image_derivatives
+        if image_derivatives.Image is None:
+            self.skipTest("Pillow is not installed")
+        import io
+        buffer = io.BytesIO()
+        image_derivatives.Image.new('RGB', (1000, 500), 'red').save(buffer, 'PNG')
+        self.attachment.file.save('big.png', SimpleUploadedFile('big.png', buffer.getvalue()), save=True)
+        updated = image_derivatives.build_for_queryset(Attachment.objects.filter(pk=self.attachment.pk))
+        self.attachment.refresh_from_db()
+        self.assertEqual(len(updated), 1)
+        self.assertEqual(sorted(self.attachment.derivatives['widths']), ['320', '800'])
+        self.assertEqual(self.attachment.derivatives['widths']['320']['height'], 160)
@@ -1,4 +1,8 @@
-from django.http import FileResponse, Http404, HttpResponseForbidden
+from django.http import Http404, HttpResponseForbidden
+import os
+
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
 from django.utils import timezone
 from rest_framework import viewsets, permissions, parsers, status
 from rest_framework.decorators import action
@@ -7,9 +11,10 @@ from django_filters.rest_framework import DjangoFilterBackend
 from guardian.shortcuts import assign_perm
 from .models import Attachment
 from .serializers import AttachmentSerializer
-from .tasks import scan_attachment_file
+from .tasks import schedule_scan
 from core.permissions import ExtendedDjangoObjectPermissionsOrAnonReadOnly # Using Extended
-from django.utils.encoding import iri_to_uri
+from core.file_serving import serve_file
+from core.image_derivatives import CONTENT_TYPES as DERIVATIVE_CONTENT_TYPES, choose_derivative
 
 class AttachmentViewSet(viewsets.ModelViewSet):
     """
@@ -35,14 +40,17 @@ class AttachmentViewSet(viewsets.ModelViewSet):
         """
         Sets the uploader to the current user, initial scan_status to 'pending',
         assigns object permissions to the uploader,
-        and triggers the asynchronous virus scan task.
+        and schedules the asynchronous batch virus scan.
         Requires 'attachments.add_attachment' model-level permission.
         """
         uploader_user = None
         if self.request.user.is_authenticated:
             uploader_user = self.request.user
 
-        attachment = serializer.save(uploader=uploader_user, scan_status='pending')
+        # Interactive uploads are scanned ahead of bulk-created attachments (e.g. imports).
+        attachment = serializer.save(
+            uploader=uploader_user, scan_status='pending', scan_priority=Attachment.SCAN_PRIORITY_INTERACTIVE
+        )
 
         if uploader_user:
             assign_perm('attachments.view_attachment', uploader_user, attachment)
@@ -50,7 +58,8 @@ class AttachmentViewSet(viewsets.ModelViewSet):
             assign_perm('attachments.delete_attachment', uploader_user, attachment)
             # print(f"Assigned CRUD permissions for attachment {attachment.pk} to user {uploader_user.username}.")
 
-        scan_attachment_file.delay(attachment.pk) # Direct call
+        # One batch task serves a burst of uploads; it must only run once the row is committed.
+        transaction.on_commit(schedule_scan)
         # print(f"Attachment {attachment.pk} created. Scan task trigger dispatched.")
 
 
@@ -59,15 +68,17 @@ class AttachmentViewSet(viewsets.ModelViewSet):
         """
         Provides a secure download link for the attachment file.
         Requires 'attachments.view_attachment' object-level permission.
-        Implements Zero-Trust Attachment Download headers.
-        Blocks download if scan_status is 'infected', 'pending', or 'error'.
+        Implements Zero-Trust Attachment Download headers. Supports 'Range' requests (206);
+        see core.file_serving for the X-Accel-Redirect/X-Sendfile and S3 presigned-URL modes.
+        Blocks download if scan_status is 'infected', 'pending', 'scanning' or 'error'.
+        For images, '?w=<px>' serves the closest resized derivative instead of the original.
         """
         attachment = self.get_object()
 
         if attachment.scan_status == 'infected':
             return HttpResponseForbidden("File is marked as infected and cannot be downloaded.")
 
-        if attachment.scan_status in ['pending', 'error']:
+        if attachment.scan_status in ['pending', 'scanning', 'error']:
              return Response(
                 {"detail": f"File scan status is '{attachment.scan_status}'. Download is not allowed until scan is clean."},
                 status=status.HTTP_403_FORBIDDEN
@@ -76,18 +87,31 @@ class AttachmentViewSet(viewsets.ModelViewSet):
         if not attachment.file or not hasattr(attachment.file, 'name') or not attachment.file.name:
             raise Http404("File not found for this attachment.")
 
-        try:
-            if not attachment.file.storage.exists(attachment.file.name):
-                raise Http404("File not found on storage.")
-
-            response = FileResponse(attachment.file.open('rb'), as_attachment=False)
-            response['Content-Type'] = 'application/octet-stream'
-            encoded_filename = iri_to_uri(attachment.file_name)
-            response['Content-Disposition'] = f'attachment; filename="{encoded_filename}"'
-            response['X-Content-Type-Options'] = 'nosniff'
+        field_file, filename = attachment.file, attachment.file_name
+        content_type, disposition = 'application/octet-stream', 'attachment'
+        derivative = None
+        width = request.query_params.get('w')
+        if width is not None:
+            if not width.isdigit() or int(width) == 0:
+                return Response({"detail": "'w' must be a positive image width in pixels."}, status=status.HTTP_400_BAD_REQUEST)
+            # Resized copy (core.image_derivatives); falls back to the original when none is narrower.
+            derivative = choose_derivative(attachment.derivatives, int(width))
+            if derivative is not None:
+                fmt = attachment.derivatives['format']
+                field_file = FieldFile(attachment, Attachment._meta.get_field('file'), derivative['name'])
+                filename = f"{os.path.splitext(attachment.file_name)[0]}.w{derivative['width']}.{fmt}"
+                # Derivatives are re-encoded by us, so they are safe to display inline.
+                content_type, disposition = DERIVATIVE_CONTENT_TYPES[fmt], 'inline'
 
+        # Checks above always run first; serve_file() only chooses how the bytes are delivered
+        # (presigned S3 redirect, X-Accel-Redirect/X-Sendfile, or a streamed, Range-aware response).
+        try:
+            response = serve_file(request, field_file, filename, content_type, disposition)
+            # Versioned derivative URLs (thumbnail_urls) never change content: let the browser keep them.
+            if derivative is not None and response.status_code != 302 and request.query_params.get('v') == attachment.derivatives.get('version'):
+                response['Cache-Control'] = 'private, max-age=31536000, immutable'
             return response
-        except FileNotFoundError:
+        except (FileNotFoundError, Http404):
             raise Http404("File not found.")
         except Exception as e:
             # print(f"Error serving file: {e}")
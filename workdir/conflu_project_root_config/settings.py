@@ -65,8 +65,13 @@ SITE_ID = 1
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
-    'guardian.backends.ObjectPermissionBackend',
+    # guardian's ObjectPermissionBackend with a per-request memo and a shared cache (core.permission_cache).
+    'core.backends.CachedObjectPermissionBackend',
 )
+# Lifetime of cached object-permission sets; entries are also invalidated on every permission change.
+CC_PERMISSION_CACHE_TIMEOUT = int(os.getenv('CC_PERMISSION_CACHE_TIMEOUT', '300'))
+# guardian's check looks for its own backend by dotted path; CachedObjectPermissionBackend subclasses it.
+SILENCED_SYSTEM_CHECKS = ['guardian.W001']
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -84,6 +89,18 @@ WSGI_APPLICATION = 'conflu_project_root_config.wsgi.application'
 
 DATABASES = {'default': dj_database_url.config(default=os.getenv('DATABASE_URL', f"sqlite:///{PROJECT_ROOT_DIR / 'db_dev_fallback.sqlite3'}"), conn_max_age=600)}
 CACHES = {'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/0'), 'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'}}}
+# Page version diffs are immutable; this only bounds how long they occupy the cache.
+CC_PAGE_DIFF_CACHE_TIMEOUT = int(os.getenv('CC_PAGE_DIFF_CACHE_TIMEOUT', str(60 * 60 * 24 * 7)))
+# Pre-render HTML/plain text of a page in the background after each save (pages.PageRender).
+CC_PAGE_RENDER_ON_SAVE = os.getenv('CC_PAGE_RENDER_ON_SAVE', 'True').lower() == 'true'
+# Cached responses of hot read endpoints (core.response_cache); writes invalidate them immediately.
+CC_RESPONSE_CACHE_TIMEOUT = int(os.getenv('CC_RESPONSE_CACHE_TIMEOUT', '600'))
+# Lifetime of the version tokens keying the permission and response caches; raised to the longest of the two if set lower.
+CC_CACHE_VERSION_TOKEN_TIMEOUT = int(os.getenv('CC_CACHE_VERSION_TOKEN_TIMEOUT', str(7 * 24 * 3600)))
+# Bearer token for the Prometheus scrape endpoint (/debug/metrics/); without it only staff users may read it.
+CC_METRICS_TOKEN = os.getenv('CC_METRICS_TOKEN', '')
+# Seconds between checks of the cached unread-notification counters against the database (user_notifications.unread).
+CC_NOTIFICATION_UNREAD_RECONCILE_INTERVAL = int(os.getenv('CC_NOTIFICATION_UNREAD_RECONCILE_INTERVAL', '900'))
 
 AUTH_PASSWORD_VALIDATORS = [{'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},{'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},{'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator'},{'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'}]
 LANGUAGE_CODE = 'en-us'; TIME_ZONE = 'UTC'; USE_I18N = True; USE_TZ = True
@@ -118,13 +135,15 @@ SPECTACULAR_SETTINGS = {
     'SWAGGER_UI_DIST': 'SIDECAR', 'SWAGGER_UI_FAVICON_HREF': 'SIDECAR', 'REDOC_DIST': 'SIDECAR',
 }
 
+APP_RELEASE_VERSION = os.getenv('APP_RELEASE_VERSION', 'conflu@0.1.0-dev') # Also exported as conflu_build_info
+
 SENTRY_DSN = os.getenv('CC_SENTRY_DSN')
 if SENTRY_DSN:
     sentry_sdk.init(
         dsn=SENTRY_DSN, integrations=[DjangoIntegration(), CeleryIntegration()],
         traces_sample_rate=float(os.getenv('CC_SENTRY_TRACES_SAMPLE_RATE', '0.1')),
         send_default_pii=False, environment=os.getenv('CC_ENVIRONMENT_NAME', 'development'),
-        release=os.getenv('APP_RELEASE_VERSION', 'conflu@0.1.0-dev')
+        release=APP_RELEASE_VERSION
     )
 else:
     pass
@@ -140,6 +159,13 @@ if CC_STORAGE_BACKEND == 's3':
     AWS_S3_USE_SSL = os.getenv('CC_AWS_S3_USE_SSL', 'True').lower() == 'true'
     AWS_S3_VERIFY = os.getenv('CC_AWS_S3_VERIFY', 'True').lower() == 'true'
     AWS_S3_FILE_OVERWRITE = False; AWS_DEFAULT_ACL = None
+    # Files above the threshold are uploaded in parts, several at a time.
+    from boto3.s3.transfer import TransferConfig
+    AWS_S3_TRANSFER_CONFIG = TransferConfig(
+        multipart_threshold=int(os.getenv('CC_AWS_S3_MULTIPART_THRESHOLD', str(16 * 1024 ** 2))),
+        multipart_chunksize=int(os.getenv('CC_AWS_S3_MULTIPART_CHUNKSIZE', str(16 * 1024 ** 2))),
+        max_concurrency=int(os.getenv('CC_AWS_S3_MULTIPART_CONCURRENCY', '4')),
+    )
     if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY and AWS_STORAGE_BUCKET_NAME:
         DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
     else:
@@ -151,6 +177,54 @@ else:
     MEDIA_ROOT = PROJECT_ROOT_DIR / 'mediafiles_data'
     os.makedirs(MEDIA_ROOT, exist_ok=True)
 
+# How attachment downloads are delivered for local storage (core.file_serving): 'stream' (Django,
+# Range-aware), 'x-accel-redirect' (nginx internal location at CC_ATTACHMENT_ACCEL_PREFIX) or 'x-sendfile'.
+CC_ATTACHMENT_SERVE_MODE = os.getenv('CC_ATTACHMENT_SERVE_MODE', 'stream').lower()
+CC_ATTACHMENT_ACCEL_PREFIX = os.getenv('CC_ATTACHMENT_ACCEL_PREFIX', '/protected-media/')
+# Lifetime in seconds of presigned S3 download URLs.
+CC_ATTACHMENT_URL_EXPIRY = int(os.getenv('CC_ATTACHMENT_URL_EXPIRY', '300'))
+
+# Attachment malware scanning (attachments.scanning / attachments.tasks).
+CC_ATTACHMENT_SCANNER = os.getenv('CC_ATTACHMENT_SCANNER', 'attachments.scanning.LocalSignatureScanner')
+CC_ATTACHMENT_SCAN_BATCH_SIZE = int(os.getenv('CC_ATTACHMENT_SCAN_BATCH_SIZE', '100'))
+CC_ATTACHMENT_SCAN_MAX_BATCHES = int(os.getenv('CC_ATTACHMENT_SCAN_MAX_BATCHES', '20')) # Per task run
+CC_ATTACHMENT_SCAN_SCHEDULE_TIMEOUT = int(os.getenv('CC_ATTACHMENT_SCAN_SCHEDULE_TIMEOUT', '300'))
+# A claimed ('scanning') attachment not finished within this many seconds (e.g. the worker died) is claimed again.
+CC_ATTACHMENT_SCAN_CLAIM_TIMEOUT = int(os.getenv('CC_ATTACHMENT_SCAN_CLAIM_TIMEOUT', '900'))
+
+# Resized copies of image attachments (core.image_derivatives; requires Pillow).
+CC_IMAGE_DERIVATIVE_WIDTHS = [int(w) for w in os.getenv('CC_IMAGE_DERIVATIVE_WIDTHS', '320,800,1600').split(',')]
+CC_IMAGE_DERIVATIVE_FORMAT = os.getenv('CC_IMAGE_DERIVATIVE_FORMAT', 'webp').lower() # 'webp' or 'jpeg'
+
+# Resumable chunked uploads of Confluence export ZIPs (importer.chunked). The staging directory
+# should be on the same filesystem as MEDIA_ROOT so completing an upload is a rename, not a copy.
+CC_CHUNKED_UPLOAD_DIR = os.getenv('CC_CHUNKED_UPLOAD_DIR', str(MEDIA_ROOT / 'chunked_uploads') if CC_STORAGE_BACKEND != 's3' else '/tmp/conflu_chunked_uploads')
+CC_CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CC_CHUNKED_UPLOAD_MAX_SIZE', str(50 * 1024 ** 3)))
+CC_CHUNKED_UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('CC_CHUNKED_UPLOAD_MAX_CHUNK_SIZE', str(64 * 1024 ** 2)))
+# A chunked upload that receives no chunk for this many seconds is abandoned; its row and staging file are
+# deleted by importer.tasks.delete_expired_chunked_uploads every CC_CHUNKED_UPLOAD_CLEANUP_INTERVAL seconds.
+CC_CHUNKED_UPLOAD_EXPIRY = int(os.getenv('CC_CHUNKED_UPLOAD_EXPIRY', str(24 * 3600)))
+CC_CHUNKED_UPLOAD_CLEANUP_INTERVAL = int(os.getenv('CC_CHUNKED_UPLOAD_CLEANUP_INTERVAL', '3600'))
+# A chunk still being written after this many seconds (e.g. the client or worker went away) no longer blocks a retry.
+CC_CHUNKED_UPLOAD_CHUNK_TIMEOUT = int(os.getenv('CC_CHUNKED_UPLOAD_CHUNK_TIMEOUT', '900'))
+
+# Import scheduling (importer.scheduling): concurrent imports overall, per uploader and per
+# target workspace; exports up to CC_IMPORT_SMALL_MAX_BYTES jump the queue and use CC_IMPORT_SMALL_QUEUE.
+CC_IMPORT_MAX_CONCURRENT = int(os.getenv('CC_IMPORT_MAX_CONCURRENT', '4'))
+CC_IMPORT_MAX_CONCURRENT_PER_USER = int(os.getenv('CC_IMPORT_MAX_CONCURRENT_PER_USER', '1'))
+CC_IMPORT_MAX_CONCURRENT_PER_WORKSPACE = int(os.getenv('CC_IMPORT_MAX_CONCURRENT_PER_WORKSPACE', '2'))
+CC_IMPORT_SMALL_MAX_BYTES = int(os.getenv('CC_IMPORT_SMALL_MAX_BYTES', str(50 * 1024 ** 2)))
+CC_IMPORT_LARGE_PROMOTE_AFTER = int(os.getenv('CC_IMPORT_LARGE_PROMOTE_AFTER', '3600')) # A large export queued this long ranks with the small ones
+CC_IMPORT_SLOT_TIMEOUT = int(os.getenv('CC_IMPORT_SLOT_TIMEOUT', str(12 * 3600))) # A PROCESSING import older than this no longer holds a slot
+CC_IMPORT_QUEUE = os.getenv('CC_IMPORT_QUEUE', 'imports')
+CC_IMPORT_SMALL_QUEUE = os.getenv('CC_IMPORT_SMALL_QUEUE', 'imports_small')
+# Pages written per database transaction by an import (each page is a savepoint inside it).
+CC_IMPORT_PAGES_PER_TRANSACTION = int(os.getenv('CC_IMPORT_PAGES_PER_TRANSACTION', '500'))
+# Threads copying a page's imported attachments into storage in parallel (importer.attachment_upload).
+CC_IMPORT_ATTACHMENT_UPLOAD_WORKERS = int(os.getenv('CC_IMPORT_ATTACHMENT_UPLOAD_WORKERS', '8'))
+# Entries an import keeps in memory per lookup table before moving it to a SQLite file (importer.spill).
+CC_IMPORT_SPILL_THRESHOLD = int(os.getenv('CC_IMPORT_SPILL_THRESHOLD', '20000'))
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://redis:6379/1')
@@ -160,6 +234,23 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_SEND_SENT_EVENT = True
+# Import work runs on its own queues (served by the 'celeryimportworker' service), so large
+# imports never hold up attachment scans, thumbnails or other tasks on the default queue.
+CELERY_TASK_ROUTES = {
+    'importer.tasks.import_confluence_space': {'queue': CC_IMPORT_QUEUE},
+    'importer.tasks.analyze_confluence_export': {'queue': CC_IMPORT_SMALL_QUEUE},
+}
+# Periodic tasks, run by the 'celerybeat' service.
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-unread-notification-counts': {
+        'task': 'user_notifications.tasks.reconcile_unread_notification_counts',
+        'schedule': CC_NOTIFICATION_UNREAD_RECONCILE_INTERVAL,
+    },
+    'delete-expired-chunked-uploads': {
+        'task': 'importer.tasks.delete_expired_chunked_uploads',
+        'schedule': CC_CHUNKED_UPLOAD_CLEANUP_INTERVAL,
+    },
+}
 # CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
 # Test specific settings
@@ -167,6 +258,10 @@ if 'test' in sys.argv or 'pytest' in sys.argv:
     print("DEBUG: Applying test-specific Celery settings: CELERY_TASK_ALWAYS_EAGER=True")
     CELERY_TASK_ALWAYS_EAGER = True
     CELERY_TASK_EAGER_PROPAGATES = True
+    # Tests must not depend on a running Redis.
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    # The locmem cache outlives per-test transaction rollbacks (and sqlite may reuse PKs):
+    # tests that read cached permissions or responses call cache.clear() in setUp.
 
 # Django Allauth Specific Settings (can be customized further later)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
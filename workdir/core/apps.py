@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.core import checks
+        from .file_serving import check_serve_mode
+        from .signals import connect_permission_cache_signals
+        connect_permission_cache_signals()
+        checks.register(check_serve_mode)
@@ -0,0 +1,70 @@
+# core/backends.py
+from guardian.backends import ObjectPermissionBackend, check_object_support, check_user_support
+from guardian.core import ObjectPermissionChecker
+from guardian.ctypes import get_content_type
+from guardian.exceptions import WrongAppError
+
+from .permission_cache import get_cached_codenames
+
+
+class CachedObjectPermissionBackend(ObjectPermissionBackend):
+    """
+    Drop-in replacement for guardian's ObjectPermissionBackend that caches the permission
+    codenames a user holds on an object (see core.permission_cache).
+    A repeated check within a request, or a check served from the shared cache,
+    costs no database queries; in particular guardian's anonymous-user lookup
+    only happens on a cache miss.
+    """
+
+    def _direct_codenames(self, user_obj, obj, content_type):
+        def compute():
+            supported, resolved_user = check_user_support(user_obj)
+            if not supported:
+                return ()
+            return ObjectPermissionChecker(resolved_user).get_perms(obj)
+
+        return get_cached_codenames(user_obj, content_type.pk, obj.pk, compute)
+
+    def _codenames(self, user_obj, obj):
+        content_type = get_content_type(obj)
+        codenames = self._direct_codenames(user_obj, obj, content_type)
+
+        # Models may inherit object permissions from a parent object (e.g. Page from its Space).
+        # The parent is addressed by its FK value only, so this never loads the parent row, and
+        # both sets are cached separately so a change on either side invalidates correctly.
+        parent_field_name = getattr(type(obj), 'inherit_permissions_from', None)
+        if parent_field_name:
+            parent_field = obj._meta.get_field(parent_field_name)
+            parent_pk = getattr(obj, parent_field.attname)
+            if parent_pk is not None:
+                parent = parent_field.related_model(pk=parent_pk)
+                parent_codenames = self._direct_codenames(user_obj, parent, get_content_type(parent))
+                inherited = set()
+                for parent_codename in parent_codenames:
+                    inherited.update(type(obj).inherited_permissions.get(parent_codename, ()))
+                if inherited:
+                    codenames = codenames | inherited
+
+        return content_type, codenames
+
+    def has_perm(self, user_obj, perm, obj=None):
+        if not check_object_support(obj) or obj.pk is None:
+            return False
+        if user_obj.is_authenticated and not user_obj.is_active:
+            return False
+        content_type, codenames = self._codenames(user_obj, obj)
+        if '.' in perm:
+            app_label, perm = perm.split('.', 1)
+            if app_label != obj._meta.app_label and app_label != content_type.app_label:
+                raise WrongAppError(
+                    f"Passed perm has app label of '{app_label}' while given obj has app label "
+                    f"'{obj._meta.app_label}' and given obj content_type has app label '{content_type.app_label}'"
+                )
+        return perm in codenames
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not check_object_support(obj) or obj.pk is None:
+            return set()
+        if user_obj.is_authenticated and not user_obj.is_active:
+            return set()
+        return set(self._codenames(user_obj, obj)[1])
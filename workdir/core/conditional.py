@@ -0,0 +1,45 @@
+# core/conditional.py
+"""
+Helpers for conditional GET (ETag / Last-Modified) on API views.
+
+Views compute their validators from a cheap metadata query, call not_modified_response()
+before loading and serializing the full object, and add the validators to the full response
+with set_validators(). Responses are marked private/no-cache: they depend on the requester's
+permissions, so clients must revalidate but shared caches must not store them.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def build_etag(*parts):
+    """Strong ETag from the given parts (stringified and hashed)."""
+    digest = hashlib.md5(':'.join(str(p) for p in parts).encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def _last_modified_timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified is not None else None
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(_last_modified_timestamp(last_modified))
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
+
+
+def not_modified_response(request, etag, last_modified=None):
+    """
+    Returns a 304 (or 412 for failed preconditions) response if the request's
+    If-None-Match / If-Modified-Since headers match, otherwise None.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_last_modified_timestamp(last_modified)
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
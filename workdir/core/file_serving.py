@@ -0,0 +1,148 @@
+# core/file_serving.py
+"""
+Serving stored files (attachments) without tying up an application worker for the transfer.
+
+Callers run their permission and scan checks first, then hand the FieldFile to serve_file(),
+which picks one of:
+  - S3 storage (CC_STORAGE_BACKEND=s3): a redirect to a short-lived presigned URL; S3 serves
+    the bytes (including ranges) itself.
+  - CC_ATTACHMENT_SERVE_MODE='x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd):
+    an empty response whose header tells the front-end server which file to send. Only for
+    files on local storage; others are streamed, and check_serve_mode() warns at startup.
+  - 'stream' (default): the file is streamed by Django in chunks, with single-range
+    'Range: bytes=...' requests answered by 206 Partial Content.
+"""
+import re
+
+from django.conf import settings
+from django.core import checks
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.encoding import iri_to_uri
+
+SERVE_MODES = ('stream', 'x-accel-redirect', 'x-sendfile')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _content_disposition(filename, disposition='attachment'):
+    return f'{disposition}; filename="{iri_to_uri(filename)}"'
+
+
+def _set_download_headers(response, filename, content_type, disposition):
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = _content_disposition(filename, disposition)
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive byte offsets for a single-range 'bytes=' header, None if the header
+    is absent, malformed or asks for several ranges (served in full, as RFC 9110 allows),
+    or 'unsatisfiable'.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0: # No byte range of an empty file can be satisfied, suffix ranges included
+        return 'unsatisfiable'
+    if not first: # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return 'unsatisfiable'
+    return start, end
+
+
+def _stream_range(field_file, start, end):
+    with field_file.open('rb') as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _is_local(storage):
+    return isinstance(storage, FileSystemStorage)
+
+
+def check_serve_mode(app_configs, **kwargs):
+    """System check: CC_ATTACHMENT_SERVE_MODE must be known, and header modes need local storage."""
+    mode = settings.CC_ATTACHMENT_SERVE_MODE
+    if mode not in SERVE_MODES:
+        return [checks.Error(
+            f"CC_ATTACHMENT_SERVE_MODE={mode!r} is not one of {', '.join(SERVE_MODES)}.", id='core.E001',
+        )]
+    if mode != 'stream' and not _is_local(default_storage):
+        return [checks.Warning(
+            f"CC_ATTACHMENT_SERVE_MODE={mode!r} needs local file storage; attachments on "
+            f"{type(default_storage).__name__} are streamed by Django instead.", id='core.W001',
+        )]
+    return []
+
+
+def serve_file(request, field_file, filename, content_type='application/octet-stream', disposition='attachment'):
+    """
+    Response delivering `field_file` to the client (see module docstring). `disposition` is
+    'attachment' for user content; 'inline' only for files the application generated itself.
+    """
+    storage = field_file.storage
+    name = field_file.name
+
+    if settings.CC_STORAGE_BACKEND == 's3' and not _is_local(storage):
+        url = storage.url(name, parameters={
+            'ResponseContentDisposition': _content_disposition(filename, disposition),
+            'ResponseContentType': content_type,
+        }, expire=settings.CC_ATTACHMENT_URL_EXPIRY)
+        response = HttpResponseRedirect(url)
+        response['Cache-Control'] = 'private, no-store' # The URL is a bearer credential until it expires
+        return response
+
+    try:
+        size = storage.size(name)
+    except (FileNotFoundError, OSError):
+        raise Http404("File not found on storage.")
+
+    # The front-end server can only send files it can open, i.e. files on local storage.
+    mode = settings.CC_ATTACHMENT_SERVE_MODE if _is_local(storage) else 'stream'
+    if mode == 'x-accel-redirect':
+        # nginx: 'location <prefix> { internal; alias <MEDIA_ROOT>/; }'. nginx handles Range itself.
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = iri_to_uri(settings.CC_ATTACHMENT_ACCEL_PREFIX + name)
+        return _set_download_headers(response, filename, content_type, disposition)
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = storage.path(name)
+        return _set_download_headers(response, filename, content_type, disposition)
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        # FileResponse lets the WSGI server use sendfile() where it supports wsgi.file_wrapper.
+        response = FileResponse(field_file.open('rb'), as_attachment=False)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_stream_range(field_file, start, end), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return _set_download_headers(response, filename, content_type, disposition)
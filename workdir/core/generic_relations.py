@@ -0,0 +1,41 @@
+# core/generic_relations.py
+"""
+Batch loading of GenericForeignKey objects for list endpoints.
+
+Reading obj.target on each row of a page of notifications costs one query per row, and
+str(obj.target) can cost more (Space.__str__ reads its workspace). display_prefetch() builds
+a GenericPrefetch for a GenericForeignKey: prefetch_related() groups the rows' object IDs by
+content type and loads each model with one query, keeping only the fields its __str__ reads
+(DISPLAY_FIELDS). Models missing from DISPLAY_FIELDS are still loaded one query per content
+type, with full rows.
+"""
+from django.apps import apps
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+
+# model label -> (select_related, only) covering what the model's __str__ reads
+DISPLAY_FIELDS = {
+    'auth.User': ((), ('username',)),
+    'pages.Page': ((), ('title',)),
+    'pages.PageVersion': (('page',), ('version_number', 'page__title')),
+    'pages.Attachment': ((), ('original_filename',)),
+    'pages.Tag': ((), ('name',)),
+    'workspaces.Workspace': ((), ('name',)),
+    'workspaces.Space': (('workspace',), ('name', 'key', 'workspace__name')),
+}
+
+
+def display_querysets():
+    querysets = []
+    for label, (related, fields) in DISPLAY_FIELDS.items():
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            continue # App not installed
+        # _base_manager, like GenericForeignKey itself: soft-deleted objects still resolve.
+        querysets.append(model._base_manager.select_related(*related).only(*fields))
+    return querysets
+
+
+def display_prefetch(gfk_name):
+    """GenericPrefetch for the GenericForeignKey `gfk_name`, loading only the fields needed for str()."""
+    return GenericPrefetch(gfk_name, display_querysets())
@@ -0,0 +1,147 @@
+# core/image_derivatives.py
+"""
+Resized derivatives (thumbnails/previews) of raster image attachments.
+
+For each width in settings.CC_IMAGE_DERIVATIVE_WIDTHS narrower than the source image, a WebP
+(or JPEG, see CC_IMAGE_DERIVATIVE_FORMAT) copy is written next to the original, named
+'<original stem>.w<width>.<ext>'. The result is recorded on the attachment's `derivatives`
+JSONField:
+
+    {'version': '<fingerprint>', 'source_width': 2400, 'source_height': 1600,
+     'format': 'webp', 'widths': {'320': {'name': ..., 'width': 320, 'height': 213, 'size': 18211}, ...}}
+
+'version' changes whenever the derivative bytes change, so URLs embedding it can be cached
+as immutable.
+
+Pillow is an optional dependency: without it, generate_derivatives() returns None and
+attachments are simply served at full size.
+"""
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError: # Optional dependency
+    Image = None
+
+RASTER_MIME_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp', 'image/tiff'}
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def is_supported(mime_type):
+    return Image is not None and (mime_type or '').lower() in RASTER_MIME_TYPES
+
+
+def _output_format():
+    fmt = settings.CC_IMAGE_DERIVATIVE_FORMAT
+    if fmt == 'webp' and not features.check('webp'):
+        fmt = 'jpeg' # Pillow built without libwebp
+    return fmt
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'jpeg':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=82, optimize=True, progressive=True)
+    else:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        image.save(buffer, 'WEBP', quality=80, method=4)
+    return buffer.getvalue()
+
+
+def generate_derivatives(field_file):
+    """
+    Writes the derivatives of the image in `field_file` to its storage and returns the
+    metadata dict described in the module docstring, or None if Pillow is unavailable or
+    the file cannot be decoded.
+    """
+    if Image is None:
+        return None
+    storage = field_file.storage
+    try:
+        with field_file.open('rb') as fh:
+            source = Image.open(fh)
+            source.load() # Decode now; raises DecompressionBombError for absurd dimensions
+    except Exception as e:
+        print(f"[Derivatives] Could not decode image '{field_file.name}': {e}")
+        return None
+    source = ImageOps.exif_transpose(source)
+
+    fmt = _output_format()
+    stem = os.path.splitext(field_file.name)[0]
+    fingerprint = hashlib.sha256()
+    widths = {}
+    for width in sorted(settings.CC_IMAGE_DERIVATIVE_WIDTHS):
+        if width >= source.width:
+            break # Never upscale; the original serves these sizes
+        resized = source.copy()
+        resized.thumbnail((width, source.height), Image.LANCZOS)
+        data = _encode(resized, fmt)
+        name = f'{stem}.w{width}.{fmt}'
+        if storage.exists(name): # Regeneration replaces the previous derivative
+            storage.delete(name)
+        name = storage.save(name, ContentFile(data))
+        fingerprint.update(data)
+        widths[str(width)] = {'name': name, 'width': resized.width, 'height': resized.height, 'size': len(data)}
+
+    return {
+        'version': fingerprint.hexdigest()[:12],
+        'source_width': source.width,
+        'source_height': source.height,
+        'format': fmt,
+        'widths': widths,
+    }
+
+
+def choose_derivative(derivatives, requested_width):
+    """
+    The derivative entry to serve for `requested_width` (the smallest one at least that wide,
+    else the widest), or None when the original is the best match or there are no derivatives.
+    """
+    if not derivatives or not derivatives.get('widths'):
+        return None
+    entries = sorted(derivatives['widths'].values(), key=lambda entry: entry['width'])
+    for entry in entries:
+        if entry['width'] >= requested_width:
+            return entry
+    if requested_width >= derivatives.get('source_width', 0):
+        return None
+    return entries[-1]
+
+
+def delete_derivatives(field_file, derivatives):
+    for entry in (derivatives or {}).get('widths', {}).values():
+        field_file.storage.delete(entry['name'])
+
+
+def build_for_queryset(queryset, file_field='file', mime_field='mime_type'):
+    """
+    Generates derivatives for every supported image in `queryset` and saves them with one
+    bulk_update. Returns the updated instances.
+    """
+    updated = []
+    for instance in queryset:
+        if not is_supported(getattr(instance, mime_field)):
+            continue
+        field_file = getattr(instance, file_field)
+        if not field_file:
+            continue
+        meta = generate_derivatives(field_file)
+        if meta is None:
+            continue
+        delete_derivatives(field_file, {'widths': {
+            key: entry for key, entry in (instance.derivatives or {}).get('widths', {}).items()
+            if entry['name'] not in {e['name'] for e in meta['widths'].values()}
+        }})
+        instance.derivatives = meta
+        updated.append(instance)
+    if updated:
+        queryset.model.objects.bulk_update(updated, ['derivatives'])
+    return updated
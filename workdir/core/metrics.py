@@ -0,0 +1,88 @@
+# core/metrics.py
+"""
+Minimal application metrics, shared across worker processes through the default cache
+(Redis in deployments) and exposed in Prometheus text format by core.views.metrics_view.
+
+Counters are declared up front with register_counter() together with every label set they
+can take, so the exporter can list them without scanning the cache. Label values must
+therefore be the same in every process: per-process facts such as the release go into an
+info metric (register_info(), a gauge fixed at 1) that queries join on instead. Counters of
+fractional amounts (seconds) pass a `scale`: values are stored as integers in units of
+1/scale, since cache increments are integral, and rendered back as floats.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+_COUNTERS = {} # name -> {'help': str, 'label_sets': [dict, ...]}
+_INFOS = {} # name -> {'help': str, 'labels': dict}
+
+
+def register_counter(name, help_text, label_sets=({},), scale=1):
+    counter = _COUNTERS.setdefault(name, {'help': help_text, 'label_sets': [], 'scale': scale})
+    for labels in label_sets:
+        if labels not in counter['label_sets']:
+            counter['label_sets'].append(dict(labels))
+
+
+def register_info(name, help_text, labels):
+    """Declares an info metric of the exporting process, rendered as `name{labels} 1`."""
+    _INFOS[name] = {'help': help_text, 'labels': dict(labels)}
+
+
+def _cache_key(name, labels):
+    label_part = ','.join(f'{k}={labels[k]}' for k in sorted(labels))
+    return f'metrics:{name}:{label_part}'
+
+
+def _scale(name):
+    return _COUNTERS.get(name, {}).get('scale', 1)
+
+
+def increment(name, amount=1, **labels):
+    key = _cache_key(name, labels)
+    amount = int(round(amount * _scale(name)))
+    try:
+        cache.incr(key, amount)
+    except ValueError: # Missing key
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def _unscaled(name, value):
+    scale = _scale(name)
+    return value if scale == 1 else value / scale
+
+
+def get_value(name, **labels):
+    return _unscaled(name, cache.get(_cache_key(name, labels), 0))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in sorted(labels.items())) + '}'
+
+
+def render_prometheus():
+    """Prometheus text exposition (version 0.0.4) of all registered counters and info metrics."""
+    keys = {
+        name: [(labels, _cache_key(name, labels)) for labels in counter['label_sets']]
+        for name, counter in _COUNTERS.items()
+    }
+    values = cache.get_many([key for entries in keys.values() for _, key in entries])
+    lines = []
+    for name in sorted(_COUNTERS):
+        lines.append(f'# HELP {name} {_COUNTERS[name]["help"]}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, key in keys[name]:
+            lines.append(f'{name}{_format_labels(labels)} {_unscaled(name, values.get(key, 0))}')
+    for name in sorted(_INFOS):
+        lines.append(f'# HELP {name} {_INFOS[name]["help"]}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name}{_format_labels(_INFOS[name]["labels"])} 1')
+    return '\n'.join(lines) + '\n'
+
+
+register_info('conflu_build_info', 'Release of the process serving these metrics (APP_RELEASE_VERSION).', {'release': settings.APP_RELEASE_VERSION})
@@ -0,0 +1,177 @@
+# core/permission_cache.py
+"""
+Cache layer for guardian object permissions, used by core.backends.CachedObjectPermissionBackend.
+
+Two levels:
+- A per-request memo stored on the user instance (request.user lives for one request),
+  so repeated checks on the same object within a request are free.
+- A cross-request cache (the default Django cache, Redis in deployments) holding the set of
+  permission codenames a user has on an object.
+
+Cross-request entries are never deleted explicitly. Instead each key embeds a per-object and
+a per-user version token; changing a permission replaces the token, which orphans every entry
+that depended on it. Tokens are random so an evicted token can never resurrect a stale entry.
+Tokens expire after CC_CACHE_VERSION_TOKEN_TIMEOUT (never shorter than the entries built on
+them), so tokens of deleted objects and inactive users do not pile up in the cache.
+Replacements made inside a transaction are repeated when it commits (bump_versions()).
+"""
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+MEMO_ATTR = '_object_perm_memo'
+
+_state = threading.local()
+
+# Incremented on every invalidation in this process; request memos built under an older
+# generation are discarded, so a permission granted mid-request is visible immediately.
+_local_generation = 0
+
+
+def _timeout():
+    return getattr(settings, 'CC_PERMISSION_CACHE_TIMEOUT', 300)
+
+
+def _version_timeout():
+    # An expired token only costs misses, but it must outlive the entries keyed by it.
+    return max(
+        getattr(settings, 'CC_CACHE_VERSION_TOKEN_TIMEOUT', 7 * 24 * 3600),
+        _timeout(), getattr(settings, 'CC_RESPONSE_CACHE_TIMEOUT', 600),
+    )
+
+
+def user_cache_id(user):
+    """Stable cache identifier for a user; all anonymous users share one entry."""
+    return str(user.pk) if user.is_authenticated else 'anon'
+
+
+# Replaced on every permission change of any kind; used by caches of permission-filtered
+# results (e.g. core.response_cache) that cannot track individual objects.
+GLOBAL_VERSION_KEY = 'objperm:ver:global'
+
+
+def object_version_key(content_type_id, object_pk):
+    return f'objperm:ver:obj:{content_type_id}:{object_pk}'
+
+
+def user_version_key(user_id):
+    return f'objperm:ver:user:{user_id}'
+
+
+def get_versions(keys):
+    """Returns the current version token for each key, creating tokens for missing ones."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = uuid.uuid4().hex
+            # add() keeps a token set concurrently by another process.
+            if not cache.add(key, token, timeout=_version_timeout()):
+                token = cache.get(key) or token
+            versions[key] = token
+    return versions
+
+
+def _set_new_tokens(keys):
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=_version_timeout())
+
+
+def bump_versions(keys):
+    """
+    Replaces the version token of each key, orphaning every entry built under the old tokens.
+    Inside a transaction the tokens are replaced again once it commits: until then other
+    connections still read the old rows and could cache them under the first new token.
+    """
+    if keys:
+        keys = list(keys)
+        _set_new_tokens(keys)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: _set_new_tokens(keys))
+
+
+def _bump(keys):
+    if keys:
+        bump_versions(set(keys) | {GLOBAL_VERSION_KEY})
+
+
+def _collect_or_bump(keys):
+    global _local_generation
+    _local_generation += 1
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending.update(keys)
+    else:
+        _bump(keys)
+
+
+def invalidate_object(content_type_id, object_pk):
+    """Invalidates cached permissions of every user on one object."""
+    _collect_or_bump([object_version_key(content_type_id, object_pk)])
+
+
+def invalidate_user(user_id):
+    """Invalidates every cached object permission of one user (e.g. group membership changed)."""
+    _collect_or_bump([user_version_key(user_id)])
+
+
+@contextmanager
+def bulk_permission_changes():
+    """
+    Batches invalidations: inside the block, permission changes only record which
+    objects/users are affected, and each affected version token is replaced once on exit.
+    Use around loops of assign_perm/remove_perm and around bulk operations (together with
+    explicit invalidate_object()/invalidate_user() calls for bulk_create/update, which send no signals).
+    """
+    outer = getattr(_state, 'pending', None)
+    if outer is not None:
+        yield # Nested: the outermost block flushes.
+        return
+    _state.pending = set()
+    try:
+        yield
+    finally:
+        pending, _state.pending = _state.pending, None
+        _bump(pending)
+
+
+def get_request_memo(user):
+    memo = getattr(user, MEMO_ATTR, None)
+    if memo is None or memo[0] != _local_generation:
+        memo = (_local_generation, {})
+        try:
+            setattr(user, MEMO_ATTR, memo)
+        except AttributeError:
+            pass
+    return memo[1]
+
+
+def clear_request_memo(user):
+    if hasattr(user, MEMO_ATTR):
+        delattr(user, MEMO_ATTR)
+
+
+def get_cached_codenames(user, content_type_id, object_pk, compute):
+    """
+    Returns the frozenset of permission codenames `user` holds on the object, consulting the
+    request memo, then the shared cache, then `compute()` (which hits the database).
+    """
+    memo = get_request_memo(user)
+    memo_key = (content_type_id, str(object_pk))
+    if memo_key in memo:
+        return memo[memo_key]
+
+    uid = user_cache_id(user)
+    obj_key = object_version_key(content_type_id, object_pk)
+    usr_key = user_version_key(uid)
+    versions = get_versions([obj_key, usr_key])
+    cache_key = f'objperm:{uid}:{content_type_id}:{object_pk}:{versions[obj_key]}:{versions[usr_key]}'
+
+    codenames = cache.get(cache_key)
+    if codenames is None:
+        codenames = frozenset(compute())
+        cache.set(cache_key, codenames, timeout=_timeout())
+    memo[memo_key] = codenames
+    return codenames
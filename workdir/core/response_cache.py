@@ -0,0 +1,60 @@
+# core/response_cache.py
+"""
+Versioned cache for serialized API responses of hot read endpoints.
+
+A cached entry is stored under a key that embeds the current token of every version
+namespace it depends on (e.g. 'page:42', 'spaces'). Writes replace the tokens of the
+affected namespaces from model signals (see pages.models / workspaces.models), so entries
+built from older data can never be served again; they simply expire. Tokens are random
+(core.permission_cache.get_versions), so an evicted token cannot bring a stale entry back.
+
+Entries hold the serialized payload plus its ETag/Last-Modified validators, so a hit
+skips the database and the serializer, and can also answer conditional requests with 304.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .permission_cache import GLOBAL_VERSION_KEY, bump_versions, get_versions
+
+CACHED_ENDPOINTS = ('page_detail', 'space_list', 'page_tree')
+
+metrics.register_counter(
+    'conflu_response_cache_requests_total',
+    'Response cache lookups by endpoint and result.',
+    label_sets=[{'endpoint': e, 'result': r} for e in CACHED_ENDPOINTS for r in ('hit', 'miss')],
+)
+
+
+def _version_key(namespace):
+    return f'respcache:ver:{namespace}'
+
+
+def bump(*namespaces):
+    """Invalidates every cached entry depending on any of `namespaces`."""
+    bump_versions([_version_key(ns) for ns in namespaces if ns is not None])
+
+
+def build_key(endpoint, namespaces, *parts, include_permissions=False):
+    """
+    Cache key for `endpoint` that is valid only as long as none of `namespaces` changed.
+    With include_permissions=True the key also changes on any object-permission change,
+    for results filtered by the requester's permissions.
+    """
+    version_keys = [_version_key(ns) for ns in namespaces]
+    if include_permissions:
+        version_keys.append(GLOBAL_VERSION_KEY)
+    versions = get_versions(version_keys)
+    tokens = ':'.join(versions[k] for k in version_keys)
+    suffix = ':'.join(str(p) for p in parts)
+    return f'respcache:{endpoint}:{suffix}:{tokens}'
+
+
+def get_entry(endpoint, key):
+    entry = cache.get(key)
+    metrics.increment('conflu_response_cache_requests_total', endpoint=endpoint, result='hit' if entry is not None else 'miss')
+    return entry
+
+
+def set_entry(key, entry):
+    cache.set(key, entry, timeout=getattr(settings, 'CC_RESPONSE_CACHE_TIMEOUT', 600))
@@ -0,0 +1,47 @@
+# core/signals.py
+# Invalidation of the object-permission cache (core.permission_cache).
+# Connected in CoreConfig.ready().
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from guardian.utils import get_group_obj_perms_model, get_user_obj_perms_model
+
+from . import response_cache
+from .permission_cache import invalidate_object, invalidate_user
+
+
+def object_permission_changed(sender, instance, **kwargs):
+    # Covers assign_perm/remove_perm for users and groups: a group grant affects all its
+    # members, so the object's token is replaced rather than one user's.
+    invalidate_object(instance.content_type_id, instance.object_pk)
+
+
+def user_saved(sender, instance, created, **kwargs):
+    # is_superuser / is_active changes alter every object check of the user.
+    update_fields = kwargs.get('update_fields')
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return # Logins save last_login only; no need to drop the user's cache.
+    invalidate_user(instance.pk)
+    response_cache.bump('users') # Usernames are embedded in cached page/space representations
+
+
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_user(instance.pk) # user.groups.add(...)
+    elif pk_set:
+        for user_id in pk_set: # group.user_set.add(...)
+            invalidate_user(user_id)
+    else:
+        # group.user_set.clear(): members are gone by now, invalidate the whole group's objects instead.
+        for perm in get_group_obj_perms_model().objects.filter(group=instance).values('content_type_id', 'object_pk'):
+            invalidate_object(perm['content_type_id'], perm['object_pk'])
+
+
+def connect_permission_cache_signals():
+    for model in (get_user_obj_perms_model(), get_group_obj_perms_model()):
+        post_save.connect(object_permission_changed, sender=model, dispatch_uid=f'objperm_cache_save_{model.__name__}')
+        post_delete.connect(object_permission_changed, sender=model, dispatch_uid=f'objperm_cache_delete_{model.__name__}')
+    User = get_user_model()
+    post_save.connect(user_saved, sender=User, dispatch_uid='objperm_cache_user_saved')
+    m2m_changed.connect(user_groups_changed, sender=User.groups.through, dispatch_uid='objperm_cache_user_groups')
@@ -1,3 +1,144 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from guardian.shortcuts import assign_perm, remove_perm
 
-# Create your tests here.
+from core.backends import CachedObjectPermissionBackend
+from core.permission_cache import bulk_permission_changes
+from workspaces.models import Workspace, Space
+
+User = get_user_model()
+
+
+class CachedObjectPermissionBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='perm_cache_owner', password='password')
+        cls.user = User.objects.create_user(username='perm_cache_user', password='password')
+        cls.workspace = Workspace.objects.create(name="Perm Cache WS", owner=cls.owner)
+        cls.space = Space.objects.create(name="Perm Cache Space", key="PCS", workspace=cls.workspace, owner=cls.owner)
+
+    def setUp(self):
+        cache.clear() # Cached permission sets would outlive the previous test's rollback
+        self.backend = CachedObjectPermissionBackend()
+
+    def _new_request_user(self):
+        return User.objects.get(pk=self.user.pk) # Fresh instance: empty request memo, shared cache only
+
+    def test_repeated_checks_within_request_cost_no_queries(self):
+        assign_perm('workspaces.view_space', self.user, self.space)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('workspaces.view_space', self.space))
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('workspaces.view_space', self.space))
+            self.assertFalse(user.has_perm('workspaces.admin_space', self.space))
+            self.assertEqual(self.backend.get_all_permissions(user, self.space), {'view_space'})
+
+    def test_assign_and_remove_invalidate_memo(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.has_perm('workspaces.admin_space', self.space))
+        assign_perm('workspaces.admin_space', self.user, self.space)
+        self.assertTrue(user.has_perm('workspaces.admin_space', self.space))
+        remove_perm('workspaces.admin_space', self.user, self.space)
+        self.assertFalse(user.has_perm('workspaces.admin_space', self.space))
+
+    def test_group_membership_change_invalidates(self):
+        group = Group.objects.create(name='perm-cache-group')
+        assign_perm('workspaces.view_space', group, self.space)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.has_perm('workspaces.view_space', self.space))
+        user.groups.add(group)
+        self.assertTrue(user.has_perm('workspaces.view_space', self.space))
+
+    def test_bulk_permission_changes_defers_invalidation(self):
+        user = User.objects.get(pk=self.user.pk)
+        with bulk_permission_changes():
+            assign_perm('workspaces.view_space', self.user, self.space)
+            assign_perm('workspaces.edit_space_content', self.user, self.space)
+        self.assertEqual(self.backend.get_all_permissions(user, self.space), {'view_space', 'edit_space_content'})
+
+    @override_settings(CC_PERMISSION_CACHE_TIMEOUT=300, CC_RESPONSE_CACHE_TIMEOUT=600, CC_CACHE_VERSION_TOKEN_TIMEOUT=60)
+    def test_version_tokens_expire_after_dependent_entries(self):
+        from unittest import mock
+        from core import permission_cache
+        with mock.patch.object(permission_cache.cache, 'add', return_value=True) as mock_add, \
+                mock.patch.object(permission_cache.cache, 'set_many') as mock_set_many:
+            permission_cache.get_versions(['objperm:ver:test'])
+            permission_cache.bump_versions(['objperm:ver:test'])
+        self.assertEqual(mock_add.call_args.kwargs['timeout'], 600)
+        self.assertEqual(mock_set_many.call_args.kwargs['timeout'], 600)
+
+    def test_bump_inside_transaction_is_repeated_on_commit(self):
+        from django.db import transaction
+        from core import permission_cache
+        with self.captureOnCommitCallbacks(execute=False) as callbacks, transaction.atomic():
+            permission_cache.bump_versions(['objperm:ver:commit'])
+            token_in_transaction = permission_cache.get_versions(['objperm:ver:commit'])['objperm:ver:commit']
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]() # A reader that cached rows before the commit used the first new token
+        self.assertNotEqual(permission_cache.get_versions(['objperm:ver:commit'])['objperm:ver:commit'], token_in_transaction)
+
+    def test_shared_cache_serves_new_request_without_queries(self):
+        assign_perm('workspaces.view_space', self.user, self.space)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('workspaces.view_space', self.space))
+        fresh_user = User.objects.get(pk=self.user.pk) # New request, empty memo
+        with self.assertNumQueries(0):
+            self.assertTrue(fresh_user.has_perm('workspaces.view_space', self.space))
+        remove_perm('workspaces.view_space', self.user, self.space)
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('workspaces.view_space', self.space))
+
+    def test_grant_and_revoke_visible_to_next_request(self):
+        self.assertFalse(self._new_request_user().has_perm('workspaces.admin_space', self.space)) # Cached as denied
+        user = self._new_request_user()
+        with self.assertNumQueries(0):
+            self.assertFalse(user.has_perm('workspaces.admin_space', self.space))
+        assign_perm('workspaces.admin_space', self.user, self.space)
+        self.assertTrue(self._new_request_user().has_perm('workspaces.admin_space', self.space))
+        remove_perm('workspaces.admin_space', self.user, self.space)
+        self.assertFalse(self._new_request_user().has_perm('workspaces.admin_space', self.space))
+
+    def test_group_change_visible_to_next_request(self):
+        group = Group.objects.create(name='perm-cache-next-request')
+        assign_perm('workspaces.view_space', group, self.space)
+        self.assertFalse(self._new_request_user().has_perm('workspaces.view_space', self.space))
+        self.user.groups.add(group)
+        self.assertTrue(self._new_request_user().has_perm('workspaces.view_space', self.space))
+        self.user.groups.remove(group)
+        self.assertFalse(self._new_request_user().has_perm('workspaces.view_space', self.space))
+
+    def test_bulk_changes_visible_to_next_request_on_exit(self):
+        self.assertEqual(self.backend.get_all_permissions(self._new_request_user(), self.space), set())
+        other_request_user = self._new_request_user()
+        with bulk_permission_changes():
+            assign_perm('workspaces.view_space', self.user, self.space)
+            assign_perm('workspaces.edit_space_content', self.user, self.space)
+            with self.assertNumQueries(0): # Not invalidated until the block exits: still the cached set
+                self.assertEqual(self.backend.get_all_permissions(other_request_user, self.space), set())
+        self.assertEqual(self.backend.get_all_permissions(self._new_request_user(), self.space), {'view_space', 'edit_space_content'})
+
+
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        self.url = '/debug/metrics/'
+
+    def test_requires_staff_without_token(self):
+        user = get_user_model().objects.create_user(username='metrics_user', password='password')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('conflu_response_cache_requests_total{endpoint="page_detail",result="hit"}', response.content.decode())
+        self.assertIn(f'conflu_build_info{{release="{settings.APP_RELEASE_VERSION}"}} 1', response.content.decode())
+
+    @override_settings(CC_METRICS_TOKEN='scrape-secret')
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import sentry_test_view
+from .views import metrics_view, sentry_test_view
 
 urlpatterns = [
     path('sentry-debug/', sentry_test_view, name='sentry-debug'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
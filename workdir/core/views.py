@@ -1,5 +1,26 @@
+import hmac
+
+from django.conf import settings
 from django.http import HttpResponse
 
+from .metrics import render_prometheus
+
 def sentry_test_view(request):
     1 / 0  # This will raise a ZeroDivisionError, Sentry should capture it.
     return HttpResponse("This should not be reached.") # Should not happen
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for core.metrics counters.
+    With CC_METRICS_TOKEN set, scrapers authenticate with 'Authorization: Bearer <token>';
+    otherwise only staff users (session auth) may read it.
+    """
+    token = getattr(settings, 'CC_METRICS_TOKEN', '')
+    if token:
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(provided.encode(), token.encode()):
+            return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    elif not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,199 @@
+# importer/analysis.py
+"""
+Dry-run analysis of a Confluence export ZIP (ConfluenceUpload.mode == ANALYZE).
+
+Nothing is written to the database and the archive is never extracted: the ZIP's central
+directory gives every member's name and size, only the metadata file (entities.xml) is
+unpacked and parsed, and each HTML page is indexed from its first HEAD_BYTES bytes. The cost
+is therefore proportional to the number of pages and the size of the metadata file, not to
+the size of the export.
+
+The summary stored on ConfluenceUpload.analysis_summary looks like:
+
+    {'pages': {'metadata_pages': 1200, 'html_files': 1195, 'matched_by_id': 1180,
+               'matched_by_title': 10, 'unmatched_count': 10, 'unmatched_ids': [...],
+               'unreferenced_html_count': 5, 'unreferenced_html_files': [...],
+               'duplicate_titles': {'Meeting notes': 14, ...}, 'duplicate_html_ids': [...]},
+     'attachments': {'count': 5400, 'bytes': 8123456789},
+     'macros': {'total': 900, 'by_name': {...}, 'unsupported_total': 120, 'unsupported': {...}},
+     'bytes': {'archive': ..., 'uncompressed': ..., 'html': ..., 'attachments': ..., 'metadata': ...},
+     'metadata_file': 'entities.xml',
+     'estimate': {'seconds': 3600, 'pages_per_second': 0.33, 'based_on_imports': 12},
+     'analysis_seconds': 1.8}
+
+Lists of IDs/filenames are truncated to SAMPLE_LIMIT entries; the *_count fields are exact.
+"""
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from collections import Counter
+
+from .converter import SUPPORTED_MACRO_NAMES
+from .models import ConfluenceUpload
+from .parser import parse_confluence_metadata_for_hierarchy, parse_html_head
+from .utils import PRIORITIZED_METADATA_FILENAMES, SECONDARY_METADATA_FILENAMES
+
+HEAD_BYTES = 32 * 1024
+SAMPLE_LIMIT = 50
+THROUGHPUT_SAMPLE_SIZE = 20 # Most recent completed imports used for the duration estimate
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+# Storage-format macro tags inside entities.xml page bodies, raw or XML-escaped:
+# <ac:structured-macro ac:name="jira"> / &lt;ac:structured-macro ac:name=&quot;jira&quot;
+_MACRO_RE = re.compile(rb'(?:<|&lt;)ac:(?:structured-)?macro\s[^<>]{0,200}?ac:name=(?:"|\'|&quot;)([\w.:-]{1,100})')
+_MACRO_MAX_MATCH = 400 # Upper bound on the length of a _MACRO_RE match
+
+
+def _count_macros(fileobj):
+    """Counter of macro names in a (possibly huge) metadata file, read in chunks."""
+    counts = Counter()
+    carry = b''
+    while True:
+        chunk = fileobj.read(SCAN_CHUNK_SIZE)
+        window = carry + chunk
+        # Matches starting in the last _MACRO_MAX_MATCH bytes may be cut off; they are counted
+        # with the next chunk, which re-reads that tail.
+        limit = len(window) if not chunk else len(window) - _MACRO_MAX_MATCH
+        for match in _MACRO_RE.finditer(window):
+            if match.start() >= limit:
+                break
+            counts[match.group(1).decode('ascii', 'replace').lower()] += 1
+        if not chunk:
+            return counts
+        carry = window[max(limit, 0):]
+
+
+def _select_metadata_member(members):
+    by_name = {}
+    for info in members:
+        by_name.setdefault(os.path.basename(info.filename).lower(), info)
+    for name in PRIORITIZED_METADATA_FILENAMES + SECONDARY_METADATA_FILENAMES:
+        if name in by_name:
+            return by_name[name]
+    return None
+
+
+def _is_attachment_member(filename):
+    return 'attachments' in filename.lower().split('/')[:-1]
+
+
+def analyze_export(zip_file):
+    """
+    Summary dict (see module docstring, without 'estimate') for the export `zip_file`, a path
+    or a seekable binary file object. Raises zipfile.BadZipFile for anything that is not a ZIP.
+    """
+    started = time.monotonic()
+    with zipfile.ZipFile(zip_file) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        metadata_member = _select_metadata_member(members)
+        html_members = [info for info in members if info.filename.lower().endswith(('.html', '.htm'))]
+        attachment_members = [
+            info for info in members
+            if info is not metadata_member and not info.filename.lower().endswith(('.html', '.htm')) and _is_attachment_member(info.filename)
+        ]
+
+        page_hierarchy = []
+        macro_counts = Counter()
+        if metadata_member is not None:
+            temp_dir = tempfile.mkdtemp(prefix='confluence_analysis_')
+            try:
+                metadata_path = zf.extract(metadata_member, temp_dir)
+                page_hierarchy = parse_confluence_metadata_for_hierarchy(metadata_path)
+                if metadata_path.lower().endswith('.xml'):
+                    with open(metadata_path, 'rb') as fh:
+                        macro_counts = _count_macros(fh)
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        # Same indexing rules as import_confluence_space: first file wins for an ID or title.
+        html_id_to_name = {}
+        html_title_to_name = {}
+        duplicate_html_ids = []
+        for info in html_members:
+            with zf.open(info) as fh:
+                head = fh.read(HEAD_BYTES).decode('utf-8', 'replace')
+            parsed = parse_html_head(head)
+            page_id = parsed['html_extracted_page_id']
+            if page_id:
+                if page_id in html_id_to_name:
+                    duplicate_html_ids.append(page_id)
+                else:
+                    html_id_to_name[page_id] = info.filename
+            if parsed['title']:
+                html_title_to_name.setdefault(parsed['title'], info.filename)
+
+    matched_by_id = matched_by_title = 0
+    unmatched_ids = []
+    used_html = set()
+    for page in page_hierarchy:
+        if page['id'] in html_id_to_name:
+            matched_by_id += 1
+            used_html.add(html_id_to_name[page['id']])
+        elif page.get('title') in html_title_to_name:
+            matched_by_title += 1
+            used_html.add(html_title_to_name[page['title']])
+        else:
+            unmatched_ids.append(page['id'])
+    unreferenced_html = [info.filename for info in html_members if info.filename not in used_html]
+    title_counts = Counter(page['title'] for page in page_hierarchy if page.get('title'))
+    unsupported_macros = {name: count for name, count in macro_counts.items() if name not in SUPPORTED_MACRO_NAMES}
+
+    html_bytes = sum(info.file_size for info in html_members)
+    attachment_bytes = sum(info.file_size for info in attachment_members)
+    return {
+        'pages': {
+            'metadata_pages': len(page_hierarchy),
+            'html_files': len(html_members),
+            'matched_by_id': matched_by_id,
+            'matched_by_title': matched_by_title,
+            'unmatched_count': len(unmatched_ids),
+            'unmatched_ids': unmatched_ids[:SAMPLE_LIMIT],
+            'unreferenced_html_count': len(unreferenced_html),
+            'unreferenced_html_files': unreferenced_html[:SAMPLE_LIMIT],
+            'duplicate_titles': dict(Counter({title: n for title, n in title_counts.items() if n > 1}).most_common(SAMPLE_LIMIT)),
+            'duplicate_html_ids': duplicate_html_ids[:SAMPLE_LIMIT],
+        },
+        'attachments': {'count': len(attachment_members), 'bytes': attachment_bytes},
+        'macros': {
+            'total': sum(macro_counts.values()),
+            'by_name': dict(macro_counts.most_common()),
+            'unsupported_total': sum(unsupported_macros.values()),
+            'unsupported': dict(Counter(unsupported_macros).most_common()),
+        },
+        'bytes': {
+            'archive': sum(info.compress_size for info in members),
+            'uncompressed': sum(info.file_size for info in members),
+            'html': html_bytes,
+            'attachments': attachment_bytes,
+            'metadata': metadata_member.file_size if metadata_member is not None else 0,
+        },
+        'metadata_file': metadata_member.filename if metadata_member is not None else None,
+        'analysis_seconds': round(time.monotonic() - started, 3),
+    }
+
+
+def estimate_import_duration(page_count):
+    """
+    Estimated import time for `page_count` pages from the throughput (pages per second,
+    counting failed/skipped pages too) of the most recent completed imports. 'seconds' is
+    None when there is no history yet.
+    """
+    recent = list(ConfluenceUpload.objects.filter(
+        mode=ConfluenceUpload.MODE_IMPORT, status=ConfluenceUpload.STATUS_COMPLETED,
+        started_at__isnull=False, completed_at__isnull=False,
+    ).order_by('-completed_at').values_list(
+        'pages_succeeded_count', 'pages_failed_count', 'started_at', 'completed_at',
+    )[:THROUGHPUT_SAMPLE_SIZE])
+    pages = sum(succeeded + failed for succeeded, failed, _, _ in recent)
+    seconds = sum((completed - started).total_seconds() for _, _, started, completed in recent)
+    if not pages or seconds <= 0:
+        return {'seconds': None, 'pages_per_second': None, 'based_on_imports': len(recent)}
+    pages_per_second = pages / seconds
+    return {
+        'seconds': round(page_count / pages_per_second),
+        'pages_per_second': round(pages_per_second, 3),
+        'based_on_imports': len(recent),
+    }
@@ -0,0 +1,106 @@
+# importer/chunked.py
+"""
+File handling for resumable chunked uploads of Confluence exports (importer.models.ChunkedUpload).
+
+Protocol (see importer.views):
+  1. POST   .../chunked/                 {filename, total_size, sha256?, target_*_id?} -> upload id
+  2. PUT    .../chunked/<id>/            raw chunk body; 'Upload-Offset: <n>' must equal the bytes
+                                         received so far; optional 'Upload-Checksum: sha256 <hex>'
+     GET    .../chunked/<id>/            current received_bytes, to resume after a failure
+  3. POST   .../chunked/<id>/complete/   moves the file into place and starts the import; the
+                                         import task checks the whole-file sha256 before reading it
+
+Chunks are streamed from the request straight into the staging file at their offset, so
+neither the chunk nor the whole file is ever buffered in memory or copied to a second temp file.
+"""
+import hashlib
+import os
+import shutil
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from .models import ConfluenceUpload
+
+READ_SIZE = 1024 * 1024
+
+
+class ChunkError(Exception):
+    """A chunk was rejected; nothing past the chunk's offset was kept."""
+
+
+def write_chunk(upload, stream, offset, length, expected_sha256=None):
+    """
+    Writes `length` bytes read from `stream` to the staging file of `upload` at `offset`.
+    On a short read or checksum mismatch the file is truncated back to `offset` and ChunkError
+    is raised, so a retry of the same chunk starts clean. Returns the new received byte count.
+    """
+    path = upload.staging_path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    with open(path, 'r+b' if os.path.exists(path) else 'w+b') as fh:
+        fh.seek(offset)
+        fh.truncate() # Discard any partial write of a previously failed attempt at this offset
+        remaining = length
+        try:
+            while remaining > 0:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    raise ChunkError(f"Chunk body ended after {length - remaining} of {length} bytes.")
+                fh.write(data)
+                digest.update(data)
+                remaining -= len(data)
+            if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+                raise ChunkError("Chunk checksum mismatch.")
+        except Exception:
+            fh.truncate(offset)
+            raise
+        fh.flush()
+        os.fsync(fh.fileno())
+    return offset + length
+
+
+def checksum_matches(confluence_upload):
+    """
+    False if the upload declared a SHA-256 (chunked uploads) that its stored file does not have.
+    Called by the import tasks, so a multi-gigabyte file is never hashed on the request path.
+    """
+    if not confluence_upload.expected_sha256:
+        return True
+    digest = hashlib.sha256()
+    with confluence_upload.file.open('rb') as fh:
+        for data in iter(lambda: fh.read(READ_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest() == confluence_upload.expected_sha256
+
+
+def storage_name(upload):
+    """A free name in ConfluenceUpload.file storage for the assembled file of `upload`."""
+    field = ConfluenceUpload._meta.get_field('file')
+    return field.storage.get_available_name(field.generate_filename(None, upload.filename))
+
+
+def move_into_storage(upload, name):
+    """
+    Moves the assembled staging file into ConfluenceUpload.file storage as `name` (from
+    storage_name()) and returns the stored name, which remote storages may still change. On
+    local storage this is a rename (no copy of a multi-gigabyte file). If it fails, the staging
+    file is left in place.
+    """
+    storage = ConfluenceUpload._meta.get_field('file').storage
+    if isinstance(storage, FileSystemStorage):
+        final_path = storage.path(name)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        shutil.move(upload.staging_path, final_path) # A rename when staging is on the same filesystem
+        return name
+    with open(upload.staging_path, 'rb') as fh:
+        name = storage.save(name, File(fh))
+    os.remove(upload.staging_path)
+    return name
+
+
+def discard(upload):
+    try:
+        os.remove(upload.staging_path)
+    except FileNotFoundError:
+        pass
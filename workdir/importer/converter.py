@@ -3,6 +3,48 @@ from urllib.parse import unquote
 import os
 import json # For __main__ block pretty printing
 import re # For parsing language from class attributes
+import uuid
+
+# Confluence macros (storage-format names) the converter turns into native nodes: information
+# panels become blockquotes with a panelType, code/noformat become code blocks. Anything else
+# loses its macro semantics on import (used by importer.analysis to report unsupported macros).
+SUPPORTED_MACRO_NAMES = frozenset({'info', 'note', 'warning', 'tip', 'code', 'noformat'})
+
+# Unsupported macros are replaced by an atomic 'fallbackMacroPlaceholder' block node (the name the
+# editor registers) whose placeholderId matches FallbackMacro.placeholder_id_in_content; the raw HTML is kept there.
+FALLBACK_PLACEHOLDER_ATTR = 'data-conflu-fallback-placeholder'
+_STORAGE_MACRO_TAGS = ('ac:structured-macro', 'ac:macro')
+# Macros inside inline content (status lozenges, inline Jira links...) keep their rendered text:
+# a block placeholder cannot sit inside a paragraph.
+_INLINE_CONTEXT_TAGS = frozenset({'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'span', 'a', 'strong', 'b', 'em', 'i', 'code'})
+
+
+def _macro_name(tag):
+    """Macro name of a storage-format macro tag or a rendered macro wrapper, else None."""
+    if tag.name in _STORAGE_MACRO_TAGS:
+        name = tag.get('ac:name')
+    else:
+        name = tag.get('data-macro-name')
+    return name.strip().lower() if name and name.strip() else None
+
+
+def _mark_fallback_macros(root, fallback_macros):
+    """
+    Tags every outermost unsupported macro under `root` with a placeholder ID (which
+    process_node turns into a placeholder node) and appends its raw HTML to `fallback_macros`.
+    """
+    marked = set()
+    for tag in root.find_all(lambda t: t.name in _STORAGE_MACRO_TAGS or t.has_attr('data-macro-name')):
+        macro_name = _macro_name(tag)
+        if not macro_name or macro_name in SUPPORTED_MACRO_NAMES or tag.name in _INLINE_CONTEXT_TAGS:
+            continue
+        if any(id(parent) in marked or parent.name in _INLINE_CONTEXT_TAGS for parent in tag.parents):
+            continue
+        placeholder_id = str(uuid.uuid4())
+        fallback_macros.append({'placeholder_id': placeholder_id, 'macro_name': macro_name, 'raw_macro_content': str(tag)})
+        tag[FALLBACK_PLACEHOLDER_ATTR] = placeholder_id
+        tag['data-conflu-fallback-name'] = macro_name
+        marked.add(id(tag))
 
 def map_tag_to_prosemirror_type(tag_name, node=None): # Added node for class inspection
     """Maps HTML tag names to ProseMirror node or mark types."""
@@ -59,6 +101,10 @@ def process_node(node, current_marks=None, parent_pm_type=None):
             return [{"type": "image", "attrs": attrs}]
         elif node.name == 'hr': # Handle hr as a specific void block
             return [{"type": "horizontal_rule"}]
+        elif node.has_attr(FALLBACK_PLACEHOLDER_ATTR): # Marked by _mark_fallback_macros
+            return [{"type": "fallbackMacroPlaceholder", "attrs": {
+                "macroName": node['data-conflu-fallback-name'], "placeholderId": node[FALLBACK_PLACEHOLDER_ATTR],
+            }}]
         # Removed 'br' from here as it's better handled by map_tag_to_prosemirror_type and default block logic
 
         # Confluence Panel Div Check
@@ -296,10 +342,18 @@ def process_node(node, current_marks=None, parent_pm_type=None):
 
     return []
 
-def convert_html_to_prosemirror_json(html_string):
+def convert_html_to_prosemirror_json(html_string, fallback_macros=None):
+    """
+    Converts Confluence export HTML to a ProseMirror doc. When `fallback_macros` is a list,
+    unsupported macros become placeholder nodes and a dict per macro (placeholder_id,
+    macro_name, raw_macro_content) is appended to it for FallbackMacro records; otherwise
+    their rendered content is converted like any other HTML.
+    """
     if not html_string: return {"type": "doc", "content": []}
     soup = BeautifulSoup(html_string, 'lxml')
     parse_target = soup.body if soup.body else soup
+    if fallback_macros is not None:
+        _mark_fallback_macros(parse_target, fallback_macros)
     doc_content = []
     for element in parse_target.children:
         processed_elements = process_node(element, parent_pm_type=None)
@@ -0,0 +1,51 @@
+# importer/error_log.py
+"""
+Errors of a running import, written to ImportErrorLog as they happen.
+
+import_confluence_space used to collect every error message in a list and join it into
+ConfluenceUpload.error_details at the end, truncated to 2000 characters: a 100k-page export
+with a broken attachment folder held every message in memory and kept only the first few.
+ImportErrors buffers messages and writes them with one bulk insert per flush() (the import
+flushes between page batches, outside their transactions, so a rolled-back page does not
+take its error rows with it). Only the first SUMMARY_MAX_CHARS characters of messages stay in
+memory, for error_details.
+"""
+from .models import ImportErrorLog
+
+SUMMARY_MAX_CHARS = 2000
+_SUMMARY_RESERVE = 100 # Room for the "... and N more" line
+
+
+class ImportErrors:
+    def __init__(self, upload):
+        self.upload = upload
+        self.count = 0
+        self._pending = []
+        self._summary_lines = []
+        self._summary_chars = 0
+
+    def add(self, message, page_id=None, first=False):
+        """Records `message`; `first` puts it ahead of the others in the summary (a critical error)."""
+        self.count += 1
+        self._pending.append(ImportErrorLog(upload=self.upload, page_original_id=page_id, message=message))
+        if first:
+            self._summary_lines.insert(0, message)
+            self._summary_chars += len(message) + 1
+        elif self._summary_chars + len(message) + 1 <= SUMMARY_MAX_CHARS - _SUMMARY_RESERVE:
+            self._summary_lines.append(message)
+            self._summary_chars += len(message) + 1
+
+    def flush(self):
+        if self._pending:
+            ImportErrorLog.objects.bulk_create(self._pending)
+            self._pending = []
+
+    def __len__(self):
+        return self.count
+
+    def summary(self):
+        text = "\n".join(self._summary_lines)
+        omitted = self.count - len(self._summary_lines)
+        if omitted:
+            text += f"\n... and {omitted} more (see the import's error log)."
+        return text
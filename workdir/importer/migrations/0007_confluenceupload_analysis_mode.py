@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0006_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='analysis_summary',
+            field=models.JSONField(blank=True, help_text='Counts, sizes and duration estimate from an ANALYZE run (see importer.analysis).', null=True),
+        ),
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, help_text='When the task finished (successfully or not).', null=True),
+        ),
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='mode',
+            field=models.CharField(choices=[('IMPORT', 'Import'), ('ANALYZE', 'Analyze only (dry run)')], default='IMPORT', help_text='IMPORT creates pages; ANALYZE only inspects the export and fills analysis_summary.', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='started_at',
+            field=models.DateTimeField(blank=True, help_text='When the task started processing this upload.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='confluenceupload',
+            name='progress_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('EXTRACTING', 'Extracting Files'), ('PARSING_METADATA', 'Parsing Metadata'), ('PROCESSING_PAGES', 'Processing Pages'), ('LINKING_HIERARCHY', 'Linking Hierarchy'), ('ANALYZING', 'Analyzing Export'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', help_text='Detailed status of the import process for progress tracking.', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='confluenceupload',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('EXTRACTING', 'Extracting Files'), ('PARSING_METADATA', 'Parsing Metadata'), ('PROCESSING_PAGES', 'Processing Pages'), ('LINKING_HIERARCHY', 'Linking Hierarchy'), ('ANALYZING', 'Analyzing Export'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', help_text='Current status of the import process.', max_length=20),
+        ),
+    ]
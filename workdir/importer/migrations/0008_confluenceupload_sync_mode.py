@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0007_confluenceupload_analysis_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='delete_missing',
+            field=models.BooleanField(default=False, help_text='SYNC only: soft-delete imported pages of the target space that are no longer in the export.'),
+        ),
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='pages_deleted_count',
+            field=models.IntegerField(default=0, help_text='SYNC with delete_missing: pages soft-deleted because they left the export.'),
+        ),
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='pages_unchanged_count',
+            field=models.IntegerField(default=0, help_text='SYNC: existing pages left untouched because their source is unchanged.'),
+        ),
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='pages_updated_count',
+            field=models.IntegerField(default=0, help_text='SYNC: existing pages updated because their source changed.'),
+        ),
+        migrations.AlterField(
+            model_name='confluenceupload',
+            name='mode',
+            field=models.CharField(choices=[('IMPORT', 'Import'), ('SYNC', 'Incremental sync'), ('ANALYZE', 'Analyze only (dry run)')], default='IMPORT', help_text='IMPORT creates pages and skips existing ones; SYNC also updates pages whose source changed; ANALYZE only inspects the export and fills analysis_summary.', max_length=10),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0008_confluenceupload_sync_mode'),
+        ('workspaces', '0003_alter_space_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, help_text='When the scheduler handed the upload to a worker (importer.scheduling).', null=True),
+        ),
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, help_text='Size of the export in bytes; smaller imports are scheduled first.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='confluenceupload',
+            name='progress_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('QUEUED', 'Queued'), ('EXTRACTING', 'Extracting Files'), ('PARSING_METADATA', 'Parsing Metadata'), ('PROCESSING_PAGES', 'Processing Pages'), ('LINKING_HIERARCHY', 'Linking Hierarchy'), ('ANALYZING', 'Analyzing Export'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', help_text='Detailed status of the import process for progress tracking.', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='confluenceupload',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('QUEUED', 'Queued'), ('EXTRACTING', 'Extracting Files'), ('PARSING_METADATA', 'Parsing Metadata'), ('PROCESSING_PAGES', 'Processing Pages'), ('LINKING_HIERARCHY', 'Linking Hierarchy'), ('ANALYZING', 'Analyzing Export'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', help_text='Current status of the import process.', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='confluenceupload',
+            index=models.Index(fields=['status', 'uploaded_at'], name='confluence_upload_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0009_confluenceupload_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='phase_metrics',
+            field=models.JSONField(blank=True, help_text='Wall/CPU time and item counts per import phase (see importer.instrumentation).', null=True),
+        ),
+    ]
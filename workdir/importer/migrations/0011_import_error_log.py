@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0010_confluenceupload_phase_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='error_count',
+            field=models.IntegerField(default=0, help_text='Errors recorded by the last run; all of them are in ImportErrorLog.'),
+        ),
+        migrations.CreateModel(
+            name='ImportErrorLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_original_id', models.CharField(blank=True, help_text='Confluence ID of the page concerned, if any.', max_length=255, null=True)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='error_log', to='importer.confluenceupload')),
+            ],
+            options={
+                'verbose_name': 'Import Error',
+                'verbose_name_plural': 'Import Errors',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:44
+
+import importer.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0011_import_error_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, default=importer.models.chunked_upload_expiry, help_text='Pushed back by every chunk; an UPLOADING upload past it is abandoned.'),
+        ),
+        migrations.AddField(
+            model_name='confluenceupload',
+            name='expected_sha256',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 declared by a chunked upload; the task verifies the file against it before reading it.', max_length=64),
+        ),
+    ]
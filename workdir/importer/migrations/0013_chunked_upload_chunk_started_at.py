@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0012_chunked_upload_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='chunk_started_at',
+            field=models.DateTimeField(blank=True, help_text='Set while a chunk is being written; other chunks are refused until it is cleared or stale.', null=True),
+        ),
+    ]
@@ -32,6 +32,7 @@ class FallbackMacro(models.Model): # Existing model, ensure it's preserved
 class ConfluenceUpload(models.Model):
     STATUS_PENDING = 'PENDING'
     STATUS_PENDING = 'PENDING'
+    STATUS_QUEUED = 'QUEUED' # Waiting for an import slot (importer.scheduling)
     STATUS_PROCESSING = 'PROCESSING'
     STATUS_COMPLETED = 'COMPLETED'
     STATUS_FAILED = 'FAILED'
@@ -40,14 +41,26 @@ class ConfluenceUpload(models.Model):
     STATUS_PARSING_METADATA = 'PARSING_METADATA'
     STATUS_PROCESSING_PAGES = 'PROCESSING_PAGES'
     STATUS_LINKING_HIERARCHY = 'LINKING_HIERARCHY'
+    STATUS_ANALYZING = 'ANALYZING'
+
+    MODE_IMPORT = 'IMPORT'
+    MODE_SYNC = 'SYNC'
+    MODE_ANALYZE = 'ANALYZE'
+    MODE_CHOICES = [
+        (MODE_IMPORT, 'Import'),
+        (MODE_SYNC, 'Incremental sync'),
+        (MODE_ANALYZE, 'Analyze only (dry run)'),
+    ]
 
 
     STATUS_CHOICES = [
         (STATUS_PENDING, 'Pending'),
+        (STATUS_QUEUED, 'Queued'),
         (STATUS_EXTRACTING, 'Extracting Files'),
         (STATUS_PARSING_METADATA, 'Parsing Metadata'),
         (STATUS_PROCESSING_PAGES, 'Processing Pages'),
         (STATUS_LINKING_HIERARCHY, 'Linking Hierarchy'),
+        (STATUS_ANALYZING, 'Analyzing Export'),
         (STATUS_PROCESSING, 'Processing'), # Generic processing, can be fallback
         (STATUS_COMPLETED, 'Completed'),
         (STATUS_FAILED, 'Failed'),
@@ -114,17 +127,112 @@ class ConfluenceUpload(models.Model):
     pages_succeeded_count = models.IntegerField(default=0, help_text="Number of pages successfully imported.")
     pages_failed_count = models.IntegerField(default=0, help_text="Number of pages that failed to import.")
     attachments_succeeded_count = models.IntegerField(default=0, help_text="Number of attachments successfully processed.")
+    pages_updated_count = models.IntegerField(default=0, help_text="SYNC: existing pages updated because their source changed.")
+    pages_unchanged_count = models.IntegerField(default=0, help_text="SYNC: existing pages left untouched because their source is unchanged.")
+    pages_deleted_count = models.IntegerField(default=0, help_text="SYNC with delete_missing: pages soft-deleted because they left the export.")
 
     progress_message = models.TextField(null=True, blank=True, help_text="Current stage or progress message of the import.") # Changed to TextField
     error_details = models.TextField(null=True, blank=True, help_text="Summary of errors encountered during import.")
+    error_count = models.IntegerField(default=0, help_text="Errors recorded by the last run; all of them are in ImportErrorLog.")
+
+    mode = models.CharField(
+        max_length=10,
+        choices=MODE_CHOICES,
+        default=MODE_IMPORT,
+        help_text="IMPORT creates pages and skips existing ones; SYNC also updates pages whose source changed; ANALYZE only inspects the export and fills analysis_summary."
+    )
+    delete_missing = models.BooleanField(default=False, help_text="SYNC only: soft-delete imported pages of the target space that are no longer in the export.")
+    phase_metrics = models.JSONField(null=True, blank=True, help_text="Wall/CPU time and item counts per import phase (see importer.instrumentation).")
+    analysis_summary = models.JSONField(null=True, blank=True, help_text="Counts, sizes and duration estimate from an ANALYZE run (see importer.analysis).")
+    file_size = models.BigIntegerField(null=True, blank=True, help_text="Size of the export in bytes; smaller imports are scheduled first.")
+    expected_sha256 = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 declared by a chunked upload; the task verifies the file against it before reading it.")
+    dispatched_at = models.DateTimeField(null=True, blank=True, help_text="When the scheduler handed the upload to a worker (importer.scheduling).")
+    started_at = models.DateTimeField(null=True, blank=True, help_text="When the task started processing this upload.")
+    completed_at = models.DateTimeField(null=True, blank=True, help_text="When the task finished (successfully or not).")
 
     class Meta:
         ordering = ['-uploaded_at']
         verbose_name = "Confluence Upload"
         verbose_name_plural = "Confluence Uploads"
         app_label = 'importer'
+        indexes = [
+            # The scheduler's queue order (importer.scheduling.queued_uploads)
+            models.Index(fields=['status', 'uploaded_at'], name='confluence_upload_queue_idx'),
+        ]
 
     def __str__(self):
         username = self.user.get_username() if self.user else 'Anonymous'
         file_name = os.path.basename(self.file.name) if self.file and self.file.name else "No file"
         return f"Import ID {self.pk or 'Unsaved'} ({file_name}) by {username} - Status: {self.get_status_display()}"
+
+
+class ImportErrorLog(models.Model):
+    """
+    One problem met by an import (a skipped page, a missing attachment...). Written in batches
+    while the import runs (importer.error_log); ConfluenceUpload.error_details only keeps the
+    first of them.
+    """
+    upload = models.ForeignKey(ConfluenceUpload, on_delete=models.CASCADE, related_name='error_log')
+    page_original_id = models.CharField(max_length=255, null=True, blank=True, help_text="Confluence ID of the page concerned, if any.")
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name = "Import Error"
+        verbose_name_plural = "Import Errors"
+        app_label = 'importer'
+
+    def __str__(self):
+        return f"Upload {self.upload_id}: {self.message[:80]}"
+
+
+def chunked_upload_expiry():
+    from datetime import timedelta
+    from django.conf import settings
+    from django.utils import timezone
+    return timezone.now() + timedelta(seconds=settings.CC_CHUNKED_UPLOAD_EXPIRY)
+
+
+class ChunkedUpload(models.Model):
+    """
+    A Confluence export ZIP being uploaded in chunks (see importer.views.ChunkedUploadInitView).
+    Chunks are written in order, straight into a staging file; once complete, the file is
+    moved into ConfluenceUpload storage and the import is dispatched. An upload that receives
+    no chunk for CC_CHUNKED_UPLOAD_EXPIRY seconds is deleted with its staging file
+    (importer.tasks.delete_expired_chunked_uploads).
+    """
+    STATUS_UPLOADING = 'UPLOADING'
+    STATUS_COMPLETE = 'COMPLETE'
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, 'Uploading'),
+        (STATUS_COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False) # Unguessable upload handle
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(help_text="Declared size of the complete file in bytes.")
+    received_bytes = models.BigIntegerField(default=0, help_text="Bytes written so far; the next chunk must start here.")
+    sha256 = models.CharField(max_length=64, blank=True, default='', help_text="Optional expected SHA-256 of the complete file.")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    target_workspace = models.ForeignKey('workspaces.Workspace', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    target_space = models.ForeignKey('workspaces.Space', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    confluence_upload = models.OneToOneField(ConfluenceUpload, on_delete=models.SET_NULL, null=True, blank=True, related_name='chunked_upload')
+    expires_at = models.DateTimeField(default=chunked_upload_expiry, db_index=True, help_text="Pushed back by every chunk; an UPLOADING upload past it is abandoned.")
+    chunk_started_at = models.DateTimeField(null=True, blank=True, help_text="Set while a chunk is being written; other chunks are refused until it is cleared or stale.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Chunked Upload"
+        verbose_name_plural = "Chunked Uploads"
+        app_label = 'importer'
+
+    def __str__(self):
+        return f"Chunked upload {self.pk} ({self.filename}) {self.received_bytes}/{self.total_size}"
+
+    @property
+    def staging_path(self):
+        from django.conf import settings
+        return os.path.join(settings.CC_CHUNKED_UPLOAD_DIR, f'{self.pk}.part')
@@ -1,6 +1,7 @@
 from bs4 import BeautifulSoup
 import os
 import re # Added for comment parsing
+import html
 from urllib.parse import unquote
 
 def parse_html_file_basic(html_file_path):
@@ -163,45 +164,121 @@ def parse_html_file_basic(html_file_path):
 # I will manually ensure they are correctly placed when saving the final file.
 # For the purpose of this tool, I'm only showing the modified function and necessary imports.
 
+_HEAD_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_HEAD_H1_RE = re.compile(r"<h1[^>]*>(.*?)</h1>", re.IGNORECASE | re.DOTALL)
+_HEAD_PAGE_ID_RES = [
+    re.compile(r"""<meta\s[^>]*name=["']ajs-page-id["'][^>]*content=["']\s*([^"'\s]+)""", re.IGNORECASE),
+    re.compile(r"""<meta\s[^>]*name=["']confluence-page-id["'][^>]*content=["']\s*([^"'\s]+)""", re.IGNORECASE),
+    re.compile(r"<!--\s*(?:pageId|confluence-page-id)\s*:\s*(\d+)\s*-->", re.IGNORECASE),
+    re.compile(r"<!--\s*content-id\s*:\s*(\d+)\s*-->", re.IGNORECASE),
+]
+_TAG_RE = re.compile(r"<[^>]+>")
+
+def parse_html_head(html_head):
+    """
+    Title and embedded page ID from the first few kilobytes of a Confluence HTML file, with the
+    same precedence as parse_html_file_basic() but using regular expressions only, so an export
+    can be indexed without reading or parsing each page body (see importer.analysis).
+    """
+    title = None
+    match = _HEAD_TITLE_RE.search(html_head) or _HEAD_H1_RE.search(html_head)
+    if match:
+        title = " ".join(html.unescape(_TAG_RE.sub(" ", match.group(1))).split()) or None
+    page_id = None
+    for pattern in _HEAD_PAGE_ID_RES:
+        match = pattern.search(html_head)
+        if match:
+            page_id = match.group(1).strip()
+            break
+    if page_id and not title:
+        title = f"Page {page_id}"
+    return {"title": title, "html_extracted_page_id": page_id}
+
+
 import xml.etree.ElementTree as ET
 
+class PageRecord:
+    """One <object class="Page"> of the metadata file; slotted, so 100k of them stay small."""
+    __slots__ = ('id', 'title', 'parent_id')
+
+    def __init__(self, id, title=None, parent_id=None):
+        self.id = id
+        self.title = title
+        self.parent_id = parent_id
+
+    def as_dict(self):
+        return {'id': self.id, 'title': self.title, 'parent_id': self.parent_id}
+
+    def __repr__(self):
+        return f"PageRecord(id={self.id!r}, title={self.title!r}, parent_id={self.parent_id!r})"
+
+
+def _page_record(obj_element):
+    page_info = {'id': None, 'title': None, 'parent_id': None}
+    id_prop = obj_element.find("./property[@name='id']/long")
+    if id_prop is not None and id_prop.text:
+        page_info['id'] = id_prop.text.strip()
+    title_prop = obj_element.find("./property[@name='title']/string")
+    if title_prop is not None and title_prop.text:
+        page_info['title'] = title_prop.text.strip()
+    elif title_prop is None:
+         title_prop_alt = obj_element.find("./property[@name='title']")
+         if title_prop_alt is not None and title_prop_alt.text and not title_prop_alt.findall("*"):
+             page_info['title'] = title_prop_alt.text.strip()
+    parent_prop = obj_element.find("./property[@name='parent']")
+    if parent_prop is not None:
+        parent_id_elem = parent_prop.find("./id")
+        if parent_id_elem is not None and parent_id_elem.text:
+            page_info['parent_id'] = parent_id_elem.text.strip()
+        else:
+            parent_obj_id_prop = parent_prop.find("./object[@class='Page']/property[@name='id']/long")
+            if parent_obj_id_prop is not None and parent_obj_id_prop.text:
+                 page_info['parent_id'] = parent_obj_id_prop.text.strip()
+    if page_info['parent_id'] is None:
+        parent_page_prop = obj_element.find("./property[@name='parentPage']/id")
+        if parent_page_prop is not None and parent_page_prop.text:
+            page_info['parent_id'] = parent_page_prop.text.strip()
+    if not page_info['id']:
+        print(f"  Skipping an <object class='Page'> element, could not determine its ID.")
+        return None
+    return PageRecord(**page_info)
+
+
+def iter_confluence_metadata_pages(metadata_file_path):
+    """
+    Yields a PageRecord per page of the metadata file, in document order, without building the
+    whole tree: each top-level element (page, body content, attachment...) is dropped as soon
+    as it has been read, so memory is bounded by the largest single object rather than by
+    entities.xml, which holds every page body. Raises ET.ParseError on malformed XML, possibly
+    after some records have been yielded.
+    """
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(metadata_file_path, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue # Nested elements are read with their top-level ancestor
+        page_elements = [elem] if elem.tag == 'object' and elem.get('class') == 'Page' else []
+        page_elements.extend(elem.findall(".//object[@class='Page']"))
+        for obj_element in page_elements:
+            record = _page_record(obj_element)
+            if record:
+                yield record
+        root.clear()
+
+
 def parse_confluence_metadata_for_hierarchy(metadata_file_path):
     hierarchy_data = []
     if not metadata_file_path or not os.path.exists(metadata_file_path):
         print(f"Metadata file not found or path is invalid: {metadata_file_path}")
         return hierarchy_data
     try:
-        tree = ET.parse(metadata_file_path)
-        root = tree.getroot()
-        for obj_element in root.findall(".//object[@class='Page']"):
-            page_info = {'id': None, 'title': None, 'parent_id': None}
-            id_prop = obj_element.find("./property[@name='id']/long")
-            if id_prop is not None and id_prop.text:
-                page_info['id'] = id_prop.text.strip()
-            title_prop = obj_element.find("./property[@name='title']/string")
-            if title_prop is not None and title_prop.text:
-                page_info['title'] = title_prop.text.strip()
-            elif title_prop is None:
-                 title_prop_alt = obj_element.find("./property[@name='title']")
-                 if title_prop_alt is not None and title_prop_alt.text and not title_prop_alt.findall("*"):
-                     page_info['title'] = title_prop_alt.text.strip()
-            parent_prop = obj_element.find("./property[@name='parent']")
-            if parent_prop is not None:
-                parent_id_elem = parent_prop.find("./id")
-                if parent_id_elem is not None and parent_id_elem.text:
-                    page_info['parent_id'] = parent_id_elem.text.strip()
-                else:
-                    parent_obj_id_prop = parent_prop.find("./object[@class='Page']/property[@name='id']/long")
-                    if parent_obj_id_prop is not None and parent_obj_id_prop.text:
-                         page_info['parent_id'] = parent_obj_id_prop.text.strip()
-            if page_info['parent_id'] is None:
-                parent_page_prop = obj_element.find("./property[@name='parentPage']/id")
-                if parent_page_prop is not None and parent_page_prop.text:
-                    page_info['parent_id'] = parent_page_prop.text.strip()
-            if page_info['id']:
-                hierarchy_data.append(page_info)
-            else:
-                print(f"  Skipping an <object class='Page'> element, could not determine its ID.")
+        hierarchy_data = [record.as_dict() for record in iter_confluence_metadata_pages(metadata_file_path)]
     except ET.ParseError as e:
         print(f"Error parsing XML metadata file {metadata_file_path}: {e}")
     except Exception as e:
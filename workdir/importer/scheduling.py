@@ -0,0 +1,129 @@
+# importer/scheduling.py
+"""
+Admission control for Confluence imports (IMPORT and SYNC uploads; ANALYZE runs are short and
+bypass it).
+
+Uploads are not sent to Celery straight away. submit() marks them QUEUED and dispatch_queued()
+starts as many as the limits allow:
+  - CC_IMPORT_MAX_CONCURRENT imports in total,
+  - CC_IMPORT_MAX_CONCURRENT_PER_USER per uploader,
+  - CC_IMPORT_MAX_CONCURRENT_PER_WORKSPACE per target workspace,
+so one tenant uploading ten spaces holds at most a few slots and everyone else keeps moving.
+Exports up to CC_IMPORT_SMALL_MAX_BYTES go ahead of larger ones and are sent to the
+CC_IMPORT_SMALL_QUEUE, which the import workers also serve, so a small import is never stuck
+behind a multi-hour one. A large export that has waited CC_IMPORT_LARGE_PROMOTE_AFTER seconds
+ranks with the small ones (by upload time), so a steady stream of small uploads cannot starve
+it. The queue is drained again whenever an import task finishes.
+
+An upload holds a slot while PROCESSING, for at most CC_IMPORT_SLOT_TIMEOUT seconds after
+dispatch, so a lost worker cannot block its tenant forever.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import ConfluenceUpload
+from .tasks import import_confluence_space
+
+
+def queued_uploads(now=None):
+    """
+    QUEUED uploads in the order they are considered for a slot: small exports and large ones
+    queued for over CC_IMPORT_LARGE_PROMOTE_AFTER seconds first, then FIFO.
+    """
+    promote_before = (now or timezone.now()) - timedelta(seconds=settings.CC_IMPORT_LARGE_PROMOTE_AFTER)
+    return ConfluenceUpload.objects.filter(status=ConfluenceUpload.STATUS_QUEUED).annotate(
+        size_class=Case(
+            When(file_size__lte=settings.CC_IMPORT_SMALL_MAX_BYTES, then=Value(0)),
+            When(uploaded_at__lte=promote_before, then=Value(0)),
+            default=Value(1), output_field=IntegerField(),
+        )
+    ).order_by('size_class', 'uploaded_at', 'pk')
+
+
+def active_uploads():
+    cutoff = timezone.now() - timedelta(seconds=settings.CC_IMPORT_SLOT_TIMEOUT)
+    return ConfluenceUpload.objects.filter(status=ConfluenceUpload.STATUS_PROCESSING, dispatched_at__gte=cutoff)
+
+
+def queue_position(upload):
+    """1-based position of a QUEUED upload in the scheduler's order, None once it has left the queue."""
+    if upload.status != ConfluenceUpload.STATUS_QUEUED:
+        return None
+    queued = queued_uploads(now=timezone.now())
+    own = queued.filter(pk=upload.pk).values_list('size_class', 'uploaded_at').first()
+    if own is None:
+        return None
+    size_class, uploaded_at = own
+    # Rows ahead in the (size_class, uploaded_at, pk) order, counted by the database.
+    return queued.filter(
+        Q(size_class__lt=size_class)
+        | Q(size_class=size_class, uploaded_at__lt=uploaded_at)
+        | Q(size_class=size_class, uploaded_at=uploaded_at, pk__lt=upload.pk)
+    ).count() + 1
+
+
+def _queue_for(upload):
+    if upload.file_size is not None and upload.file_size <= settings.CC_IMPORT_SMALL_MAX_BYTES:
+        return settings.CC_IMPORT_SMALL_QUEUE
+    return settings.CC_IMPORT_QUEUE
+
+
+def submit(upload):
+    """Puts a newly created IMPORT/SYNC upload in the queue and starts it if a slot is free."""
+    try:
+        upload.file_size = upload.file.size
+    except (OSError, ValueError):
+        upload.file_size = None # Treated as a large import
+    upload.status = ConfluenceUpload.STATUS_QUEUED
+    upload.progress_status = ConfluenceUpload.STATUS_QUEUED
+    upload.progress_message = "Queued for import."
+    upload.save(update_fields=['file_size', 'status', 'progress_status', 'progress_message'])
+    dispatch_queued()
+
+
+def dispatch_queued():
+    """
+    Starts queued uploads while slots are free; returns the uploads dispatched. Concurrent
+    callers are serialized by locking the queued and running rows, so limits are never exceeded.
+    """
+    dispatched = []
+    with transaction.atomic():
+        # Lock only; the counts below are read after the lock is held.
+        list(ConfluenceUpload.objects.select_for_update().filter(
+            status__in=[ConfluenceUpload.STATUS_QUEUED, ConfluenceUpload.STATUS_PROCESSING]
+        ).values_list('pk', flat=True))
+
+        running = list(active_uploads().values_list('user_id', 'target_workspace_id'))
+        free_slots = settings.CC_IMPORT_MAX_CONCURRENT - len(running)
+        per_user, per_workspace = {}, {}
+        for user_id, workspace_id in running:
+            per_user[user_id] = per_user.get(user_id, 0) + 1
+            if workspace_id:
+                per_workspace[workspace_id] = per_workspace.get(workspace_id, 0) + 1
+
+        for upload in queued_uploads():
+            if free_slots <= 0:
+                break
+            if per_user.get(upload.user_id, 0) >= settings.CC_IMPORT_MAX_CONCURRENT_PER_USER:
+                continue
+            if upload.target_workspace_id and per_workspace.get(upload.target_workspace_id, 0) >= settings.CC_IMPORT_MAX_CONCURRENT_PER_WORKSPACE:
+                continue
+            upload.status = ConfluenceUpload.STATUS_PROCESSING
+            upload.progress_status = ConfluenceUpload.STATUS_PENDING
+            upload.progress_message = "Waiting for an import worker..."
+            upload.dispatched_at = timezone.now()
+            upload.save(update_fields=['status', 'progress_status', 'progress_message', 'dispatched_at'])
+            free_slots -= 1
+            per_user[upload.user_id] = per_user.get(upload.user_id, 0) + 1
+            if upload.target_workspace_id:
+                per_workspace[upload.target_workspace_id] = per_workspace.get(upload.target_workspace_id, 0) + 1
+            dispatched.append(upload)
+
+    # Sent after commit, so the worker sees the PROCESSING row.
+    for upload in dispatched:
+        import_confluence_space.apply_async(kwargs={'confluence_upload_id': upload.id}, queue=_queue_for(upload))
+    return dispatched
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import ConfluenceUpload
+from .models import ChunkedUpload, ConfluenceUpload
+from .scheduling import queue_position
 # Workspace and Space models are not directly used for defining serializer fields here,
 # but their instances will be used by the view to populate the ConfluenceUpload instance.
 
@@ -13,6 +14,7 @@ class ConfluenceUploadSerializer(serializers.ModelSerializer):
 
     file_url = serializers.SerializerMethodField(read_only=True)
     progress_status_display = serializers.CharField(source='get_progress_status_display', read_only=True) # For human-readable status
+    queue_position = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = ConfluenceUpload
@@ -38,6 +40,19 @@ class ConfluenceUploadSerializer(serializers.ModelSerializer):
             'attachments_succeeded_count',
             'progress_message',
             'error_details',
+            'error_count',
+            'pages_updated_count',
+            'pages_unchanged_count',
+            'pages_deleted_count',
+            'mode',
+            'delete_missing',
+            'analysis_summary',
+            'phase_metrics',
+            'queue_position',
+            'file_size',
+            'dispatched_at',
+            'started_at',
+            'completed_at',
         ]
 
         read_only_fields = [
@@ -59,7 +74,18 @@ class ConfluenceUploadSerializer(serializers.ModelSerializer):
             'attachments_succeeded_count',
             'progress_message',
             'error_details',
-            'file_url'
+            'error_count',
+            'file_url',
+            'pages_updated_count',
+            'pages_unchanged_count',
+            'pages_deleted_count',
+            'analysis_summary',
+            'phase_metrics',
+            'queue_position',
+            'file_size',
+            'dispatched_at',
+            'started_at',
+            'completed_at',
         ]
 
         extra_kwargs = {
@@ -68,6 +94,9 @@ class ConfluenceUploadSerializer(serializers.ModelSerializer):
             'target_space': {'read_only': True}
         }
 
+    def get_queue_position(self, obj):
+        return queue_position(obj)
+
     def get_file_url(self, obj):
         request = self.context.get('request')
         if obj.file and hasattr(obj.file, 'url'):
@@ -94,3 +123,30 @@ class FallbackMacroSerializer(serializers.ModelSerializer):
             'page_title',      # Context: title of the page this macro belongs to
         ]
         read_only_fields = fields # Typically, these details are read-only once created by importer
+
+
+from .models import ImportErrorLog
+
+class ImportErrorLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportErrorLog
+        fields = ['id', 'page_original_id', 'message', 'created_at']
+        read_only_fields = fields
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    upload_id = serializers.UUIDField(source='id', read_only=True)
+    max_chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = [
+            'upload_id', 'filename', 'total_size', 'received_bytes', 'sha256', 'status',
+            'target_workspace', 'target_space', 'confluence_upload', 'max_chunk_size',
+            'expires_at', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+    def get_max_chunk_size(self, obj):
+        from django.conf import settings
+        return settings.CC_CHUNKED_UPLOAD_MAX_CHUNK_SIZE
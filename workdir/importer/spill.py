@@ -0,0 +1,104 @@
+# importer/spill.py
+"""
+Lookup tables of an import that move to disk once they grow large.
+
+import_confluence_space keeps several maps for the whole run (HTML page ID -> file, HTML title
+-> file, Confluence page ID -> Page PK, existing pages of the target space). Each holds one
+entry per page, which for a 100k-page export is hundreds of megabytes of small Python objects
+per worker. SpillableMap is a plain dict until it holds CC_IMPORT_SPILL_THRESHOLD entries;
+past that, everything moves into a SQLite file in the import's extraction directory, and
+lookups cost an indexed read instead of memory.
+
+Keys are strings or integers; values are anything pickle accepts. The SQLite file is a
+throwaway: it is never committed and is removed by close(), or with the extraction directory.
+"""
+import os
+import pickle
+import sqlite3
+import tempfile
+
+from django.conf import settings
+
+
+class SpillableMap:
+    def __init__(self, spill_dir=None, threshold=None):
+        self._spill_dir = spill_dir
+        self._threshold = settings.CC_IMPORT_SPILL_THRESHOLD if threshold is None else threshold
+        self._data = {}
+        self._db = None
+        self._db_path = None
+        self._len = 0
+
+    @property
+    def spilled(self):
+        return self._db is not None
+
+    def _spill(self):
+        if self._spill_dir:
+            os.makedirs(self._spill_dir, exist_ok=True)
+        fd, self._db_path = tempfile.mkstemp(prefix='import_map_', suffix='.sqlite3', dir=self._spill_dir)
+        os.close(fd)
+        self._db = sqlite3.connect(self._db_path)
+        # Scratch data: no journal, no fsync. Rows are read back through the same connection.
+        self._db.execute('PRAGMA journal_mode=OFF')
+        self._db.execute('PRAGMA synchronous=OFF')
+        self._db.execute('CREATE TABLE entries (key PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID')
+        self._db.executemany('INSERT INTO entries (key, value) VALUES (?, ?)', ((key, pickle.dumps(value)) for key, value in self._data.items()))
+        self._data = {}
+
+    def __setitem__(self, key, value):
+        if self._db is None:
+            if key not in self._data:
+                self._len += 1
+            self._data[key] = value
+            if self._len > self._threshold:
+                self._spill()
+            return
+        blob = pickle.dumps(value)
+        if self._db.execute('INSERT OR IGNORE INTO entries (key, value) VALUES (?, ?)', (key, blob)).rowcount:
+            self._len += 1
+        else:
+            self._db.execute('UPDATE entries SET value = ? WHERE key = ?', (blob, key))
+
+    def __getitem__(self, key):
+        if self._db is None:
+            return self._data[key]
+        row = self._db.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if self._db is None:
+            return key in self._data
+        return self._db.execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self._len
+
+    def items(self):
+        """Iterates (key, value) pairs; on disk, they are read in key order without loading them all."""
+        if self._db is None:
+            yield from list(self._data.items())
+            return
+        # A separate cursor, so lookups made while iterating do not reset it.
+        for key, blob in self._db.cursor().execute('SELECT key, value FROM entries ORDER BY key'):
+            yield key, pickle.loads(blob)
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+    def close(self):
+        self._data = {}
+        self._len = 0
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.remove(self._db_path)
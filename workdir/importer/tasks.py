@@ -1,17 +1,30 @@
 from celery import shared_task
+import hashlib
 import os
 import re
 import shutil
 import mimetypes
+from xml.etree.ElementTree import ParseError
 
-from .utils import extract_html_and_metadata_from_zip, cleanup_temp_extraction_dir
-from .parser import parse_html_file_basic, parse_confluence_metadata_for_hierarchy
-from .models import ConfluenceUpload
+from .utils import AttachmentIndex, extract_html_and_metadata_from_zip, cleanup_temp_extraction_dir
+from .parser import parse_html_file_basic, iter_confluence_metadata_pages
+from .models import ChunkedUpload, ConfluenceUpload, FallbackMacro, ImportErrorLog
+from .chunked import checksum_matches, discard
 from .converter import convert_html_to_prosemirror_json
+from .analysis import analyze_export, estimate_import_duration
+from .instrumentation import ImportPhases
+from .attachment_upload import AttachmentUploader
+from .error_log import ImportErrors
+from .spill import SpillableMap
 
 from django.contrib.auth import get_user_model
-from pages.models import Page, Attachment
-from django.core.files import File
+from pages.models import Page, Attachment, PageVersion, deferred_page_renders
+from pages.tasks import generate_page_attachment_derivatives, render_pages
+from core.image_derivatives import delete_derivatives, is_supported as is_derivative_source
+from core import response_cache
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
 try:
     from workspaces.models import Workspace, Space
@@ -22,6 +35,66 @@ except ImportError:
 
 User = get_user_model()
 
+DERIVATIVE_TASK_BATCH_SIZE = 200
+RENDER_TASK_BATCH_SIZE = 200
+
+def _import_content_hash(title, main_content_html, attachment_fingerprints):
+    """
+    Fingerprint of the export data a page is built from; equal hashes mean an unchanged page.
+    `attachment_fingerprints` pairs each referenced attachment with its size and CRC
+    (AttachmentIndex.fingerprint), so replacing an attachment's file changes the hash too.
+    """
+    digest = hashlib.sha256()
+    attachments_part = "\n".join(f"{reference}\0{fingerprint}" for reference, fingerprint in attachment_fingerprints or [])
+    for part in (title or "", main_content_html or "", attachments_part):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _update_imported_page(page_pk, title, content_json, content_hash):
+    """
+    Applies a changed export page to its existing Page (SYNC mode) and bumps its version; the
+    caller records the PageVersion once attachment srcs are resolved. Pages imported before
+    versioning have no history row yet, so their previous content is kept as one first.
+    """
+    page = Page.objects.get(pk=page_pk)
+    if not PageVersion.objects.filter(page=page).exists():
+        PageVersion.objects.create(page=page, version_number=page.version, content_json=page.content_json, schema_version=page.schema_version, author=page.imported_by, commit_message="Imported from Confluence.")
+    page.title = title
+    page.content_json = content_json
+    page.import_content_hash = content_hash
+    page.version += 1
+    page.is_deleted = False # A page that reappears in the export is restored
+    page.deleted_at = None
+    page.save()
+    return page
+
+
+def _attachment_unchanged(attachment, fingerprint):
+    """Whether an attachment kept from a previous sync still matches the export file with `fingerprint`."""
+    if attachment.source_fingerprint:
+        return attachment.source_fingerprint == fingerprint
+    # Imported before fingerprints were recorded: the stored size is all there is to compare.
+    try:
+        return bool(fingerprint) and attachment.file.size == int(fingerprint.split(':')[0])
+    except (OSError, ValueError):
+        return False
+
+
+def _delete_attachment_files(attachments):
+    for attachment in attachments:
+        delete_derivatives(attachment.file, attachment.derivatives)
+        attachment.file.storage.delete(attachment.file.name)
+
+
+def _delete_uploaded_files(uploaded_files):
+    """Removes attachment files copied to storage for rows that were never committed."""
+    storage = Attachment._meta.get_field('file').storage
+    for _, _, _, stored_name in uploaded_files:
+        storage.delete(stored_name)
+
+
 def _resolve_symbolic_image_srcs(node_list, attachments_by_filename):
     if not isinstance(node_list, list): return
     for node in node_list:
@@ -37,15 +110,27 @@ def _resolve_symbolic_image_srcs(node_list, attachments_by_filename):
             _resolve_symbolic_image_srcs(node["content"], attachments_by_filename)
 
 
+def _start_next_queued_import():
+    """A finished import frees its scheduler slot (importer.scheduling); start whatever is waiting."""
+    from .scheduling import dispatch_queued # Not at module level: scheduling imports this module
+    dispatch_queued()
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=300)
 def import_confluence_space(self, confluence_upload_id):
     upload_record = None # Define upload_record in a broader scope for finally block
-    error_list_for_details = []
     # Initialize local counters that will be synced to upload_record
     local_pages_succeeded_count = 0
     local_pages_failed_count = 0
     local_attachments_succeeded_count = 0
+    local_pages_updated_count = 0
+    local_pages_unchanged_count = 0
     pages_linked_count = 0 # Initialize pages_linked_count
+    image_attachment_ids = [] # Imported images that get resized derivatives once the import is done
+    written_page_ids = [] # Created/updated pages, rendered in batches once the import is done
+    phases = ImportPhases()
+    attachment_uploader = None
+    lookup_maps = [] # SpillableMaps of this run, closed in the finally block
 
     try:
         upload_record = ConfluenceUpload.objects.get(pk=confluence_upload_id)
@@ -61,9 +146,19 @@ def import_confluence_space(self, confluence_upload_id):
     upload_record.pages_succeeded_count = 0
     upload_record.pages_failed_count = 0
     upload_record.attachments_succeeded_count = 0
+    upload_record.pages_updated_count = 0
+    upload_record.pages_unchanged_count = 0
+    upload_record.pages_deleted_count = 0
     upload_record.progress_message = "Import process initiated..."
     upload_record.error_details = ""
-    upload_record.save(update_fields=['status', 'progress_status', 'progress_percent', 'task_id', 'pages_succeeded_count', 'pages_failed_count', 'attachments_succeeded_count', 'progress_message', 'error_details'])
+    upload_record.error_count = 0
+    upload_record.started_at = timezone.now() # With completed_at, the throughput history for analysis estimates
+    upload_record.completed_at = None
+    upload_record.phase_metrics = None
+    upload_record.save(update_fields=['status', 'progress_status', 'progress_percent', 'task_id', 'pages_succeeded_count', 'pages_failed_count', 'attachments_succeeded_count', 'pages_updated_count', 'pages_unchanged_count', 'pages_deleted_count', 'progress_message', 'error_details', 'error_count', 'started_at', 'completed_at', 'phase_metrics'])
+    ImportErrorLog.objects.filter(upload=upload_record).delete() # A retried run starts a fresh log
+    errors = ImportErrors(upload_record)
+    is_sync = upload_record.mode == ConfluenceUpload.MODE_SYNC
 
     importer_user = upload_record.user
     print(f"[Importer Task] ID {self.request.id} | Starting import for Upload ID: {confluence_upload_id} by User: {importer_user.username if importer_user else 'Unknown'}")
@@ -77,6 +172,20 @@ def import_confluence_space(self, confluence_upload_id):
         upload_record.progress_message = "Error: ZIP file not found."
         upload_record.error_details = error_message
         upload_record.save() # Save handled in finally, but good to save critical error info immediately
+        _start_next_queued_import()
+        return error_message
+
+    if not checksum_matches(upload_record):
+        # Chunk checksums are optional; a whole-file mismatch means the data cannot be trusted.
+        error_message = f"File checksum mismatch for Upload ID {confluence_upload_id}; the file was discarded."
+        upload_record.file.delete(save=False)
+        upload_record.status = ConfluenceUpload.STATUS_FAILED
+        upload_record.progress_status = ConfluenceUpload.STATUS_FAILED
+        upload_record.progress_message = "Error: file checksum mismatch."
+        upload_record.error_details = error_message
+        upload_record.completed_at = timezone.now()
+        upload_record.save()
+        _start_next_queued_import()
         return error_message
 
     temp_extraction_main_dir = f"temp_confluence_export_{self.request.id}"
@@ -130,41 +239,59 @@ def import_confluence_space(self, confluence_upload_id):
         upload_record.progress_percent = 0 # Or some initial error percent
         upload_record.progress_message = error_msg_no_space
         upload_record.error_details = error_msg_no_space
-        # Save handled in finally
-        raise Exception(error_msg_no_space) # Go to finally for cleanup and save
+        upload_record.completed_at = timezone.now()
+        upload_record.save() # Raised before the try below, so its finally does not save this
+        _start_next_queued_import()
+        raise Exception(error_msg_no_space)
 
-    original_id_to_new_pk_map = {}
+    def new_lookup_map():
+        lookup_map = SpillableMap(spill_dir=abs_temp_extraction_main_dir)
+        lookup_maps.append(lookup_map)
+        return lookup_map
 
     try:
         upload_record.progress_status = ConfluenceUpload.STATUS_EXTRACTING
         upload_record.progress_percent = 5
         upload_record.progress_message = "Extracting files from ZIP archive...";
         upload_record.save(update_fields=['progress_status', 'progress_percent', 'progress_message'])
-        html_files, metadata_file_path = extract_html_and_metadata_from_zip(
-            zip_file_actual_path, temp_extract_dir=abs_temp_extraction_main_dir
-        )
+        with phases.phase('extract') as extract_phase:
+            html_files, metadata_file_path = extract_html_and_metadata_from_zip(
+                zip_file_actual_path, temp_extract_dir=abs_temp_extraction_main_dir
+            )
+            extract_phase.add(len(html_files))
+            # Extraction failed if nothing came out (the ZIP may be unreadable); resolve nothing then.
+            attachment_index = AttachmentIndex.from_zip(zip_file_actual_path, abs_temp_extraction_main_dir) if (html_files or metadata_file_path) else AttachmentIndex(abs_temp_extraction_main_dir, [])
         upload_record.progress_message = "File extraction complete.";
         # upload_record.progress_percent = 10 # Example: update after extraction
         upload_record.save(update_fields=['progress_message'])
 
-        page_hierarchy_from_metadata = []
+        page_records = [] # A slotted PageRecord per metadata page, in document order
         if metadata_file_path:
             upload_record.progress_status = ConfluenceUpload.STATUS_PARSING_METADATA
             upload_record.progress_percent = 15 # Example percent
             upload_record.progress_message = "Parsing metadata file (e.g., entities.xml)...";
             upload_record.save(update_fields=['progress_status', 'progress_percent', 'progress_message'])
-            page_hierarchy_from_metadata = parse_confluence_metadata_for_hierarchy(metadata_file_path)
-            if not page_hierarchy_from_metadata:
-                error_list_for_details.append(f"Metadata file '{os.path.basename(metadata_file_path)}' was parsed but yielded no page hierarchy data.")
+            with phases.phase('metadata_parse') as metadata_phase:
+                try:
+                    # Streamed: the XML tree (every page body) is never held in memory, only the records.
+                    page_records = list(iter_confluence_metadata_pages(metadata_file_path))
+                except ParseError as metadata_parse_error:
+                    page_records = []
+                    errors.add(f"Metadata file '{os.path.basename(metadata_file_path)}' could not be parsed: {metadata_parse_error}")
+                else:
+                    if not page_records:
+                        errors.add(f"Metadata file '{os.path.basename(metadata_file_path)}' was parsed but yielded no page hierarchy data.")
+                metadata_phase.add(len(page_records))
             upload_record.progress_message = "Metadata parsing complete.";
             upload_record.save(update_fields=['progress_message'])
         else:
             final_task_message = "Import failed: Metadata file (e.g., entities.xml) missing from ZIP."
-            error_list_for_details.append(final_task_message)
+            errors.add(final_task_message)
             raise Exception(final_task_message) # This will set FAILED status in general except block
 
-        html_id_to_path_map = {}
-        parsed_title_to_html_path = {}
+        # One entry per HTML file; moved to disk past CC_IMPORT_SPILL_THRESHOLD entries (importer.spill).
+        html_id_to_path_map = new_lookup_map()
+        parsed_title_to_html_path = new_lookup_map()
         num_html_files = len(html_files) if html_files else 0
         # Base percentage for HTML indexing, e.g., after metadata parsing (15%) up to start of page processing (e.g. 25%)
         html_indexing_start_percent = upload_record.progress_percent # Should be around 15%
@@ -173,145 +300,252 @@ def import_confluence_space(self, confluence_upload_id):
         if html_files:
             upload_record.progress_message = f"Indexing {num_html_files} HTML files...";
             upload_record.save(update_fields=['progress_message'])
-            for idx, html_path_for_map in enumerate(html_files):
-                if num_html_files > 0:
-                    current_html_indexing_progress = int((idx / num_html_files) * html_indexing_total_progress_span)
-                    upload_record.progress_percent = html_indexing_start_percent + current_html_indexing_progress
-                    if idx % 20 == 0 or idx == num_html_files -1 : # Update DB periodically
-                         upload_record.save(update_fields=['progress_percent'])
-                temp_parsed_data = parse_html_file_basic(html_path_for_map)
-                if temp_parsed_data and not temp_parsed_data.get("error"):
-                    html_extracted_id = temp_parsed_data.get("html_extracted_page_id")
-                    if html_extracted_id:
-                        if html_extracted_id in html_id_to_path_map:
-                            msg = f"Duplicate embedded Page ID '{html_extracted_id}'. HTML '{os.path.basename(html_path_for_map)}' vs '{os.path.basename(html_id_to_path_map[html_extracted_id])}'."
-                            print(f"  WARNING: {msg}"); error_list_for_details.append(msg)
-                        else: html_id_to_path_map[html_extracted_id] = html_path_for_map
-                    parsed_title = temp_parsed_data.get("title")
-                    if parsed_title:
-                        if parsed_title in parsed_title_to_html_path and parsed_title_to_html_path[parsed_title] != html_path_for_map :
-                            msg = f"Duplicate HTML title '{parsed_title}' maps to multiple files. Title map uses first: '{os.path.basename(parsed_title_to_html_path[parsed_title])}'."
-                            print(f"  WARNING: {msg}"); # Not adding to main error_details, just a parsing ambiguity
-                        elif parsed_title not in parsed_title_to_html_path:
-                             parsed_title_to_html_path[parsed_title] = html_path_for_map
-                elif temp_parsed_data and temp_parsed_data.get("error"):
-                     error_list_for_details.append(f"Skipping file '{os.path.basename(html_path_for_map)}' from map creation due to parsing error: {temp_parsed_data.get('error')}")
+            with phases.phase('html_index', items=num_html_files):
+                for idx, html_path_for_map in enumerate(html_files):
+                    if num_html_files > 0:
+                        current_html_indexing_progress = int((idx / num_html_files) * html_indexing_total_progress_span)
+                        upload_record.progress_percent = html_indexing_start_percent + current_html_indexing_progress
+                        if idx % 20 == 0 or idx == num_html_files -1 : # Update DB periodically
+                             upload_record.save(update_fields=['progress_percent'])
+                    temp_parsed_data = parse_html_file_basic(html_path_for_map)
+                    if temp_parsed_data and not temp_parsed_data.get("error"):
+                        html_extracted_id = temp_parsed_data.get("html_extracted_page_id")
+                        if html_extracted_id:
+                            if html_extracted_id in html_id_to_path_map:
+                                msg = f"Duplicate embedded Page ID '{html_extracted_id}'. HTML '{os.path.basename(html_path_for_map)}' vs '{os.path.basename(html_id_to_path_map[html_extracted_id])}'."
+                                print(f"  WARNING: {msg}"); errors.add(msg, page_id=html_extracted_id)
+                            else: html_id_to_path_map[html_extracted_id] = html_path_for_map
+                        parsed_title = temp_parsed_data.get("title")
+                        if parsed_title:
+                            if parsed_title in parsed_title_to_html_path and parsed_title_to_html_path[parsed_title] != html_path_for_map :
+                                msg = f"Duplicate HTML title '{parsed_title}' maps to multiple files. Title map uses first: '{os.path.basename(parsed_title_to_html_path[parsed_title])}'."
+                                print(f"  WARNING: {msg}"); # Not adding to main error_details, just a parsing ambiguity
+                            elif parsed_title not in parsed_title_to_html_path:
+                                 parsed_title_to_html_path[parsed_title] = html_path_for_map
+                    elif temp_parsed_data and temp_parsed_data.get("error"):
+                         errors.add(f"Skipping file '{os.path.basename(html_path_for_map)}' from map creation due to parsing error: {temp_parsed_data.get('error')}")
             upload_record.progress_percent = html_indexing_start_percent + html_indexing_total_progress_span # e.g. 25%
             upload_record.progress_message = f"HTML indexing complete. Found {len(html_id_to_path_map)} embedded IDs, {len(parsed_title_to_html_path)} titles.";
             upload_record.save(update_fields=['progress_message', 'progress_percent'])
         else: # No HTML files
             final_task_message = "Import failed: No HTML files found in ZIP."
-            error_list_for_details.append(final_task_message)
+            errors.add(final_task_message)
             raise Exception(final_task_message)
 
-        if not page_hierarchy_from_metadata:
+        if not page_records:
             final_task_message = "Import failed: Page metadata missing or empty, cannot proceed."
-            error_list_for_details.append(final_task_message)
+            errors.add(final_task_message)
             raise Exception(final_task_message)
 
         upload_record.progress_status = ConfluenceUpload.STATUS_PROCESSING_PAGES
         page_processing_start_percent = upload_record.progress_percent # Should be around 25%
         page_processing_total_progress_span = 65 # Allocate a large chunk for this, e.g., from 25% to 90%
 
-        num_metadata_pages = len(page_hierarchy_from_metadata)
+        num_metadata_pages = len(page_records)
         print(f"[Importer Task] ID {self.request.id} | Processing {num_metadata_pages} pages from metadata into Space '{target_space_for_pages.name}' (ID: {target_space_for_pages.id})")
 
-        for i, page_meta_entry in enumerate(page_hierarchy_from_metadata):
-            current_page_processing_progress = 0
-            if num_metadata_pages > 0:
-                current_page_processing_progress = int(((i + 1) / num_metadata_pages) * page_processing_total_progress_span)
-
-            authoritative_page_id = page_meta_entry.get('id')
-            authoritative_page_title = page_meta_entry.get('title', f"Untitled Page {authoritative_page_id or 'UnknownID'}")
-            log_page_ref = f"'{authoritative_page_title}' (Metadata ID: {authoritative_page_id})"
-
-            # Update progress periodically
-            if i % 5 == 0 or i == num_metadata_pages - 1:
-                upload_record.progress_percent = page_processing_start_percent + current_page_processing_progress
-                upload_record.progress_message = f"Processing page {i+1}/{num_metadata_pages}: {log_page_ref}..."
-                upload_record.pages_succeeded_count = local_pages_succeeded_count # Sync counters
-                upload_record.pages_failed_count = local_pages_failed_count
-                upload_record.attachments_succeeded_count = local_attachments_succeeded_count
-                upload_record.save(update_fields=['progress_status', 'progress_percent', 'progress_message', 'pages_succeeded_count', 'pages_failed_count', 'attachments_succeeded_count'])
-
-            if not authoritative_page_id:
-                msg = f"Metadata entry {i+1} missing ID. Entry: {page_meta_entry}. Skipping."
-                print(f"  WARNING: {msg}"); error_list_for_details.append(msg)
-                local_pages_failed_count += 1
-                continue
-
-            html_path = None; match_type = "No Match"
-            if authoritative_page_id in html_id_to_path_map:
-                html_path = html_id_to_path_map[authoritative_page_id]
-                match_type = "HTML Embedded ID"
-            elif authoritative_page_title in parsed_title_to_html_path:
-                html_path = parsed_title_to_html_path[authoritative_page_title]
-                match_type = "HTML Title"
-                msg = f"HTML for {log_page_ref} not found by embedded ID. Matched by title using '{authoritative_page_title}': {os.path.basename(html_path)}."
-                print(f"    WARNING: {msg}"); # Log this, but don't add to main error_details unless page creation fails
-
-            if not html_path:
-                msg = f"HTML file for page {log_page_ref} not found by ID or title match. Skipping page."
-                print(f"    ERROR: {msg}"); error_list_for_details.append(msg)
-                local_pages_failed_count += 1
-                continue
-
-            parsed_page_html_data = parse_html_file_basic(html_path)
-            if not parsed_page_html_data or parsed_page_html_data.get("error") or not parsed_page_html_data.get("main_content_html"):
-                error_detail = parsed_page_html_data.get('error', 'No main content') if parsed_page_html_data else 'Parsing failed'
-                msg = f"Failed to parse main content from HTML file '{os.path.basename(html_path)}' for page {log_page_ref} (match type: {match_type}). Error: {error_detail}. Skipping page."
-                print(f"    WARNING: {msg}"); error_list_for_details.append(msg)
-                local_pages_failed_count += 1
-                continue
-
-            main_content_html = parsed_page_html_data.get("main_content_html")
-            content_json = convert_html_to_prosemirror_json(main_content_html)
-
-            if Page.objects.filter(original_confluence_id=authoritative_page_id, space=target_space_for_pages).exists():
-                msg = f"Page '{authoritative_page_title}' (OrigID: {authoritative_page_id}) already exists in target space '{target_space_for_pages.name}'. Skipping."
-                print(f"    {msg}"); # Not necessarily an error for error_details, but a skip.
-                local_pages_failed_count += 1 # Count as failed/skipped for progress
-                continue
-            try:
-                created_page_object = Page.objects.create(title=authoritative_page_title, content_json=content_json, space=target_space_for_pages, imported_by=importer_user, original_confluence_id=authoritative_page_id)
-                local_pages_succeeded_count += 1
-                if authoritative_page_id: original_id_to_new_pk_map[authoritative_page_id] = created_page_object.pk
-
+        # Imported pages already in the target space, fetched once instead of checked per page. Read
+        # by space rather than with an IN list of every export ID; other exports' pages are never looked up.
+        existing_pages_by_original_id = new_lookup_map()
+        original_id_to_new_pk_map = new_lookup_map()
+        for original_id, pk, content_hash, is_deleted in Page.objects.filter(
+            space=target_space_for_pages, original_confluence_id__isnull=False,
+        ).values_list('original_confluence_id', 'pk', 'import_content_hash', 'is_deleted').iterator(chunk_size=2000):
+            existing_pages_by_original_id[original_id] = (pk, content_hash, is_deleted)
+
+        attachment_uploader = AttachmentUploader()
+        pages_per_transaction = max(1, settings.CC_IMPORT_PAGES_PER_TRANSACTION)
+        for batch_start in range(0, num_metadata_pages, pages_per_transaction):
+            batch_end = min(batch_start + pages_per_transaction, num_metadata_pages)
+            # Pages are converted and their attachments copied to storage before the batch's
+            # transaction opens, so no storage I/O runs while it holds locks.
+            prepared_pages = []
+            for i in range(batch_start, batch_end):
+                page_record = page_records[i]
+                authoritative_page_id = page_record.id
+                authoritative_page_title = page_record.title
+                log_page_ref = f"'{authoritative_page_title}' (Metadata ID: {authoritative_page_id})"
+
+                if not authoritative_page_id:
+                    msg = f"Metadata entry {i+1} missing ID. Entry: {page_record!r}. Skipping."
+                    print(f"  WARNING: {msg}"); errors.add(msg)
+                    local_pages_failed_count += 1
+                    continue
+
+                html_path = None; match_type = "No Match"
+                if authoritative_page_id in html_id_to_path_map:
+                    html_path = html_id_to_path_map[authoritative_page_id]
+                    match_type = "HTML Embedded ID"
+                elif authoritative_page_title in parsed_title_to_html_path:
+                    html_path = parsed_title_to_html_path[authoritative_page_title]
+                    match_type = "HTML Title"
+                    msg = f"HTML for {log_page_ref} not found by embedded ID. Matched by title using '{authoritative_page_title}': {os.path.basename(html_path)}."
+                    print(f"    WARNING: {msg}"); # Log this, but don't add to main error_details unless page creation fails
+
+                if not html_path:
+                    msg = f"HTML file for page {log_page_ref} not found by ID or title match. Skipping page."
+                    print(f"    ERROR: {msg}"); errors.add(msg, page_id=authoritative_page_id)
+                    local_pages_failed_count += 1
+                    continue
+
+                with phases.phase('convert', items=1):
+                    parsed_page_html_data = parse_html_file_basic(html_path)
+                if not parsed_page_html_data or parsed_page_html_data.get("error") or not parsed_page_html_data.get("main_content_html"):
+                    error_detail = parsed_page_html_data.get('error', 'No main content') if parsed_page_html_data else 'Parsing failed'
+                    msg = f"Failed to parse main content from HTML file '{os.path.basename(html_path)}' for page {log_page_ref} (match type: {match_type}). Error: {error_detail}. Skipping page."
+                    print(f"    WARNING: {msg}"); errors.add(msg, page_id=authoritative_page_id)
+                    local_pages_failed_count += 1
+                    continue
+
+                main_content_html = parsed_page_html_data.get("main_content_html")
                 referenced_attachments_in_html = parsed_page_html_data.get("referenced_attachments", [])
-                attachments_created_count_for_page = 0
-                if referenced_attachments_in_html:
-                    for attachment_ref_name in referenced_attachments_in_html:
-                        # ... (attachment finding logic - as before) ...
-                        # On success: local_attachments_succeeded_count += 1
-                        # On failure: error_list_for_details.append(...)
-                        potential_paths_to_try = [os.path.join(os.path.dirname(html_path), attachment_ref_name), os.path.join(os.path.dirname(html_path), "attachments", attachment_ref_name), os.path.join(abs_temp_extraction_main_dir, "attachments", attachment_ref_name), os.path.join(abs_temp_extraction_main_dir, attachment_ref_name)]
-                        attachment_file_path_found = next((p for p in potential_paths_to_try if os.path.exists(p) and os.path.isfile(p)), None)
-                        if attachment_file_path_found:
-                            try:
-                                mime_type_guess, _ = mimetypes.guess_type(attachment_file_path_found)
-                                with open(attachment_file_path_found, 'rb') as f_attach:
-                                    django_file = File(f_attach, name=os.path.basename(attachment_ref_name))
-                                    Attachment.objects.create(page=created_page_object, original_filename=os.path.basename(attachment_ref_name), file=django_file, mime_type=mime_type_guess or 'application/octet-stream', imported_by=importer_user)
-                                local_attachments_succeeded_count += 1; attachments_created_count_for_page+=1
-                            except Exception as attach_create_error: error_list_for_details.append(f"Attachment '{attachment_ref_name}' for {log_page_ref}: Create error {attach_create_error}")
-                        else: error_list_for_details.append(f"Attachment '{attachment_ref_name}' for {log_page_ref}: File not found.")
-                if attachments_created_count_for_page > 0 and created_page_object.content_json and 'content' in created_page_object.content_json:
-                    page_attachments_for_resolve = Attachment.objects.filter(page=created_page_object)
-                    attachments_by_filename_map = {att.original_filename: att.file.url for att in page_attachments_for_resolve if att.file and hasattr(att.file, 'url')}
-                    if attachments_by_filename_map: _resolve_symbolic_image_srcs(created_page_object.content_json['content'], attachments_by_filename_map); created_page_object.save(update_fields=['content_json', 'updated_at'])
-            except Exception as page_create_error:
-                local_pages_failed_count += 1
-                msg = f"Page {log_page_ref}: DB creation error: {page_create_error}"
-                print(f"    ERROR: {msg}"); error_list_for_details.append(msg)
+                attachment_sources = [] # (reference, extracted path or None, 'size:crc32')
+                for ref_name in referenced_attachments_in_html:
+                    path = attachment_index.find(ref_name, html_path=html_path, page_id=authoritative_page_id)
+                    attachment_sources.append((ref_name, path, attachment_index.fingerprint(path)))
+                content_hash = _import_content_hash(authoritative_page_title, main_content_html, [(ref_name, fingerprint) for ref_name, _, fingerprint in attachment_sources])
+
+                existing_page = existing_pages_by_original_id.get(authoritative_page_id)
+                if existing_page and not is_sync:
+                    msg = f"Page '{authoritative_page_title}' (OrigID: {authoritative_page_id}) already exists in target space '{target_space_for_pages.name}'. Skipping."
+                    print(f"    {msg}"); # Not necessarily an error for error_details, but a skip.
+                    local_pages_failed_count += 1 # Count as failed/skipped for progress
+                    continue
+                if existing_page and existing_page[1] == content_hash and not existing_page[2]:
+                    original_id_to_new_pk_map[authoritative_page_id] = existing_page[0] # Still linked below, in case it moved
+                    local_pages_unchanged_count += 1
+                    continue
+
+                fallback_macros = []
+                with phases.phase('convert'):
+                    content_json = convert_html_to_prosemirror_json(main_content_html, fallback_macros=fallback_macros)
+
+                with phases.phase('attachment_write'):
+                    existing_attachments = {}
+                    if existing_page:
+                        existing_attachments = {att.original_filename: att for att in Attachment.objects.filter(page_id=existing_page[0]).only('original_filename', 'file', 'source_fingerprint', 'derivatives')}
+                    files_to_upload = [] # (reference, extracted path, fingerprint)
+                    replaced_attachments = [] # Kept from the previous sync, but their file changed
+                    for attachment_ref_name, attachment_file_path_found, fingerprint in attachment_sources:
+                        if not attachment_file_path_found:
+                            errors.add(f"Attachment '{attachment_ref_name}' for {log_page_ref}: File not found.", page_id=authoritative_page_id)
+                            continue
+                        existing_attachment = existing_attachments.get(os.path.basename(attachment_ref_name))
+                        if existing_attachment is not None:
+                            if _attachment_unchanged(existing_attachment, fingerprint): continue # Kept from the previous sync
+                            replaced_attachments.append(existing_attachment)
+                        files_to_upload.append((attachment_ref_name, attachment_file_path_found, fingerprint))
+                    # Files go to storage in parallel; the rows are written in the batch's transaction.
+                    upload_results = attachment_uploader.upload([(path, os.path.basename(ref_name)) for ref_name, path, _ in files_to_upload])
+                    uploaded_files = [] # (reference, extracted path, fingerprint, stored name)
+                    for (attachment_ref_name, attachment_file_path_found, fingerprint), (stored_name, upload_error) in zip(files_to_upload, upload_results):
+                        if upload_error:
+                            errors.add(f"Attachment '{attachment_ref_name}' for {log_page_ref}: Create error {upload_error}", page_id=authoritative_page_id)
+                            continue
+                        uploaded_files.append((attachment_ref_name, attachment_file_path_found, fingerprint, stored_name))
+                    uploaded_names = {os.path.basename(ref_name) for ref_name, _, _, _ in uploaded_files}
+                    replaced_attachments = [att for att in replaced_attachments if att.original_filename in uploaded_names] # A failed upload keeps the old file
+                prepared_pages.append((
+                    authoritative_page_id, authoritative_page_title, log_page_ref, existing_page, content_hash,
+                    content_json, fallback_macros, existing_attachments, uploaded_files, replaced_attachments,
+                ))
+
+            try:
+                # One commit per batch of pages instead of one per row written; no render task per save.
+                with deferred_page_renders(), transaction.atomic():
+                    for (authoritative_page_id, authoritative_page_title, log_page_ref, existing_page, content_hash,
+                         content_json, fallback_macros, existing_attachments, uploaded_files, replaced_attachments) in prepared_pages:
+                        new_attachments = []
+                        try:
+                            with transaction.atomic(): # Savepoint: a failing page is rolled back alone, the batch carries on
+                                with phases.phase('db_write', items=1):
+                                    if existing_page:
+                                        created_page_object = _update_imported_page(existing_page[0], authoritative_page_title, content_json, content_hash)
+                                        attachment_urls = {att.original_filename: att.file.url for att in existing_attachments.values() if att.file}
+                                    else:
+                                        created_page_object = Page.objects.create(title=authoritative_page_title, content_json=content_json, space=target_space_for_pages, imported_by=importer_user, original_confluence_id=authoritative_page_id, import_content_hash=content_hash)
+                                        attachment_urls = {}
+
+                                with phases.phase('attachment_write') as attachment_phase:
+                                    for attachment_ref_name, attachment_file_path_found, fingerprint, stored_name in uploaded_files:
+                                        mime_type_guess, _ = mimetypes.guess_type(attachment_file_path_found)
+                                        new_attachments.append(Attachment(page=created_page_object, original_filename=os.path.basename(attachment_ref_name), file=stored_name, mime_type=mime_type_guess or 'application/octet-stream', imported_by=importer_user, source_fingerprint=fingerprint))
+                                    if replaced_attachments:
+                                        Attachment.objects.filter(pk__in=[att.pk for att in replaced_attachments]).delete()
+                                        # Old files go once the batch commits; a rollback keeps them with their rows.
+                                        transaction.on_commit(lambda replaced=replaced_attachments: _delete_attachment_files(replaced))
+                                    if new_attachments:
+                                        Attachment.objects.bulk_create(new_attachments)
+                                        response_cache.bump(f'page:{created_page_object.pk}') # bulk_create sends no post_save
+                                        for created_attachment in new_attachments:
+                                            attachment_urls[created_attachment.original_filename] = created_attachment.file.url
+                                    attachment_phase.add(len(new_attachments))
+                                with phases.phase('db_write'):
+                                    # URLs of the attachments created above (and kept from a previous sync) are known already; no re-query.
+                                    if attachment_urls and created_page_object.content_json and 'content' in created_page_object.content_json:
+                                        _resolve_symbolic_image_srcs(created_page_object.content_json['content'], attachment_urls); created_page_object.save(update_fields=['content_json', 'updated_at'])
+                                    page_version = None
+                                    if existing_page:
+                                        page_version = PageVersion.objects.create(page=created_page_object, version_number=created_page_object.version, content_json=created_page_object.content_json, schema_version=created_page_object.schema_version, author=importer_user, commit_message=f"Updated by Confluence sync (upload {upload_record.pk}).")
+                                    elif fallback_macros: # FallbackMacro rows hang off a version, so the imported content becomes v1
+                                        page_version = PageVersion.objects.create(page=created_page_object, version_number=created_page_object.version, content_json=created_page_object.content_json, schema_version=created_page_object.schema_version, author=importer_user, commit_message="Imported from Confluence.")
+                                    if fallback_macros:
+                                        FallbackMacro.objects.bulk_create([
+                                            FallbackMacro(page_version=page_version, macro_name=macro['macro_name'], raw_macro_content=macro['raw_macro_content'], placeholder_id_in_content=macro['placeholder_id'], import_notes=f"Unsupported macro kept as raw HTML by Confluence import (upload {upload_record.pk}).")
+                                            for macro in fallback_macros
+                                        ])
+                        except Exception as page_create_error:
+                            local_pages_failed_count += 1
+                            msg = f"Page {log_page_ref}: DB creation error: {page_create_error}"
+                            print(f"    ERROR: {msg}"); errors.add(msg, page_id=authoritative_page_id)
+                            _delete_uploaded_files(uploaded_files) # Their rows were rolled back with the page
+                        else: # Counted once the page's savepoint is released
+                            if existing_page: local_pages_updated_count += 1
+                            else: local_pages_succeeded_count += 1
+                            original_id_to_new_pk_map[authoritative_page_id] = created_page_object.pk
+                            written_page_ids.append(created_page_object.pk)
+                            local_attachments_succeeded_count += len(new_attachments)
+                            image_attachment_ids.extend(att.pk for att in new_attachments if is_derivative_source(att.mime_type))
+            except Exception:
+                for prepared_page in prepared_pages: # The whole batch rolled back; none of its files has a row
+                    _delete_uploaded_files(prepared_page[8])
+                raise
+
+            # Progress and the batch's errors are saved between batches, outside the transaction, so
+            # the upload row is not locked (importer.scheduling locks it) while a batch runs.
+            errors.flush()
+            upload_record.error_count = errors.count
+            upload_record.progress_percent = page_processing_start_percent + int((batch_end / num_metadata_pages) * page_processing_total_progress_span)
+            upload_record.progress_message = f"Processed {batch_end}/{num_metadata_pages} pages..."
+            upload_record.pages_succeeded_count = local_pages_succeeded_count # Sync counters
+            upload_record.pages_failed_count = local_pages_failed_count
+            upload_record.attachments_succeeded_count = local_attachments_succeeded_count
+            upload_record.pages_updated_count = local_pages_updated_count
+            upload_record.pages_unchanged_count = local_pages_unchanged_count
+            upload_record.save(update_fields=['progress_status', 'progress_percent', 'progress_message', 'pages_succeeded_count', 'pages_failed_count', 'attachments_succeeded_count', 'pages_updated_count', 'pages_unchanged_count', 'error_count'])
 
         # Final sync of loop-based counters before moving to next stage
         upload_record.pages_succeeded_count = local_pages_succeeded_count
         upload_record.pages_failed_count = local_pages_failed_count
         upload_record.attachments_succeeded_count = local_attachments_succeeded_count
+        upload_record.pages_updated_count = local_pages_updated_count
+        upload_record.pages_unchanged_count = local_pages_unchanged_count
         upload_record.progress_percent = page_processing_start_percent + page_processing_total_progress_span # e.g. 90%
-        upload_record.save(update_fields=['pages_succeeded_count', 'pages_failed_count', 'attachments_succeeded_count', 'progress_percent'])
-
-        if page_hierarchy_from_metadata and original_id_to_new_pk_map:
+        upload_record.save(update_fields=['pages_succeeded_count', 'pages_failed_count', 'attachments_succeeded_count', 'pages_updated_count', 'pages_unchanged_count', 'progress_percent'])
+
+        if is_sync and upload_record.delete_missing:
+            # Saved one by one (not .update()) so the response cache invalidation signals fire.
+            export_page_ids = {page_record.id for page_record in page_records}
+            deleted_at = timezone.now()
+            with phases.phase('db_write'), transaction.atomic():
+                for removed_page in Page.objects.filter(space=target_space_for_pages, original_confluence_id__isnull=False, is_deleted=False).exclude(original_confluence_id__in=export_page_ids):
+                    removed_page.is_deleted = True
+                    removed_page.deleted_at = deleted_at
+                    removed_page.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+                    upload_record.pages_deleted_count += 1
+            upload_record.save(update_fields=['pages_deleted_count'])
+
+        if page_records and original_id_to_new_pk_map:
             upload_record.progress_status = ConfluenceUpload.STATUS_LINKING_HIERARCHY
             upload_record.progress_message = "Linking page hierarchy...";
             # hierarchy_linking_start_percent = upload_record.progress_percent # Should be 90%
@@ -322,46 +556,72 @@ def import_confluence_space(self, confluence_upload_id):
             # For simplicity, we'll just mark it as a phase and then move to completion percent.
             # A more complex calculation could be based on number of links to make.
 
-            for page_meta_entry_for_link in page_hierarchy_from_metadata: # No specific progress update inside this loop for now
-                original_child_id = page_meta_entry_for_link.get('id'); original_parent_id = page_meta_entry_for_link.get('parent_id')
-                if original_child_id and original_parent_id:
-                    child_pk, parent_pk = original_id_to_new_pk_map.get(original_child_id), original_id_to_new_pk_map.get(original_parent_id)
-                    if child_pk and parent_pk:
-                        try:
-                            child_page = Page.objects.get(pk=child_pk)
-                            if child_page.parent_id == parent_pk: continue
-                            parent_page_instance = Page.objects.get(pk=parent_pk)
-                            child_page.parent = parent_page_instance; child_page.save(update_fields=['parent', 'updated_at']); pages_linked_count += 1
-                        except Page.DoesNotExist: error_list_for_details.append(f"Hierarchy link failed: Child (PK:{child_pk}) or Parent (PK:{parent_pk}) not found.")
-                        except Exception as link_error: error_list_for_details.append(f"Hierarchy link error OrigID {original_child_id} to {original_parent_id}: {link_error}")
+            with phases.phase('hierarchy_link') as link_phase:
+                # Current parents in one query, so pages already under the right parent (most of them on a resync) cost nothing.
+                # Every imported page of the space is one of the mapped pages or never looked up.
+                current_parent_by_pk = new_lookup_map()
+                for pk, parent_id in Page.objects.filter(space=target_space_for_pages, original_confluence_id__isnull=False).values_list('pk', 'parent_id').iterator(chunk_size=2000):
+                    current_parent_by_pk[pk] = parent_id
+                links_to_make = [] # (original child ID, original parent ID, child PK, parent PK)
+                for page_record in page_records:
+                    original_child_id = page_record.id; original_parent_id = page_record.parent_id
+                    if original_child_id and original_parent_id:
+                        child_pk, parent_pk = original_id_to_new_pk_map.get(original_child_id), original_id_to_new_pk_map.get(original_parent_id)
+                        if child_pk and parent_pk and current_parent_by_pk.get(child_pk) != parent_pk:
+                            links_to_make.append((original_child_id, original_parent_id, child_pk, parent_pk))
+                # Committed in batches like the pages, with a savepoint per link.
+                for batch_start in range(0, len(links_to_make), pages_per_transaction):
+                    with transaction.atomic():
+                        for original_child_id, original_parent_id, child_pk, parent_pk in links_to_make[batch_start:batch_start + pages_per_transaction]:
+                            try:
+                                with transaction.atomic():
+                                    child_page = Page.objects.get(pk=child_pk)
+                                    if child_page.parent_id == parent_pk: continue
+                                    parent_page_instance = Page.objects.get(pk=parent_pk)
+                                    child_page.parent = parent_page_instance; child_page.save(update_fields=['parent', 'updated_at'])
+                                pages_linked_count += 1
+                            except Page.DoesNotExist: errors.add(f"Hierarchy link failed: Child (PK:{child_pk}) or Parent (PK:{parent_pk}) not found.", page_id=original_child_id)
+                            except Exception as link_error: errors.add(f"Hierarchy link error OrigID {original_child_id} to {original_parent_id}: {link_error}", page_id=original_child_id)
+                    errors.flush()
+                link_phase.add(pages_linked_count)
 
             upload_record.progress_percent = 95 # After hierarchy linking
             upload_record.progress_message = f"Hierarchy linking complete. {pages_linked_count} links established.";
             upload_record.save(update_fields=['progress_percent', 'progress_message'])
 
+        # Thumbnails are generated off the import's critical path, in batches.
+        for batch_start in range(0, len(image_attachment_ids), DERIVATIVE_TASK_BATCH_SIZE):
+            generate_page_attachment_derivatives.delay(image_attachment_ids[batch_start:batch_start + DERIVATIVE_TASK_BATCH_SIZE])
+        # Pre-rendering was deferred for the pages written above (pages.models.deferred_page_renders).
+        if settings.CC_PAGE_RENDER_ON_SAVE:
+            for batch_start in range(0, len(written_page_ids), RENDER_TASK_BATCH_SIZE):
+                render_pages.delay(written_page_ids[batch_start:batch_start + RENDER_TASK_BATCH_SIZE])
+
         # Final status determination
-        if upload_record.pages_succeeded_count > 0 or (num_metadata_pages == 0 and not error_list_for_details) : # Considered success if pages imported or if 0 pages in metadata and no errors
+        pages_synced_count = upload_record.pages_updated_count + upload_record.pages_unchanged_count # Always 0 outside SYNC mode
+        if upload_record.pages_succeeded_count > 0 or pages_synced_count > 0 or (num_metadata_pages == 0 and not errors) : # Considered success if pages imported or if 0 pages in metadata and no errors
             upload_record.status = ConfluenceUpload.STATUS_COMPLETED
             upload_record.progress_status = ConfluenceUpload.STATUS_COMPLETED
             upload_record.progress_percent = 100
             upload_record.progress_message = f"Import completed. Pages: {upload_record.pages_succeeded_count} succeeded, {upload_record.pages_failed_count} failed/skipped. Attachments: {upload_record.attachments_succeeded_count}. Pages linked: {pages_linked_count}."
+            if is_sync:
+                upload_record.progress_message += f" Sync: {upload_record.pages_updated_count} updated, {upload_record.pages_unchanged_count} unchanged, {upload_record.pages_deleted_count} deleted."
         else: # No pages succeeded or errors occurred that prevented any success
             upload_record.status = ConfluenceUpload.STATUS_FAILED
             upload_record.progress_status = ConfluenceUpload.STATUS_FAILED
             # Keep progress_percent where it was, or set to 100 if failure is also "completion" of the task attempt
             # upload_record.progress_percent = 100; # Mark as 100% done, but status is FAILED
             upload_record.progress_message = f"Import failed or completed with no pages processed. Pages: {upload_record.pages_succeeded_count} succeeded, {upload_record.pages_failed_count} failed/skipped. Attachments: {upload_record.attachments_succeeded_count}. Pages linked: {pages_linked_count}."
-            if not error_list_for_details and num_metadata_pages > 0: # If no specific errors but still failed (e.g. all pages skipped)
-                 error_list_for_details.append("No pages were successfully imported. Check logs for individual page processing details.")
+            if not errors and num_metadata_pages > 0: # If no specific errors but still failed (e.g. all pages skipped)
+                 errors.add("No pages were successfully imported. Check logs for individual page processing details.")
 
 
-        if error_list_for_details:
+        if errors:
             # Prepend to existing error_details if any, rather than overwriting.
             # Ensure this doesn't happen if the task is already marked as failed from a critical exception.
             if upload_record.progress_status != ConfluenceUpload.STATUS_FAILED: # Don't overwrite if already failed critically
                 existing_error_details = upload_record.error_details if upload_record.error_details else ""
-                new_errors = "\n".join(error_list_for_details)
-                full_error_message = f"{existing_error_details}\n{new_errors}".strip()
+                full_error_message = f"{existing_error_details}\n{errors.summary()}".strip()
                 upload_record.error_details = full_error_message[:2000] # Limit length
 
     except Exception as e:
@@ -374,18 +634,26 @@ def import_confluence_space(self, confluence_upload_id):
             # upload_record.progress_percent = upload_record.progress_percent # Keep current or set e.g. 100 if failure is "completion"
             upload_record.progress_message = "Import failed due to a critical error. Check error details."
 
-            current_errors = error_list_for_details if error_list_for_details else [] # error_list_for_details might be empty if exception is early
-            if error_message_critical not in current_errors : current_errors.insert(0, error_message_critical)
+            errors.add(error_message_critical, first=True)
 
             existing_error_details = upload_record.error_details if upload_record.error_details and error_message_critical not in upload_record.error_details else ""
-            new_error_string = "\n".join(current_errors)
-            full_error_message = f"{existing_error_details}\n{new_error_string}".strip()
+            full_error_message = f"{existing_error_details}\n{errors.summary()}".strip()
             upload_record.error_details = full_error_message[:2000]
         # No return here, finally block will handle saving.
 
     finally:
+        if attachment_uploader:
+            attachment_uploader.close()
+        for lookup_map in lookup_maps:
+            lookup_map.close()
         if upload_record: # Ensure it's saved with the latest status/progress, especially if an exception occurred
+            errors.flush()
+            upload_record.error_count = errors.count
+            upload_record.completed_at = timezone.now()
+            upload_record.phase_metrics = phases.as_dict()
             upload_record.save()
+            phases.export()
+            _start_next_queued_import()
 
         if os.path.exists(abs_temp_extraction_main_dir):
             cleanup_temp_extraction_dir(temp_extract_dir=abs_temp_extraction_main_dir)
@@ -396,3 +664,66 @@ def import_confluence_space(self, confluence_upload_id):
 
 
     return upload_record.progress_message if upload_record else "Task finished with critical error (upload_record not found)."
+
+
+@shared_task(bind=True)
+def analyze_confluence_export(self, confluence_upload_id):
+    """
+    Dry run for an ANALYZE-mode ConfluenceUpload: fills analysis_summary (importer.analysis)
+    without extracting the archive or writing any pages.
+    """
+    try:
+        upload_record = ConfluenceUpload.objects.get(pk=confluence_upload_id)
+    except ConfluenceUpload.DoesNotExist:
+        print(f"[Importer Analysis] CRITICAL: ConfluenceUpload record {confluence_upload_id} not found. Aborting.")
+        return f"ConfluenceUpload record {confluence_upload_id} not found."
+
+    upload_record.status = ConfluenceUpload.STATUS_PROCESSING
+    upload_record.progress_status = ConfluenceUpload.STATUS_ANALYZING
+    upload_record.progress_percent = 0
+    upload_record.task_id = self.request.id
+    upload_record.progress_message = "Analyzing export..."
+    upload_record.error_details = ""
+    upload_record.started_at = timezone.now()
+    upload_record.completed_at = None
+    upload_record.save(update_fields=['status', 'progress_status', 'progress_percent', 'task_id', 'progress_message', 'error_details', 'started_at', 'completed_at'])
+
+    try:
+        if not checksum_matches(upload_record):
+            raise ValueError("File checksum mismatch; the uploaded file is not the one declared when the upload started.")
+        with upload_record.file.open('rb') as zip_fh:
+            summary = analyze_export(zip_fh)
+        summary['estimate'] = estimate_import_duration(summary['pages']['metadata_pages'])
+        upload_record.analysis_summary = summary
+        upload_record.status = ConfluenceUpload.STATUS_COMPLETED
+        upload_record.progress_status = ConfluenceUpload.STATUS_COMPLETED
+        upload_record.progress_percent = 100
+        upload_record.progress_message = (
+            f"Analysis completed. Pages: {summary['pages']['metadata_pages']} in metadata, "
+            f"{summary['pages']['unmatched_count']} without HTML. Attachments: {summary['attachments']['count']}. "
+            f"Unsupported macros: {summary['macros']['unsupported_total']}."
+        )
+    except Exception as e:
+        error_message = f"CRITICAL ERROR: {type(e).__name__} - {e}"
+        print(f"[Importer Analysis] ID {self.request.id} | {error_message}")
+        upload_record.status = ConfluenceUpload.STATUS_FAILED
+        upload_record.progress_status = ConfluenceUpload.STATUS_FAILED
+        upload_record.progress_message = "Analysis failed. Check error details."
+        upload_record.error_details = error_message[:2000]
+    finally:
+        upload_record.completed_at = timezone.now()
+        upload_record.save()
+
+    return upload_record.progress_message
+
+
+@shared_task(bind=True)
+def delete_expired_chunked_uploads(self):
+    """Deletes chunked uploads abandoned before completion, with their staging files (Celery beat)."""
+    expired = ChunkedUpload.objects.filter(status=ChunkedUpload.STATUS_UPLOADING, expires_at__lte=timezone.now())
+    deleted = 0
+    for upload in expired.only('id').iterator():
+        discard(upload)
+        upload.delete()
+        deleted += 1
+    return f"Deleted {deleted} expired chunked uploads."
@@ -5,7 +5,7 @@ import zipfile
 from django.test import TestCase
 import textwrap # Keep for dummy HTML content formatting within tests
 # Assuming utils.py and parser.py are in the same app 'importer'
-from .utils import extract_html_and_metadata_from_zip, cleanup_temp_extraction_dir
+from .utils import AttachmentIndex, extract_html_and_metadata_from_zip, cleanup_temp_extraction_dir
 from .parser import parse_html_file_basic, parse_confluence_metadata_for_hierarchy
 from .converter import convert_html_to_prosemirror_json
 
@@ -75,6 +75,25 @@ class ImporterUtilsTests(TestCase):
         self.assertIsNone(metadata_file)
         self.assertFalse(os.path.exists(self.extraction_target_dir))
 
+    def test_attachment_index_resolves_without_filesystem_probes(self):
+        index = AttachmentIndex('/export', [
+            'attachments/', 'pages/a.html', 'pages/logo.png', 'attachments/logo.png',
+            'attachments/101/diagram.png', 'attachments/102/diagram.png', 'attachments/103/unique.pdf', '../evil.png',
+        ])
+        with patch('importer.utils.os.path.exists') as mock_exists:
+            self.assertEqual(index.find('logo.png', html_path='/export/pages/a.html'), '/export/pages/logo.png') # Next to the HTML first
+            self.assertEqual(index.find('logo.png', html_path='/export/other.html'), '/export/attachments/logo.png')
+            self.assertEqual(index.find('diagram.png', html_path='/export/pages/a.html', page_id='102'), '/export/attachments/102/diagram.png')
+            self.assertIsNone(index.find('diagram.png', html_path='/export/pages/a.html')) # Ambiguous without the page ID
+            self.assertEqual(index.find('unique.pdf', page_id='999'), '/export/attachments/103/unique.pdf')
+            self.assertIsNone(index.find('evil.png'))
+        mock_exists.assert_not_called()
+
+    def test_attachment_index_from_zip(self):
+        index = AttachmentIndex.from_zip(self.dummy_zip_path, self.extraction_target_dir)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.find('entities.xml'), os.path.join(os.path.abspath(self.extraction_target_dir), 'entities.xml'))
+
     def test_extract_from_bad_zip(self):
         bad_zip_path = os.path.join(self.base_temp_dir, "bad_utils.zip")
         with open(bad_zip_path, "w", encoding="utf-8") as f: f.write("this is not a zip file")
@@ -199,7 +218,7 @@ class ConfluenceImportViewTests(TestCase): # APITestCase is also fine, TestCase
         if hasattr(self, 'user') and self.user:
             self.user.delete()
 
-    @patch('importer.views.import_confluence_space')
+    @patch('importer.scheduling.import_confluence_space')
     def test_post_request_triggers_import_task(self, mock_import_task):
         dummy_file = SimpleUploadedFile("test.zip", b"content", "application/zip")
         response = self.client.post(self.import_url, {'file': dummy_file}, format='multipart')
@@ -209,9 +228,9 @@ class ConfluenceImportViewTests(TestCase): # APITestCase is also fine, TestCase
         upload = ConfluenceUpload.objects.first()
         self.assertIsNone(upload.target_workspace)
         self.assertIsNone(upload.target_space)
-        mock_import_task.delay.assert_called_once_with(confluence_upload_id=upload.id)
+        mock_import_task.apply_async.assert_called_once_with(kwargs={'confluence_upload_id': upload.id}, queue='imports_small')
 
-    @patch('importer.views.import_confluence_space')
+    @patch('importer.scheduling.import_confluence_space')
     def test_import_view_with_target_workspace_and_space_success(self, mock_import_task):
         if not self.workspace1 or not self.space1_ws1:
             self.skipTest("Workspace/Space not available for target selection test.")
@@ -231,9 +250,9 @@ class ConfluenceImportViewTests(TestCase): # APITestCase is also fine, TestCase
         upload_record = ConfluenceUpload.objects.first()
         self.assertEqual(upload_record.target_workspace, self.workspace1)
         self.assertEqual(upload_record.target_space, self.space1_ws1)
-        mock_import_task.delay.assert_called_once_with(confluence_upload_id=upload_record.id)
+        mock_import_task.apply_async.assert_called_once_with(kwargs={'confluence_upload_id': upload_record.id}, queue='imports_small')
 
-    @patch('importer.views.import_confluence_space')
+    @patch('importer.scheduling.import_confluence_space')
     def test_import_view_with_only_target_workspace_success(self, mock_import_task):
         if not self.workspace1:
             self.skipTest("Workspace not available for target selection test.")
@@ -246,25 +265,25 @@ class ConfluenceImportViewTests(TestCase): # APITestCase is also fine, TestCase
         upload_record = ConfluenceUpload.objects.first()
         self.assertEqual(upload_record.target_workspace, self.workspace1)
         self.assertIsNone(upload_record.target_space)
-        mock_import_task.delay.assert_called_once_with(confluence_upload_id=upload_record.id)
+        mock_import_task.apply_async.assert_called_once_with(kwargs={'confluence_upload_id': upload_record.id}, queue='imports_small')
 
-    @patch('importer.views.import_confluence_space')
+    @patch('importer.scheduling.import_confluence_space')
     def test_import_view_invalid_target_workspace_id(self, mock_import_task):
         test_file = SimpleUploadedFile("invalid_ws.zip", b"c", "application/zip")
         payload = {'file': test_file, 'target_workspace_id': 99999}
         response = self.client.post(self.import_url, data=payload, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
-        mock_import_task.delay.assert_not_called()
+        mock_import_task.apply_async.assert_not_called()
 
-    @patch('importer.views.import_confluence_space')
+    @patch('importer.scheduling.import_confluence_space')
     def test_import_view_invalid_target_space_id(self, mock_import_task):
         test_file = SimpleUploadedFile("invalid_sp.zip", b"c", "application/zip")
         payload = {'file': test_file, 'target_space_id': 88888}
         response = self.client.post(self.import_url, data=payload, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
-        mock_import_task.delay.assert_not_called()
+        mock_import_task.apply_async.assert_not_called()
 
-    @patch('importer.views.import_confluence_space')
+    @patch('importer.scheduling.import_confluence_space')
     def test_import_view_space_not_in_workspace_error(self, mock_import_task):
         if not self.workspace1 or not self.space1_ws2:
             self.skipTest("Workspace/Space setup not available for cross-match test.")
@@ -278,7 +297,7 @@ class ConfluenceImportViewTests(TestCase): # APITestCase is also fine, TestCase
         response = self.client.post(self.import_url, data=payload, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("does not belong to target workspace", response.data.get('error', '').lower())
-        mock_import_task.delay.assert_not_called()
+        mock_import_task.apply_async.assert_not_called()
 
 
 class EnhancedHtmlParserTests(TestCase):
@@ -576,6 +595,26 @@ class HtmlConverterTests(TestCase):
         expected_json = {"type": "doc", "content": [{"type": "blockquote", "attrs": {"panelType": "note"}, "content": [{"type": "paragraph", "content": [{"type": "text", "text": "Actual content."}]}]}]}
         self.assertEqual(convert_html_to_prosemirror_json(html), expected_json)
 
+    def test_unsupported_macros_become_fallback_placeholders(self):
+        html = (
+            '<p>Status <span data-macro-name="status">DONE</span></p>'
+            '<ac:structured-macro ac:name="jira"><ac:parameter ac:name="key">PROJ-1</ac:parameter></ac:structured-macro>'
+            '<div class="conf-macro output-block" data-macro-name="toc"><div data-macro-name="children">Nested</div></div>'
+            '<div class="confluence-information-macro confluence-information-macro-note" data-macro-name="note"><div class="confluence-information-macro-body">Kept</div></div>'
+        )
+        fallback_macros = []
+        doc = convert_html_to_prosemirror_json(html, fallback_macros=fallback_macros)
+        self.assertEqual([node['type'] for node in doc['content']], ['paragraph', 'fallbackMacroPlaceholder', 'fallbackMacroPlaceholder', 'blockquote'])
+        self.assertEqual(doc['content'][0]['content'][1]['text'], 'DONE') # Inline macro keeps its text
+        self.assertEqual([macro['macro_name'] for macro in fallback_macros], ['jira', 'toc']) # Nested 'children' stays inside 'toc'
+        self.assertEqual([node['attrs']['placeholderId'] for node in doc['content'][1:3]], [macro['placeholder_id'] for macro in fallback_macros])
+        self.assertIn('PROJ-1', fallback_macros[0]['raw_macro_content'])
+        self.assertIn('Nested', fallback_macros[1]['raw_macro_content'])
+
+    def test_macros_are_converted_inline_without_fallback_list(self):
+        html = '<div data-macro-name="toc"><p>Contents</p></div>'
+        self.assertEqual(convert_html_to_prosemirror_json(html), {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "Contents"}]}]})
+
 
 class ConfluenceMetadataParserTests(TestCase):
     def setUp(self): self.temp_dir = tempfile.mkdtemp(prefix="metadata_parser_tests_")
@@ -596,6 +635,16 @@ class ConfluenceMetadataParserTests(TestCase):
         self.assertEqual(result[0], {'id': '200', 'title': 'Top', 'parent_id': None})
     def test_parse_file_not_found(self): self.assertEqual(parse_confluence_metadata_for_hierarchy("n.xml"), [])
     def test_parse_malformed_xml(self): self.assertEqual(parse_confluence_metadata_for_hierarchy(self._create_dummy_xml_file("m.xml", "<u")), [])
+    def test_iter_metadata_pages_streams_nested_pages_in_document_order(self):
+        from .parser import iter_confluence_metadata_pages
+        xml_content = """<hibernate-generic><object class="BodyContent"><property name="body"><string>big body</string></property></object>
+            <object class="Page"><property name="id"><long>2</long></property><property name="title"><string>Child</string></property>
+                <property name="parent"><object class="Page"><property name="id"><long>1</long></property><property name="title"><string>Parent</string></property></object></property></object>
+            <object class="Page"><property name="title"><string>No ID</string></property></object>
+            <object class="Page"><property name="id"><long>3</long></property><property name="parentPage"><id>1</id></property></object></hibernate-generic>"""
+        records = list(iter_confluence_metadata_pages(self._create_dummy_xml_file("nested.xml", xml_content)))
+        self.assertEqual([(r.id, r.title, r.parent_id) for r in records], [('2', 'Child', '1'), ('1', 'Parent', None), ('3', None, '1')])
+        self.assertFalse(hasattr(records[0], '__dict__'))
 
 
 @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
@@ -765,6 +814,21 @@ class ConfluenceImportTaskTests(TestCase):
         self.assertEqual(c_h1.parent, p_h); self.assertIsNone(p_h.parent)
         self.assertIn(c_h1, p_h.children.all())
 
+    @override_settings(CC_PAGE_RENDER_ON_SAVE=True)
+    def test_import_task_renders_pages_in_one_batch_instead_of_per_save(self):
+        if not self.space_default_in_ws_default: self.skipTest("Default Space not available.")
+        xml = "<hibernate-generic>" + "".join(f"<object class='Page'><property name='id'><long>{n}</long></property><property name='title'><string>R{n}</string></property></object>" for n in (300, 301, 302)) + "</hibernate-generic>"
+        html = {f"R_{n}.html": f"<html><title>R{n}</title><body><p>B{n}</p></body></html>" for n in (300, 301, 302)}
+        zip_path = self._create_dummy_confluence_zip("tr.zip", html, metadata_xml_content=xml)
+        with open(zip_path,'rb') as f: upload_file=SimpleUploadedFile("tr.zip",f.read(),'application/zip')
+        upload_record = ConfluenceUpload.objects.create(user=self.user, file=upload_file)
+        with patch('pages.tasks.render_page_version.delay') as mock_render_one, patch('importer.tasks.render_pages.delay') as mock_render_batch:
+            with self.captureOnCommitCallbacks(execute=True):
+                import_confluence_space(upload_record.id)
+        mock_render_one.assert_not_called()
+        mock_render_batch.assert_called_once()
+        self.assertEqual(sorted(mock_render_batch.call_args.args[0]), sorted(Page.objects.values_list('pk', flat=True)))
+
     def test_import_task_html_file_not_in_metadata_is_skipped(self):
         if not self.space_default_in_ws_default: self.skipTest("Default Space not available for testing.")
         sample_metadata_xml = """<hibernate-generic><object class="Page"><property name="id"><long>100</long></property><property name="title"><string>Page A Title from Meta</string></property></object></hibernate-generic>"""
@@ -908,6 +972,271 @@ class ConfluenceImportTaskTests(TestCase):
         self.assertEqual(created_page.space, self.space_default_in_ws_default)
         self.assertEqual(created_page.space.workspace, self.ws_default)
 
+    def _run_export(self, zip_name, pages, mode=ConfluenceUpload.MODE_IMPORT, delete_missing=False):
+        # pages: {original_id: (title, body_html)}
+        html_data = {f"p_{pid}.html": f"<html><head><title>{title}</title><meta name='ajs-page-id' content='{pid}'></head><body><div id='main-content'>{body}</div></body></html>" for pid, (title, body) in pages.items()}
+        objects = "".join(f"<object class='Page'><property name='id'><long>{pid}</long></property><property name='title'><string>{title}</string></property></object>" for pid, (title, _) in pages.items())
+        zip_path = self._create_dummy_confluence_zip(zip_name, html_files_data=html_data, metadata_xml_content=f"<hibernate-generic>{objects}</hibernate-generic>")
+        with open(zip_path, 'rb') as f: upload_file = SimpleUploadedFile(zip_name, f.read(), 'application/zip')
+        upload_record = ConfluenceUpload.objects.create(user=self.user, file=upload_file, target_space=self.space_target_in_ws_target, mode=mode, delete_missing=delete_missing)
+        import_confluence_space(confluence_upload_id=upload_record.id)
+        upload_record.refresh_from_db()
+        return upload_record
+
+    def test_incremental_sync_updates_only_changed_pages(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        from pages.models import PageVersion
+        self._run_export("v1.zip", {"901": ("Same", "<p>same</p>"), "902": ("Edited", "<p>old</p>"), "903": ("Removed", "<p>gone</p>")})
+        unchanged_before = Page.objects.get(original_confluence_id="901")
+
+        upload_record = self._run_export("v2.zip", {"901": ("Same", "<p>same</p>"), "902": ("Edited", "<p>new</p>"), "904": ("Added", "<p>added</p>")}, mode=ConfluenceUpload.MODE_SYNC, delete_missing=True)
+        self.assertEqual(upload_record.status, ConfluenceUpload.STATUS_COMPLETED, upload_record.error_details)
+        self.assertEqual((upload_record.pages_succeeded_count, upload_record.pages_updated_count, upload_record.pages_unchanged_count, upload_record.pages_deleted_count, upload_record.pages_failed_count), (1, 1, 1, 1, 0))
+
+        unchanged = Page.objects.get(original_confluence_id="901")
+        self.assertEqual((unchanged.version, unchanged.updated_at), (1, unchanged_before.updated_at))
+        edited = Page.objects.get(original_confluence_id="902")
+        self.assertEqual(edited.version, 2)
+        self.assertIn("new", edited.content_json['content'][0]['content'][0]['text'])
+        versions = dict(PageVersion.objects.filter(page=edited).values_list('version_number', 'content_json'))
+        self.assertEqual(sorted(versions), [1, 2]) # Pre-sync content kept as v1
+        self.assertIn("old", versions[1]['content'][0]['content'][0]['text'])
+        self.assertTrue(Page.objects.get(original_confluence_id="903").is_deleted)
+        self.assertTrue(Page.objects.filter(original_confluence_id="904", is_deleted=False).exists())
+
+    def test_sync_replaces_attachment_whose_file_changed(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        html_data = {"p_921.html": "<html><head><title>Chart</title><meta name='ajs-page-id' content='921'></head><body><div id='main-content'><p><img src='attachments/921/chart.png'></p></div></body></html>"}
+        metadata_xml = "<hibernate-generic><object class='Page'><property name='id'><long>921</long></property><property name='title'><string>Chart</string></property></object></hibernate-generic>"
+
+        def run(zip_name, chart_bytes, mode):
+            zip_path = self._create_dummy_confluence_zip(zip_name, html_files_data=html_data, attachment_files_data={"921/chart.png": chart_bytes}, create_attachments_subfolder=True, metadata_xml_content=metadata_xml)
+            with open(zip_path, 'rb') as f: upload_file = SimpleUploadedFile(zip_name, f.read(), 'application/zip')
+            upload_record = ConfluenceUpload.objects.create(user=self.user, file=upload_file, target_space=self.space_target_in_ws_target, mode=mode)
+            with self.captureOnCommitCallbacks(execute=True):
+                import_confluence_space(confluence_upload_id=upload_record.id)
+            upload_record.refresh_from_db()
+            return upload_record
+
+        run("c1.zip", b"chart v1", ConfluenceUpload.MODE_IMPORT)
+        old_attachment = Attachment.objects.get(page__original_confluence_id="921")
+        self.assertEqual(old_attachment.source_fingerprint.split(':')[0], '8')
+        self.assertEqual(run("c2.zip", b"chart v1", ConfluenceUpload.MODE_SYNC).pages_unchanged_count, 1)
+
+        upload_record = run("c3.zip", b"chart v2", ConfluenceUpload.MODE_SYNC) # Same HTML, same size, new bytes
+        self.assertEqual((upload_record.pages_updated_count, upload_record.attachments_succeeded_count), (1, 1), upload_record.error_details)
+        new_attachment = Attachment.objects.get(page__original_confluence_id="921")
+        self.assertNotEqual(new_attachment.pk, old_attachment.pk)
+        with new_attachment.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b"chart v2")
+        self.assertFalse(old_attachment.file.storage.exists(old_attachment.file.name))
+        page = Page.objects.get(original_confluence_id="921")
+        self.assertEqual(page.content_json['content'][0]['content'][0]['attrs']['src'], new_attachment.file.url)
+
+    def test_plain_reimport_still_skips_existing_pages(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        self._run_export("v1.zip", {"911": ("Page", "<p>old</p>")})
+        upload_record = self._run_export("v2.zip", {"911": ("Page", "<p>new</p>")})
+        self.assertEqual((upload_record.pages_succeeded_count, upload_record.pages_failed_count, upload_record.pages_updated_count), (0, 1, 0))
+        self.assertEqual(Page.objects.get(original_confluence_id="911").version, 1)
+
+    def test_import_resolves_attachments_in_page_id_folders(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        # Confluence HTML export layout: attachments/<page id>/<file>, referenced relative to the page.
+        html_data = {"pages/p_951.html": "<html><head><title>Pictures</title><meta name='ajs-page-id' content='951'></head><body><div id='main-content'><p><img src='attachments/951/chart.png'></p></div></body></html>"}
+        metadata_xml = "<hibernate-generic><object class='Page'><property name='id'><long>951</long></property><property name='title'><string>Pictures</string></property></object></hibernate-generic>"
+        zip_path = self._create_dummy_confluence_zip("page_folders.zip", html_files_data=html_data, attachment_files_data={"951/chart.png": b"not really a png"}, create_attachments_subfolder=True, metadata_xml_content=metadata_xml)
+        with open(zip_path, 'rb') as f: upload_file = SimpleUploadedFile("page_folders.zip", f.read(), 'application/zip')
+        upload_record = ConfluenceUpload.objects.create(user=self.user, file=upload_file, target_space=self.space_target_in_ws_target)
+        import_confluence_space(confluence_upload_id=upload_record.id)
+        upload_record.refresh_from_db()
+        self.assertEqual((upload_record.status, upload_record.attachments_succeeded_count), (ConfluenceUpload.STATUS_COMPLETED, 1), upload_record.error_details)
+
+        page = Page.objects.get(original_confluence_id="951")
+        attachment = Attachment.objects.get(page=page)
+        self.assertEqual(attachment.original_filename, "chart.png")
+        self.assertEqual(page.content_json['content'][0]['content'][0]['attrs']['src'], attachment.file.url)
+
+    def test_import_uploads_attachments_outside_the_batch_transaction(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        from django.db import connection
+        from .attachment_upload import AttachmentUploader
+        html_data = {"p_971.html": "<html><head><title>Upload</title><meta name='ajs-page-id' content='971'></head><body><div id='main-content'><p><img src='attachments/971/a.png'></p></div></body></html>"}
+        metadata_xml = "<hibernate-generic><object class='Page'><property name='id'><long>971</long></property><property name='title'><string>Upload</string></property></object></hibernate-generic>"
+        zip_path = self._create_dummy_confluence_zip("upload_outside.zip", html_files_data=html_data, attachment_files_data={"971/a.png": b"png"}, create_attachments_subfolder=True, metadata_xml_content=metadata_xml)
+        with open(zip_path, 'rb') as f: upload_file = SimpleUploadedFile("upload_outside.zip", f.read(), 'application/zip')
+        upload_record = ConfluenceUpload.objects.create(user=self.user, file=upload_file, target_space=self.space_target_in_ws_target)
+        test_depth = len(connection.atomic_blocks) # The test case's own transactions
+        upload_depths = []
+        original_upload = AttachmentUploader.upload
+        def recording_upload(uploader, files):
+            upload_depths.append(len(connection.atomic_blocks))
+            return original_upload(uploader, files)
+        with patch.object(AttachmentUploader, 'upload', recording_upload):
+            import_confluence_space(confluence_upload_id=upload_record.id)
+        upload_record.refresh_from_db()
+        self.assertEqual(upload_record.attachments_succeeded_count, 1, upload_record.error_details)
+        self.assertEqual(upload_depths, [test_depth])
+
+    def test_import_writes_page_attachments_with_one_insert(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        images = ''.join(f"<img src='attachments/961/img{n}.png'>" for n in range(4))
+        html_data = {"p_961.html": f"<html><head><title>Gallery</title><meta name='ajs-page-id' content='961'></head><body><div id='main-content'><p>{images}</p></div></body></html>"}
+        metadata_xml = "<hibernate-generic><object class='Page'><property name='id'><long>961</long></property><property name='title'><string>Gallery</string></property></object></hibernate-generic>"
+        zip_path = self._create_dummy_confluence_zip("gallery.zip", html_files_data=html_data, attachment_files_data={f"961/img{n}.png": b"png" for n in range(4)}, create_attachments_subfolder=True, metadata_xml_content=metadata_xml)
+        with open(zip_path, 'rb') as f: upload_file = SimpleUploadedFile("gallery.zip", f.read(), 'application/zip')
+        upload_record = ConfluenceUpload.objects.create(user=self.user, file=upload_file, target_space=self.space_target_in_ws_target)
+        with patch('importer.tasks.generate_page_attachment_derivatives'), CaptureQueriesContext(connection) as queries:
+            import_confluence_space(confluence_upload_id=upload_record.id)
+        upload_record.refresh_from_db()
+        self.assertEqual(upload_record.attachments_succeeded_count, 4, upload_record.error_details)
+        self.assertEqual(sum(1 for query in queries.captured_queries if query['sql'].startswith('INSERT INTO "pages_attachment"')), 1)
+        page = Page.objects.get(original_confluence_id="961")
+        urls = {attachment.file.url for attachment in Attachment.objects.filter(page=page)}
+        self.assertEqual({node['attrs']['src'] for node in page.content_json['content'][0]['content']}, urls)
+
+    @override_settings(CC_IMPORT_PAGES_PER_TRANSACTION=2)
+    def test_failing_page_is_rolled_back_alone_within_its_batch(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        html_data = {f"p_{pid}.html": f"<html><head><title>Page {pid}</title><meta name='ajs-page-id' content='{pid}'></head><body><div id='main-content'><p><img src='attachments/{pid}/pic.png'></p></div></body></html>" for pid in range(971, 976)}
+        parent_xml = "<property name='parent'><id>971</id></property>"
+        objects = "".join(f"<object class='Page'><property name='id'><long>{pid}</long></property><property name='title'><string>Page {pid}</string></property>{'' if pid == 971 else parent_xml}</object>" for pid in range(971, 976))
+        zip_path = self._create_dummy_confluence_zip("batches.zip", html_files_data=html_data, attachment_files_data={f"{pid}/pic.png": b"png" for pid in range(971, 976)}, create_attachments_subfolder=True, metadata_xml_content=f"<hibernate-generic>{objects}</hibernate-generic>")
+        with open(zip_path, 'rb') as f: upload_file = SimpleUploadedFile("batches.zip", f.read(), 'application/zip')
+        upload_record = ConfluenceUpload.objects.create(user=self.user, file=upload_file, target_space=self.space_target_in_ws_target)
+
+        real_bulk_create = Attachment.objects.bulk_create
+        stored_names = []
+        def bulk_create_failing_for_page_973(objs, *args, **kwargs):
+            stored_names.extend(obj.file.name for obj in objs)
+            if objs[0].page.original_confluence_id == "973": raise RuntimeError("disk full")
+            return real_bulk_create(objs, *args, **kwargs)
+        with patch.object(Attachment.objects, 'bulk_create', side_effect=bulk_create_failing_for_page_973), patch('importer.tasks.generate_page_attachment_derivatives'):
+            import_confluence_space(confluence_upload_id=upload_record.id)
+        upload_record.refresh_from_db()
+
+        self.assertEqual(upload_record.status, ConfluenceUpload.STATUS_COMPLETED)
+        self.assertEqual((upload_record.pages_succeeded_count, upload_record.pages_failed_count, upload_record.attachments_succeeded_count), (4, 1, 4))
+        self.assertIn("disk full", upload_record.error_details)
+        self.assertFalse(Page.objects.filter(original_confluence_id="973").exists()) # Page row rolled back with its savepoint
+        self.assertEqual(Page.objects.filter(original_confluence_id__in=["972", "974", "975"], parent__original_confluence_id="971").count(), 3)
+        storage = Attachment._meta.get_field('file').storage
+        self.assertEqual(len(stored_names), 5)
+        self.assertEqual([name for name in stored_names if not storage.exists(name)], [stored_names[2]]) # Only page 973's file is removed
+
+    def test_import_stores_fallback_macros_for_placeholders(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        from pages.models import PageVersion
+        from .models import FallbackMacro
+        body = '<p>Intro</p><ac:structured-macro ac:name="jira"><ac:parameter ac:name="key">A-1</ac:parameter></ac:structured-macro><div data-macro-name="toc">TOC</div>'
+        upload_record = self._run_export("macros.zip", {"931": ("Macro Page", body), "932": ("Plain Page", "<p>plain</p>")})
+        self.assertEqual(upload_record.status, ConfluenceUpload.STATUS_COMPLETED, upload_record.error_details)
+
+        page = Page.objects.get(original_confluence_id="931")
+        placeholder_ids = [node['attrs']['placeholderId'] for node in page.content_json['content'] if node['type'] == 'fallbackMacroPlaceholder']
+        macros = FallbackMacro.objects.filter(page_version__page=page)
+        self.assertEqual(sorted(str(macro.placeholder_id_in_content) for macro in macros), sorted(placeholder_ids))
+        self.assertEqual(sorted(macro.macro_name for macro in macros), ['jira', 'toc'])
+        self.assertEqual(list(PageVersion.objects.filter(page=page).values_list('version_number', flat=True)), [1])
+        self.assertFalse(PageVersion.objects.filter(page__original_confluence_id="932").exists()) # No macros, no extra version row
+
+    def test_fallback_macro_batch_endpoint(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        from guardian.shortcuts import assign_perm
+        from pages.models import PageVersion
+        body = ''.join(f'<ac:structured-macro ac:name="jira"><ac:parameter ac:name="key">A-{n}</ac:parameter></ac:structured-macro>' for n in range(5))
+        self._run_export("batch.zip", {"941": ("Batch Page", body)})
+        page = Page.objects.get(original_confluence_id="941")
+        placeholder_ids = {node['attrs']['placeholderId'] for node in page.content_json['content']}
+        url = reverse('importer:fallbackmacro-batch')
+
+        reader = User.objects.create_user(username='fallback_reader', password='password')
+        client = APIClient()
+        client.force_authenticate(user=reader)
+        self.assertEqual(client.get(url, {'page': page.pk}).status_code, status.HTTP_403_FORBIDDEN)
+        assign_perm('pages.view_page', reader, page)
+
+        client.get(url, {'page': page.pk}) # Warms the permission cache
+        with self.assertNumQueries(2): # Page, then all macros in one query
+            response = client.get(url, {'page': page.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['macros']), placeholder_ids)
+        macro = next(iter(response.data['macros'].values()))
+        self.assertEqual((macro['macro_name'], macro['page_title']), ('jira', 'Batch Page'))
+
+        version = PageVersion.objects.get(page=page)
+        response = client.get(url, {'page_version': version.pk})
+        self.assertEqual((response.data['page'], response.data['page_version'], set(response.data['macros'])), (page.pk, version.pk, placeholder_ids))
+        self.assertEqual(client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(client.get(url, {'page': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CC_IMPORT_SPILL_THRESHOLD=1, CC_IMPORT_PAGES_PER_TRANSACTION=2)
+    def test_import_with_spilled_lookup_maps_logs_errors_incrementally(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        from .models import ImportErrorLog
+        html_data = {f"p_{pid}.html": f"<html><head><title>Page {pid}</title><meta name='ajs-page-id' content='{pid}'></head><body><div id='main-content'><p><img src='missing_{pid}.png'></p></div></body></html>" for pid in range(981, 985)}
+        parent_xml = "<property name='parent'><id>981</id></property>"
+        objects = "".join(f"<object class='Page'><property name='id'><long>{pid}</long></property><property name='title'><string>Page {pid}</string></property>{'' if pid == 981 else parent_xml}</object>" for pid in range(981, 986))
+        zip_path = self._create_dummy_confluence_zip("spill.zip", html_files_data=html_data, metadata_xml_content=f"<hibernate-generic>{objects}</hibernate-generic>")
+        with open(zip_path, 'rb') as f: upload_file = SimpleUploadedFile("spill.zip", f.read(), 'application/zip')
+        upload_record = ConfluenceUpload.objects.create(user=self.user, file=upload_file, target_space=self.space_target_in_ws_target)
+        ImportErrorLog.objects.create(upload=upload_record, message="from a previous run")
+        import_confluence_space(confluence_upload_id=upload_record.id)
+        upload_record.refresh_from_db()
+
+        self.assertEqual(upload_record.status, ConfluenceUpload.STATUS_COMPLETED, upload_record.error_details)
+        self.assertEqual((upload_record.pages_succeeded_count, upload_record.pages_failed_count), (4, 1)) # 985 has no HTML
+        self.assertEqual(Page.objects.filter(parent__original_confluence_id="981").count(), 3)
+        logged = list(ImportErrorLog.objects.filter(upload=upload_record).values_list('page_original_id', 'message'))
+        self.assertEqual(upload_record.error_count, 5)
+        self.assertEqual([page_id for page_id, _ in logged], ['981', '982', '983', '984', '985'])
+        self.assertIn("File not found", logged[0][1])
+        self.assertIn("not found by ID or title match", logged[-1][1])
+        self.assertIn("missing_981.png", upload_record.error_details)
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(reverse('importer:confluence-upload-errors', kwargs={'pk': upload_record.pk}), {'limit': 2})
+        self.assertEqual((response.status_code, response.data['count'], len(response.data['results'])), (status.HTTP_200_OK, 5, 2))
+        client.force_authenticate(user=User.objects.create_user(username='other_importer', password='password'))
+        self.assertEqual(client.get(reverse('importer:confluence-upload-errors', kwargs={'pk': upload_record.pk})).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_error_summary_keeps_first_errors_and_counts_the_rest(self):
+        from .error_log import ImportErrors, SUMMARY_MAX_CHARS
+        from .models import ImportErrorLog
+        upload_record = ConfluenceUpload.objects.create(user=self.user, file=SimpleUploadedFile("e.zip", b"zip"))
+        errors = ImportErrors(upload_record)
+        for n in range(100):
+            errors.add(f"error {n:03d} " + "x" * 40)
+        errors.add("CRITICAL ERROR: boom", first=True)
+        self.assertFalse(ImportErrorLog.objects.filter(upload=upload_record).exists()) # Nothing written before flush()
+        errors.flush()
+        summary = errors.summary()
+        self.assertEqual((len(errors), ImportErrorLog.objects.filter(upload=upload_record).count()), (101, 101))
+        self.assertLessEqual(len(summary), SUMMARY_MAX_CHARS)
+        self.assertTrue(summary.startswith("CRITICAL ERROR: boom\nerror 000"))
+        self.assertRegex(summary, r"\.\.\. and \d+ more \(see the import's error log\)\.$")
+
+    def test_import_records_phase_metrics(self):
+        if not self.space_target_in_ws_target: self.skipTest("Target Space not available.")
+        from core import metrics
+        labels = {'phase': 'convert'}
+        converted_before = metrics.get_value('conflu_import_phase_items_total', **labels)
+        upload_record = self._run_export("phases.zip", {"921": ("Parent", "<p>a</p>"), "922": ("Child", "<p>b</p>")})
+        self.assertEqual(upload_record.status, ConfluenceUpload.STATUS_COMPLETED, upload_record.error_details)
+
+        phase_metrics = upload_record.phase_metrics
+        self.assertEqual(phase_metrics['release'], django_settings.APP_RELEASE_VERSION)
+        self.assertTrue({'extract', 'metadata_parse', 'html_index', 'convert', 'db_write', 'attachment_write'} <= set(phase_metrics['phases']))
+        self.assertEqual(phase_metrics['phases']['convert']['items'], 2)
+        self.assertEqual(phase_metrics['phases']['db_write']['items'], 2)
+        self.assertEqual(phase_metrics['phases']['html_index']['items'], 2)
+        self.assertGreaterEqual(phase_metrics['total_wall_seconds'], phase_metrics['phases']['convert']['wall_seconds'])
+        self.assertEqual(metrics.get_value('conflu_import_phase_items_total', **labels), converted_before + 2)
+        self.assertIn('conflu_import_phase_seconds_total{phase="convert"', metrics.render_prometheus())
+
 
 # Test class for the ConfluenceUploadStatusView API endpoint
 from rest_framework.test import APITestCase # Ensure this is imported if not already at top
@@ -1043,3 +1372,397 @@ class ConfluenceUploadStatusViewTests(APITestCase):
         self.client.force_authenticate(user=self.other_user)
         response = self.client.get(f"{self.base_url}{self.upload_pending.pk}/") # upload_pending belongs to self.user
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND) # Or 403 depending on object-level permissions
+
+
+class AttachmentUploaderTests(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="attachment_uploader_tests_")
+        self.media_override = override_settings(MEDIA_ROOT=os.path.join(self.temp_dir, 'media'))
+        self.media_override.enable()
+        self.sources = []
+        for n in range(6):
+            path = os.path.join(self.temp_dir, f'source{n}.bin')
+            with open(path, 'wb') as fh: fh.write(f'file {n}'.encode())
+            self.sources.append(path)
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.temp_dir)
+
+    def test_uploads_concurrently_with_unique_names_and_isolated_failures(self):
+        from .attachment_upload import AttachmentUploader
+        from pages.models import Attachment
+        storage = Attachment._meta.get_field('file').storage
+        files = [(path, 'same.png') for path in self.sources] + [(os.path.join(self.temp_dir, 'missing.bin'), 'missing.png')]
+        uploader = AttachmentUploader(max_workers=4)
+        try:
+            results = uploader.upload(files)
+        finally:
+            uploader.close()
+
+        stored_names = [name for name, error in results[:-1]]
+        self.assertTrue(all(error is None for _, error in results[:-1]))
+        self.assertEqual(len(set(stored_names)), len(self.sources)) # Concurrent saves of one filename never overwrite each other
+        self.assertTrue(all(name.startswith('page_attachments/') for name in stored_names))
+        self.assertEqual(sorted(storage.open(name).read() for name in stored_names), sorted(f'file {n}'.encode() for n in range(6)))
+        self.assertIsNone(results[-1][0])
+        self.assertIsInstance(results[-1][1], FileNotFoundError)
+
+
+class SpillableMapTests(TestCase):
+    def setUp(self): self.temp_dir = tempfile.mkdtemp(prefix="spill_tests_")
+    def tearDown(self): shutil.rmtree(self.temp_dir)
+
+    def test_moves_to_sqlite_past_threshold_and_keeps_dict_semantics(self):
+        from .spill import SpillableMap
+        lookup = SpillableMap(spill_dir=self.temp_dir, threshold=2)
+        lookup['a'] = 1; lookup['b'] = (2, 'x', None)
+        self.assertFalse(lookup.spilled)
+        lookup['c'] = 3; lookup[4] = 'int key'; lookup['a'] = 10
+        self.assertTrue(lookup.spilled)
+        self.assertEqual(len(os.listdir(self.temp_dir)), 1)
+        self.assertEqual((len(lookup), lookup['a'], lookup['b'], lookup[4], lookup.get('missing', 'default')), (4, 10, (2, 'x', None), 'int key', 'default'))
+        self.assertTrue('c' in lookup and 'missing' not in lookup)
+        with self.assertRaises(KeyError): lookup['missing']
+        self.assertEqual(sorted(lookup.values(), key=str), sorted([10, (2, 'x', None), 3, 'int key'], key=str))
+        lookup.close()
+        self.assertEqual((os.listdir(self.temp_dir), len(lookup)), ([], 0))
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.staging_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(CC_CHUNKED_UPLOAD_DIR=self.staging_dir, CC_CHUNKED_UPLOAD_MAX_CHUNK_SIZE=1024)
+        self.settings_override.enable()
+        self.user = get_user_model().objects.create_user(username=f"chunk_user_{uuid.uuid4().hex[:6]}", password="password_test")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.data = os.urandom(2500)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        for upload in ConfluenceUpload.objects.all():
+            upload.file.delete(save=False)
+
+    def _init(self, **extra):
+        import hashlib
+        payload = {'filename': 'space.zip', 'total_size': len(self.data), 'sha256': hashlib.sha256(self.data).hexdigest(), **extra}
+        response = self.client.post(reverse('importer:confluence-chunked-init'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['upload_id']
+
+    def _put(self, upload_id, offset, chunk, checksum=None):
+        import hashlib
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        headers['HTTP_UPLOAD_CHECKSUM'] = f"sha256 {checksum or hashlib.sha256(chunk).hexdigest()}"
+        return self.client.generic(
+            'PUT', reverse('importer:confluence-chunked-upload', args=[upload_id]), chunk,
+            content_type='application/octet-stream', **headers
+        )
+
+    @patch('importer.scheduling.import_confluence_space')
+    def test_chunked_upload_resume_and_complete(self, mock_import_task):
+        upload_id = self._init()
+        self.assertEqual(self._put(upload_id, 0, self.data[:1000]).data['received_bytes'], 1000)
+
+        # A bad chunk is rejected and not kept; the client learns where to resume.
+        response = self._put(upload_id, 1000, self.data[1000:2000], checksum='0' * 64)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['received_bytes'], 1000)
+        response = self._put(upload_id, 1500, self.data[1500:2000])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.get(reverse('importer:confluence-chunked-upload', args=[upload_id])).data['received_bytes'], 1000)
+
+        # Completing early is refused.
+        complete_url = reverse('importer:confluence-chunked-complete', args=[upload_id])
+        self.assertEqual(self.client.post(complete_url).status_code, status.HTTP_409_CONFLICT)
+
+        self._put(upload_id, 1000, self.data[1000:2000])
+        self._put(upload_id, 2000, self.data[2000:])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        upload = ConfluenceUpload.objects.get()
+        self.assertEqual(upload.user, self.user)
+        with upload.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.data)
+        mock_import_task.apply_async.assert_called_once_with(kwargs={'confluence_upload_id': upload.id}, queue='imports_small')
+        self.assertEqual(os.listdir(self.staging_dir), [])
+
+    def test_chunk_streams_outside_a_transaction_under_a_claim(self):
+        from datetime import timedelta
+        from django.db import connection
+        from django.utils import timezone
+        from .chunked import write_chunk
+        from .models import ChunkedUpload
+        upload_id = self._init()
+        test_depth = len(connection.atomic_blocks)
+        seen = []
+        def streaming_write(upload, *args):
+            seen.append((len(connection.atomic_blocks), self._put(upload_id, 0, self.data[:1000]).status_code))
+            return write_chunk(upload, *args)
+        with patch('importer.views.write_chunk', streaming_write):
+            response = self._put(upload_id, 0, self.data[:1000])
+        self.assertEqual(response.data['received_bytes'], 1000)
+        self.assertEqual(seen, [(test_depth, status.HTTP_409_CONFLICT)]) # No transaction open; a second writer is refused
+        self.assertIsNone(ChunkedUpload.objects.get(pk=upload_id).chunk_started_at)
+
+        # A claim left behind by a writer that went away stops blocking once it is stale.
+        ChunkedUpload.objects.filter(pk=upload_id).update(chunk_started_at=timezone.now())
+        self.assertEqual(self._put(upload_id, 1000, self.data[1000:2000]).status_code, status.HTTP_409_CONFLICT)
+        ChunkedUpload.objects.filter(pk=upload_id).update(chunk_started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self._put(upload_id, 1000, self.data[1000:2000]).data['received_bytes'], 2000)
+
+    @patch('importer.scheduling.import_confluence_space')
+    def test_complete_keeps_staging_file_when_saving_fails(self, mock_import_task):
+        from .models import ChunkedUpload
+        upload_id = self._init()
+        for offset in range(0, len(self.data), 1000):
+            self._put(upload_id, offset, self.data[offset:offset + 1000])
+        complete_url = reverse('importer:confluence-chunked-complete', args=[upload_id])
+        with patch.object(ChunkedUpload, 'save', side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(complete_url)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).status, ChunkedUpload.STATUS_UPLOADING)
+        self.assertFalse(ConfluenceUpload.objects.exists())
+        self.assertEqual(os.listdir(self.staging_dir), [f'{upload_id}.part'])
+
+        response = self.client.post(complete_url) # The retry finds the file where it was
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        with ConfluenceUpload.objects.get().file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.data)
+
+    def test_oversized_chunk_and_foreign_upload(self):
+        upload_id = self._init()
+        self.assertEqual(self._put(upload_id, 0, self.data[:2000]).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        other = get_user_model().objects.create_user(username=f"chunk_other_{uuid.uuid4().hex[:6]}", password="password_test")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self._put(upload_id, 0, self.data[:100]).status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('importer.scheduling.import_confluence_space')
+    def test_whole_file_checksum_mismatch_discards_upload(self, mock_import_task):
+        upload_id = self._init(sha256='f' * 64)
+        for offset in range(0, len(self.data), 1000):
+            self._put(upload_id, offset, self.data[offset:offset + 1000])
+        response = self.client.post(reverse('importer:confluence-chunked-complete', args=[upload_id]))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED) # Verified by the task, off the request path
+        upload = ConfluenceUpload.objects.get()
+        self.assertEqual(upload.expected_sha256, 'f' * 64)
+        import_confluence_space(upload.pk)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, ConfluenceUpload.STATUS_FAILED)
+        self.assertIn("checksum mismatch", upload.error_details)
+        self.assertFalse(upload.file)
+
+    def test_expired_uploads_are_refused_and_cleaned_up(self):
+        from django.utils import timezone
+        from .models import ChunkedUpload
+        from .tasks import delete_expired_chunked_uploads
+        upload_id = self._init()
+        self._put(upload_id, 0, self.data[:1000])
+        fresh_id = self._init()
+        self._put(fresh_id, 0, self.data[:1000])
+        ChunkedUpload.objects.filter(pk=upload_id).update(expires_at=timezone.now())
+        self.assertEqual(self._put(upload_id, 1000, self.data[1000:2000]).status_code, status.HTTP_410_GONE)
+
+        delete_expired_chunked_uploads()
+        self.assertEqual(list(ChunkedUpload.objects.values_list('pk', flat=True)), [uuid.UUID(fresh_id)])
+        self.assertEqual(os.listdir(self.staging_dir), [f'{fresh_id}.part'])
+
+    def test_init_rejects_non_zip(self):
+        response = self.client.post(reverse('importer:confluence-chunked-init'), {'filename': 'x.exe', 'total_size': 10}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class ConfluenceExportAnalysisTests(TestCase):
+    METADATA_XML = """<hibernate-generic>
+        <object class='Page'><property name='id'><long>1</long></property><property name='title'><string>Home</string></property>
+            <property name='body'><string><![CDATA[<ac:structured-macro ac:name="info"/><ac:structured-macro ac:name="jira"/>]]></string></property></object>
+        <object class='Page'><property name='id'><long>2</long></property><property name='title'><string>Notes</string></property>
+            <property name='body'><string>&lt;ac:structured-macro ac:name=&quot;jira&quot;/&gt;&lt;ac:macro ac:name=&quot;toc&quot;/&gt;</string></property></object>
+        <object class='Page'><property name='id'><long>3</long></property><property name='title'><string>Notes</string></property></object>
+    </hibernate-generic>"""
+
+    def setUp(self):
+        self.temp_media_dir = tempfile.mkdtemp(prefix="analysis_media_")
+        self.settings_override = override_settings(MEDIA_ROOT=self.temp_media_dir)
+        self.settings_override.enable()
+        self.user = get_user_model().objects.create_user(username=f"analysis_user_{uuid.uuid4().hex[:6]}", password="password_test")
+        if Workspace and Space:
+            workspace = Workspace.objects.create(name="Analysis WS", owner=self.user)
+            Space.objects.create(name="Analysis Space", key="ANLS", workspace=workspace, owner=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.temp_media_dir, ignore_errors=True)
+
+    def _upload(self, **extra):
+        import io
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("export/entities.xml", self.METADATA_XML)
+            zf.writestr("export/home.html", "<html><head><title>Home</title><meta name='ajs-page-id' content='1'></head><body>" + "x" * 100000 + "</body></html>")
+            zf.writestr("export/notes.html", "<html><head><title>Notes</title></head><body><p>n</p></body></html>")
+            zf.writestr("export/stray.html", "<html><head><title>Stray</title><meta name='ajs-page-id' content='99'></head></html>")
+            zf.writestr("export/attachments/1/diagram.png", b"\x89PNG" + b"0" * 2000)
+            zf.writestr("export/styles/site.css", "body {}")
+        return ConfluenceUpload.objects.create(
+            user=self.user, file=SimpleUploadedFile("space.zip", buffer.getvalue(), "application/zip"),
+            mode=ConfluenceUpload.MODE_ANALYZE, **extra
+        )
+
+    def test_analysis_summarizes_export_without_writing_pages(self):
+        from .tasks import analyze_confluence_export
+        upload = self._upload()
+        analyze_confluence_export(upload.id)
+        upload.refresh_from_db()
+
+        self.assertEqual(upload.status, ConfluenceUpload.STATUS_COMPLETED)
+        self.assertFalse(Page.objects.exists())
+        summary = upload.analysis_summary
+        self.assertEqual(summary['metadata_file'], "export/entities.xml")
+        self.assertEqual(summary['pages']['metadata_pages'], 3)
+        self.assertEqual(summary['pages']['html_files'], 3)
+        self.assertEqual(summary['pages']['matched_by_id'], 1)
+        self.assertEqual(summary['pages']['matched_by_title'], 2) # Both "Notes" pages resolve to notes.html
+        self.assertEqual(summary['pages']['unmatched_count'], 0)
+        self.assertEqual(summary['pages']['unreferenced_html_files'], ["export/stray.html"])
+        self.assertEqual(summary['pages']['duplicate_titles'], {"Notes": 2})
+        self.assertEqual(summary['attachments'], {'count': 1, 'bytes': 2004})
+        self.assertEqual(summary['macros']['by_name'], {'jira': 2, 'info': 1, 'toc': 1})
+        self.assertEqual(summary['macros']['unsupported'], {'jira': 2, 'toc': 1})
+        self.assertGreater(summary['bytes']['html'], 100000)
+        self.assertLess(summary['bytes']['archive'], summary['bytes']['uncompressed'])
+        self.assertIsNone(summary['estimate']['seconds']) # No import history yet
+        self.assertIsNotNone(upload.completed_at)
+
+    def test_estimate_uses_completed_import_throughput(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .tasks import analyze_confluence_export
+        finished = timezone.now()
+        ConfluenceUpload.objects.create(
+            user=self.user, file=SimpleUploadedFile("old.zip", b"...", "application/zip"),
+            status=ConfluenceUpload.STATUS_COMPLETED, pages_succeeded_count=90, pages_failed_count=10,
+            started_at=finished - timedelta(seconds=50), completed_at=finished,
+        )
+        upload = self._upload()
+        analyze_confluence_export(upload.id)
+        upload.refresh_from_db()
+        self.assertEqual(upload.analysis_summary['estimate'], {'seconds': 2, 'pages_per_second': 2.0, 'based_on_imports': 1})
+
+    def test_macro_count_across_chunk_boundaries(self):
+        import io
+        from . import analysis
+        data = b"".join(b"<p>filler %d</p><ac:structured-macro ac:name=\"jira\">" % i for i in range(500))
+        with patch.object(analysis, 'SCAN_CHUNK_SIZE', 37):
+            self.assertEqual(analysis._count_macros(io.BytesIO(data)), {'jira': 500})
+
+    @patch('importer.scheduling.import_confluence_space')
+    @patch('importer.views.analyze_confluence_export')
+    def test_import_view_dispatches_analysis_and_status_exposes_summary(self, mock_analyze_task, mock_import_task):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post(reverse("importer:confluence-import"), {
+            'file': SimpleUploadedFile("space.zip", b"PK\x05\x06" + b"\x00" * 18, "application/zip"),
+            'mode': ConfluenceUpload.MODE_ANALYZE,
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        upload = ConfluenceUpload.objects.get(pk=response.data['data']['id'])
+        mock_analyze_task.delay.assert_called_once_with(confluence_upload_id=upload.id)
+        mock_import_task.apply_async.assert_not_called()
+
+        upload.analysis_summary = {'pages': {'metadata_pages': 0}}
+        upload.save(update_fields=['analysis_summary'])
+        response = client.get(reverse("importer:confluence-upload-status", args=[upload.id]))
+        self.assertEqual(response.data['mode'], ConfluenceUpload.MODE_ANALYZE)
+        self.assertEqual(response.data['analysis_summary'], {'pages': {'metadata_pages': 0}})
+
+
+@override_settings(CC_IMPORT_MAX_CONCURRENT=2, CC_IMPORT_MAX_CONCURRENT_PER_USER=1, CC_IMPORT_MAX_CONCURRENT_PER_WORKSPACE=1, CC_IMPORT_SMALL_MAX_BYTES=10)
+@patch('importer.scheduling.import_confluence_space')
+class ImportSchedulingTests(TestCase):
+    def setUp(self):
+        self.temp_media_dir = tempfile.mkdtemp(prefix="scheduling_media_")
+        self.settings_override = override_settings(MEDIA_ROOT=self.temp_media_dir)
+        self.settings_override.enable()
+        UserModel = get_user_model()
+        self.alice = UserModel.objects.create_user(username=f"sched_alice_{uuid.uuid4().hex[:6]}", password="password_test")
+        self.bob = UserModel.objects.create_user(username=f"sched_bob_{uuid.uuid4().hex[:6]}", password="password_test")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.temp_media_dir, ignore_errors=True)
+
+    def _submit(self, user, size=5, **extra):
+        from . import scheduling
+        upload = ConfluenceUpload.objects.create(user=user, file=SimpleUploadedFile("s.zip", b"x" * size, "application/zip"), **extra)
+        scheduling.submit(upload)
+        upload.refresh_from_db()
+        return upload
+
+    def _finish(self, upload):
+        from . import scheduling
+        ConfluenceUpload.objects.filter(pk=upload.pk).update(status=ConfluenceUpload.STATUS_COMPLETED)
+        return scheduling.dispatch_queued()
+
+    def test_per_user_limit_keeps_other_tenants_moving(self, mock_import_task):
+        from .scheduling import queue_position
+        alice_uploads = [self._submit(self.alice) for _ in range(3)]
+        bob_upload = self._submit(self.bob)
+        self.assertEqual([u.status for u in alice_uploads], [ConfluenceUpload.STATUS_PROCESSING, ConfluenceUpload.STATUS_QUEUED, ConfluenceUpload.STATUS_QUEUED])
+        self.assertEqual(bob_upload.status, ConfluenceUpload.STATUS_PROCESSING)
+        self.assertEqual([queue_position(u) for u in alice_uploads[1:]], [1, 2])
+        self.assertEqual(mock_import_task.apply_async.call_count, 2)
+
+        self.assertEqual(self._finish(alice_uploads[0]), [alice_uploads[1]])
+        mock_import_task.apply_async.assert_called_with(kwargs={'confluence_upload_id': alice_uploads[1].id}, queue='imports_small')
+
+    def test_workspace_limit_and_small_imports_first(self, mock_import_task):
+        from .scheduling import queue_position
+        if not Workspace:
+            self.skipTest("Workspace model not available.")
+        workspace = Workspace.objects.create(name="Sched WS", owner=self.alice)
+        running = self._submit(self.alice, target_workspace=workspace)
+        big = self._submit(self.bob, size=50, target_workspace=workspace)
+        small = self._submit(self.bob, size=5, target_workspace=workspace)
+        self.assertEqual(running.status, ConfluenceUpload.STATUS_PROCESSING)
+        self.assertEqual((queue_position(small), queue_position(big)), (1, 2)) # Newer, but small
+
+        self.assertEqual(self._finish(running), [small])
+        self.assertEqual(self._finish(small), [big])
+        mock_import_task.apply_async.assert_called_with(kwargs={'confluence_upload_id': big.id}, queue='imports')
+
+    def test_long_waiting_large_import_is_not_starved(self, mock_import_task):
+        from datetime import timedelta
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        from .scheduling import queue_position
+        self._submit(self.alice) # Holds alice's only slot
+        big = self._submit(self.alice, size=50)
+        small = self._submit(self.alice, size=5)
+        self.assertEqual((queue_position(small), queue_position(big)), (1, 2))
+
+        ConfluenceUpload.objects.filter(pk=big.pk).update(uploaded_at=timezone.now() - timedelta(hours=2))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual((queue_position(small), queue_position(big)), (2, 1))
+        self.assertTrue(all('COUNT(' in query['sql'] or 'LIMIT 1' in query['sql'] for query in queries))
+
+    def test_stale_import_releases_its_slot_and_status_reports_position(self, mock_import_task):
+        from datetime import timedelta
+        from django.utils import timezone
+        ConfluenceUpload.objects.create(
+            user=self.alice, file=SimpleUploadedFile("old.zip", b"x", "application/zip"),
+            status=ConfluenceUpload.STATUS_PROCESSING, dispatched_at=timezone.now() - timedelta(days=2),
+        )
+        self.assertEqual(self._submit(self.alice).status, ConfluenceUpload.STATUS_PROCESSING)
+        queued = self._submit(self.alice)
+
+        client = APIClient()
+        client.force_authenticate(user=self.alice)
+        response = client.get(reverse("importer:confluence-upload-status", args=[queued.id]))
+        self.assertEqual(response.data['status'], ConfluenceUpload.STATUS_QUEUED)
+        self.assertEqual(response.data['queue_position'], 1)
@@ -2,7 +2,12 @@ from django.urls import path
 from .views import (
     ConfluenceImportView,
     ConfluenceUploadStatusView,
-    FallbackMacroDetailView # Import the new view
+    ConfluenceUploadErrorLogView,
+    FallbackMacroDetailView, # Import the new view
+    FallbackMacroBatchView,
+    ChunkedUploadInitView,
+    ChunkedUploadView,
+    ChunkedUploadCompleteView,
 )
 
 app_name = 'importer'
@@ -10,5 +15,10 @@ app_name = 'importer'
 urlpatterns = [
     path("import/confluence/", ConfluenceImportView.as_view(), name="confluence-import"),
     path('import/confluence/status/<int:pk>/', ConfluenceUploadStatusView.as_view(), name='confluence-upload-status'),
+    path('import/confluence/status/<int:pk>/errors/', ConfluenceUploadErrorLogView.as_view(), name='confluence-upload-errors'),
+    path('import/confluence/chunked/', ChunkedUploadInitView.as_view(), name='confluence-chunked-init'),
+    path('import/confluence/chunked/<uuid:upload_id>/', ChunkedUploadView.as_view(), name='confluence-chunked-upload'),
+    path('import/confluence/chunked/<uuid:upload_id>/complete/', ChunkedUploadCompleteView.as_view(), name='confluence-chunked-complete'),
+    path('fallback-macros/', FallbackMacroBatchView.as_view(), name='fallbackmacro-batch'),
     path('fallback-macros/<int:pk>/', FallbackMacroDetailView.as_view(), name='fallbackmacro-detail'),
 ]
@@ -1,8 +1,20 @@
 
 import zipfile
 import os
+import posixpath
 import shutil # For creating and removing temp directories
 
+# Metadata files looked for in an export, in order of preference.
+PRIORITIZED_METADATA_FILENAMES = [
+    'entities.xml',
+    'space.xml',
+]
+SECONDARY_METADATA_FILENAMES = [
+    'metadata.json',
+    'space.json',
+    'exportinfo.xml',
+]
+
 def extract_html_and_metadata_from_zip(zip_file_path, temp_extract_dir="temp_confluence_export"):
     """
     Extracts all HTML files and looks for common Confluence metadata files from a given ZIP archive.
@@ -31,15 +43,8 @@ def extract_html_and_metadata_from_zip(zip_file_path, temp_extract_dir="temp_con
     print(f"Extracting ZIP file: {zip_file_path} to {abs_temp_extract_dir}")
 
     # --- Updated metadata file search logic ---
-    prioritized_metadata_filenames = [
-        'entities.xml',
-        'space.xml',
-    ]
-    secondary_metadata_filenames = [
-        'metadata.json',
-        'space.json',
-        'exportinfo.xml',
-    ]
+    prioritized_metadata_filenames = PRIORITIZED_METADATA_FILENAMES
+    secondary_metadata_filenames = SECONDARY_METADATA_FILENAMES
     found_metadata_files = {} # Store as {filename_lowercase: path}
     selected_metadata_file_path = None
 
@@ -89,6 +94,77 @@ def extract_html_and_metadata_from_zip(zip_file_path, temp_extract_dir="temp_con
             shutil.rmtree(abs_temp_extract_dir)
         return [], None
 
+class AttachmentIndex:
+    """
+    Where every file of an extracted export lives, built once from the ZIP's member list (the
+    central directory, no filesystem walk), so resolving an attachment reference is a dict
+    lookup instead of os.path.exists() probes per candidate path.
+
+    Besides exact relative paths it indexes attachments/<page id>/<filename> (the layout of
+    Confluence HTML exports) by (page id, filename), and attachment filenames that occur only
+    once in the export by filename. Members given as ZipInfo also get a fingerprint (size and
+    CRC-32 from the central directory), so changed attachments are detected without reading them.
+    """
+
+    def __init__(self, extract_dir, members):
+        self.extract_dir = os.path.abspath(extract_dir)
+        self._by_path = {} # 'dir/sub/file.png' -> absolute extracted path
+        self._by_page = {} # (page_id, filename) -> absolute extracted path
+        self._by_filename = {} # filename -> absolute extracted path, None when not unique
+        self._fingerprints = {} # absolute extracted path -> 'size:crc32'
+        for member in members:
+            name = getattr(member, 'filename', member) # ZipInfo or plain member name
+            relative_path = posixpath.normpath(name.replace('\\', '/'))
+            if name.endswith('/') or relative_path.startswith(('../', '/')) or relative_path in ('.', '..'):
+                continue # Directory entry, or a member extractall() would not have written there
+            absolute_path = os.path.join(self.extract_dir, *relative_path.split('/'))
+            self._by_path[relative_path] = absolute_path
+            if isinstance(member, zipfile.ZipInfo):
+                self._fingerprints[absolute_path] = f'{member.file_size}:{member.CRC:08x}'
+            parts = relative_path.split('/')
+            if 'attachments' not in parts[:-1]:
+                continue
+            filename = parts[-1]
+            after_attachments = parts[parts.index('attachments') + 1:-1]
+            if after_attachments:
+                self._by_page.setdefault((after_attachments[0], filename), absolute_path)
+            self._by_filename[filename] = None if filename in self._by_filename else absolute_path
+
+    @classmethod
+    def from_zip(cls, zip_file_path, extract_dir):
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            return cls(extract_dir, zip_ref.infolist())
+
+    def __len__(self):
+        return len(self._by_path)
+
+    def fingerprint(self, path):
+        """'size:crc32' of the member extracted to `path` (as returned by find()), or '' if unknown."""
+        return self._fingerprints.get(path, '')
+
+    def find(self, filename, html_path=None, page_id=None):
+        """
+        Absolute path of attachment `filename` referenced by the page at `html_path` (absolute,
+        inside extract_dir) with Confluence ID `page_id`, or None. Candidates in order: next
+        to the HTML file, its attachments/ folder, the export's attachments/ folder, the export
+        root, attachments/<page_id>/, then anywhere in the export if the name is unique.
+        """
+        html_dir = ''
+        if html_path:
+            html_dir = os.path.relpath(os.path.dirname(os.path.abspath(html_path)), self.extract_dir).replace(os.sep, '/')
+            if html_dir == '.':
+                html_dir = ''
+        for candidate in (posixpath.join(html_dir, filename), posixpath.join(html_dir, 'attachments', filename), posixpath.join('attachments', filename), filename):
+            found = self._by_path.get(posixpath.normpath(candidate))
+            if found:
+                return found
+        if page_id is not None:
+            found = self._by_page.get((str(page_id), filename))
+            if found:
+                return found
+        return self._by_filename.get(filename)
+
+
 def cleanup_temp_extraction_dir(temp_extract_dir="temp_confluence_export"):
     """Removes the temporary extraction directory."""
     abs_temp_extract_dir = os.path.abspath(temp_extract_dir)
@@ -1,13 +1,19 @@
+import os
+import re
+import uuid
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.generics import RetrieveAPIView # Added for status view
+from rest_framework.generics import ListAPIView, RetrieveAPIView # Added for status view
+from django.shortcuts import get_object_or_404
 
-from .models import ConfluenceUpload
-from .serializers import ConfluenceUploadSerializer
-from .tasks import import_confluence_space
+from .models import ConfluenceUpload, ImportErrorLog
+from .serializers import ConfluenceUploadSerializer, ImportErrorLogSerializer
+from .tasks import analyze_confluence_export
+from . import scheduling
 
 # Import Workspace and Space for validation
 try:
@@ -17,49 +23,77 @@ except ImportError:
     Space = None
     print("WARNING: importer/views.py - Workspace/Space models not found. Target selection in ConfluenceImportView will be impaired.")
 
+def _resolve_import_targets(target_workspace_id_str, target_space_id_str):
+    """
+    Validates the optional target workspace/space IDs of an import request.
+    Returns (workspace, space, None) or (None, None, error_response).
+    """
+    target_workspace_instance = None
+    target_space_instance = None
+
+    if target_workspace_id_str:
+        if not Workspace:
+            return None, None, Response({"error": "Workspace functionality is currently unavailable."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            target_workspace_id = int(target_workspace_id_str)
+            target_workspace_instance = Workspace.objects.get(pk=target_workspace_id)
+            # TODO: Add permission check: Does request.user have access to this workspace?
+        except ValueError:
+            return None, None, Response({"error": "Invalid target_workspace_id format. Must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        except Workspace.DoesNotExist:
+            return None, None, Response({"error": f"Target workspace with ID {target_workspace_id_str} not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    if target_space_id_str:
+        if not Space:
+            return None, None, Response({"error": "Space functionality is currently unavailable."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            target_space_id = int(target_space_id_str)
+            target_space_instance = Space.objects.get(pk=target_space_id)
+            # TODO: Add permission check for space access.
+        except ValueError:
+            return None, None, Response({"error": "Invalid target_space_id format. Must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        except Space.DoesNotExist:
+            return None, None, Response({"error": f"Target space with ID {target_space_id_str} not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    if target_workspace_instance and target_space_instance:
+        if target_space_instance.workspace != target_workspace_instance:
+            return None, None, Response({"error": f"Target space '{target_space_instance.name}' does not belong to target workspace '{target_workspace_instance.name}'."}, status=status.HTTP_400_BAD_REQUEST)
+    elif target_space_instance and not target_workspace_instance:
+        if hasattr(target_space_instance, 'workspace') and target_space_instance.workspace:
+            target_workspace_instance = target_space_instance.workspace
+        else:
+            return None, None, Response({"error": f"Target space '{target_space_instance.name}' does not have an associated workspace."}, status=status.HTTP_400_BAD_REQUEST)
+
+    return target_workspace_instance, target_space_instance, None
+
+
+def _dispatch_upload(confluence_upload):
+    """
+    Starts the dry-run analysis right away; imports go through the scheduler's queue
+    (importer.scheduling), which starts them when the uploader and workspace have a free slot.
+    """
+    if confluence_upload.mode == ConfluenceUpload.MODE_ANALYZE:
+        analyze_confluence_export.delay(confluence_upload_id=confluence_upload.id)
+    else:
+        scheduling.submit(confluence_upload)
+
+
+def _dispatch_message(confluence_upload):
+    if confluence_upload.mode == ConfluenceUpload.MODE_ANALYZE:
+        return f"Confluence export analysis initiated for upload ID: {confluence_upload.id}."
+    return f"Confluence space import queued for upload ID: {confluence_upload.id}."
+
+
 class ConfluenceImportView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request, *args, **kwargs):
-        target_workspace_id_str = request.data.get('target_workspace_id')
-        target_space_id_str = request.data.get('target_space_id')
-
-        target_workspace_instance = None
-        target_space_instance = None
-
-        if target_workspace_id_str:
-            if not Workspace:
-                return Response({"error": "Workspace functionality is currently unavailable."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            try:
-                target_workspace_id = int(target_workspace_id_str)
-                target_workspace_instance = Workspace.objects.get(pk=target_workspace_id)
-                # TODO: Add permission check: Does request.user have access to this workspace?
-            except ValueError:
-                return Response({"error": "Invalid target_workspace_id format. Must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
-            except Workspace.DoesNotExist:
-                return Response({"error": f"Target workspace with ID {target_workspace_id_str} not found."}, status=status.HTTP_404_NOT_FOUND)
-
-        if target_space_id_str:
-            if not Space:
-                return Response({"error": "Space functionality is currently unavailable."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            try:
-                target_space_id = int(target_space_id_str)
-                target_space_instance = Space.objects.get(pk=target_space_id)
-                # TODO: Add permission check for space access.
-            except ValueError:
-                return Response({"error": "Invalid target_space_id format. Must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
-            except Space.DoesNotExist:
-                return Response({"error": f"Target space with ID {target_space_id_str} not found."}, status=status.HTTP_404_NOT_FOUND)
-
-        if target_workspace_instance and target_space_instance:
-            if target_space_instance.workspace != target_workspace_instance:
-                return Response({"error": f"Target space '{target_space_instance.name}' does not belong to target workspace '{target_workspace_instance.name}'."}, status=status.HTTP_400_BAD_REQUEST)
-        elif target_space_instance and not target_workspace_instance:
-            if hasattr(target_space_instance, 'workspace') and target_space_instance.workspace:
-                target_workspace_instance = target_space_instance.workspace
-            else:
-                return Response({"error": f"Target space '{target_space_instance.name}' does not have an associated workspace."}, status=status.HTTP_400_BAD_REQUEST)
+        target_workspace_instance, target_space_instance, error_response = _resolve_import_targets(
+            request.data.get('target_workspace_id'), request.data.get('target_space_id')
+        )
+        if error_response is not None:
+            return error_response
 
         upload_data_serializer = ConfluenceUploadSerializer(data=request.data, context={'request': request})
 
@@ -75,11 +109,11 @@ class ConfluenceImportView(APIView):
             if target_space_instance: print(f"  Target Space: {target_space_instance.name} (ID: {target_space_instance.id})")
 
             try:
-                import_confluence_space.delay(confluence_upload_id=confluence_upload_instance.id)
+                _dispatch_upload(confluence_upload_instance)
 
                 response_serializer = ConfluenceUploadSerializer(confluence_upload_instance, context={'request': request})
                 return Response({
-                    "message": f"Confluence space import initiated for upload ID: {confluence_upload_instance.id}.",
+                    "message": _dispatch_message(confluence_upload_instance),
                     "data": response_serializer.data
                 }, status=status.HTTP_202_ACCEPTED)
             except Exception as e:
@@ -109,8 +143,25 @@ class ConfluenceUploadStatusView(RetrieveAPIView):
         context['request'] = self.request
         return context
 
+class ConfluenceUploadErrorLogView(ListAPIView):
+    """
+    Every error recorded by an upload's last import run, oldest first and paginated;
+    error_details on the status view only holds the first of them. Visible to the uploader and staff.
+    """
+    serializer_class = ImportErrorLogSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        uploads = ConfluenceUpload.objects.all()
+        if not self.request.user.is_staff:
+            uploads = uploads.filter(user=self.request.user)
+        upload = get_object_or_404(uploads.only('pk'), pk=self.kwargs['pk'])
+        return ImportErrorLog.objects.filter(upload=upload).order_by('pk')
+
 from .models import FallbackMacro # Import FallbackMacro model
 from .serializers import FallbackMacroSerializer # Import its serializer
+from django.shortcuts import get_object_or_404
+from pages.models import Page, PageVersion
 
 class FallbackMacroDetailView(RetrieveAPIView):
     """
@@ -121,3 +172,228 @@ class FallbackMacroDetailView(RetrieveAPIView):
     serializer_class = FallbackMacroSerializer
     permission_classes = [IsAuthenticated] # Or more specific if needed (e.g., user must have access to the page/space)
     # lookup_field = 'pk' # Default is 'pk'
+
+
+def _fallback_placeholder_ids(node_list, found):
+    """Collects the placeholderId of every fallbackMacroPlaceholder node in a content tree."""
+    if not isinstance(node_list, list): return found
+    for node in node_list:
+        if not isinstance(node, dict): continue
+        # Content imported before the converter used the editor's node name has the snake_case one.
+        if node.get('type') in ('fallbackMacroPlaceholder', 'fallback_macro_placeholder'):
+            try:
+                found.add(uuid.UUID(str((node.get('attrs') or {}).get('placeholderId'))))
+            except ValueError:
+                pass # Hand-edited content; nothing to look up
+        _fallback_placeholder_ids(node.get('content'), found)
+    return found
+
+
+class FallbackMacroBatchView(APIView):
+    """
+    Every fallback macro referenced by a page's current content (?page=<id>) or by one of its
+    versions (?page_version=<id>), keyed by placeholder_id_in_content, so a page with many
+    unsupported macros renders from one request instead of one per placeholder.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        page_id_str, version_id_str = request.query_params.get('page'), request.query_params.get('page_version')
+        if bool(page_id_str) == bool(version_id_str):
+            return Response({"error": "Pass exactly one of 'page' or 'page_version'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            object_id = int(page_id_str or version_id_str)
+        except ValueError:
+            return Response({"error": "'page' and 'page_version' must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        page_version = None
+        if version_id_str:
+            page_version = get_object_or_404(PageVersion.objects.select_related('page').only('content_json', 'page__space_id'), pk=object_id)
+            page, content_json = page_version.page, page_version.content_json
+        else:
+            page = get_object_or_404(Page.objects.only('space_id', 'content_json'), pk=object_id)
+            content_json = page.content_json
+        if not request.user.has_perm('pages.view_page', page):
+            return Response({'detail': 'You do not have permission to view this page.'}, status=status.HTTP_403_FORBIDDEN)
+
+        placeholder_ids = _fallback_placeholder_ids((content_json or {}).get('content'), set())
+        macros = FallbackMacro.objects.none()
+        if placeholder_ids:
+            # Placeholders can come from any earlier version of the page (content kept across edits).
+            macros = FallbackMacro.objects.filter(page_version__page=page, placeholder_id_in_content__in=placeholder_ids).select_related(
+                'page_version__page'
+            ).only('macro_name', 'raw_macro_content', 'import_notes', 'placeholder_id_in_content', 'page_version__page__title')
+        data = FallbackMacroSerializer(macros, many=True).data
+        return Response({
+            'page': page.pk,
+            'page_version': page_version.pk if page_version else None,
+            'macros': {item['placeholder_id_in_content']: item for item in data},
+        }, status=status.HTTP_200_OK)
+
+
+# --- Resumable chunked upload of export ZIPs (see importer.chunked) ---
+
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.utils import timezone
+from .chunked import ChunkError, discard, move_into_storage, storage_name, write_chunk
+from .models import ChunkedUpload, chunked_upload_expiry
+from .serializers import ChunkedUploadSerializer
+
+_SHA256_HEX_RE = re.compile(r'^[0-9a-fA-F]{64}$')
+
+
+class ChunkedUploadInitView(APIView):
+    """Starts a chunked upload of a Confluence export ZIP."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        filename = os.path.basename(str(request.data.get('filename') or ''))
+        if not filename.lower().endswith('.zip'):
+            return Response({"error": "filename must name a .zip file."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            total_size = int(request.data.get('total_size'))
+        except (TypeError, ValueError):
+            return Response({"error": "total_size must be an integer number of bytes."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < total_size <= settings.CC_CHUNKED_UPLOAD_MAX_SIZE:
+            return Response({"error": f"total_size must be between 1 and {settings.CC_CHUNKED_UPLOAD_MAX_SIZE} bytes."}, status=status.HTTP_400_BAD_REQUEST)
+        sha256 = str(request.data.get('sha256') or '')
+        if sha256 and not _SHA256_HEX_RE.match(sha256):
+            return Response({"error": "sha256 must be a hex SHA-256 digest."}, status=status.HTTP_400_BAD_REQUEST)
+
+        target_workspace, target_space, error_response = _resolve_import_targets(
+            request.data.get('target_workspace_id'), request.data.get('target_space_id')
+        )
+        if error_response is not None:
+            return error_response
+
+        upload = ChunkedUpload.objects.create(
+            user=request.user, filename=filename, total_size=total_size, sha256=sha256.lower(),
+            target_workspace=target_workspace, target_space=target_space,
+        )
+        return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadView(APIView):
+    """GET: upload state (to resume). PUT: append a chunk. DELETE: abort the upload."""
+    permission_classes = [IsAuthenticated]
+    parser_classes = [] # The chunk body is read from request.stream, never parsed or buffered
+
+    def _get_upload(self, request, upload_id):
+        return get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+
+    def get(self, request, upload_id, *args, **kwargs):
+        return Response(ChunkedUploadSerializer(self._get_upload(request, upload_id)).data)
+
+    def put(self, request, upload_id, *args, **kwargs):
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return Response({"error": "Upload-Offset and Content-Length headers are required."}, status=status.HTTP_400_BAD_REQUEST)
+        if length <= 0:
+            return Response({"error": "Empty chunk."}, status=status.HTTP_400_BAD_REQUEST)
+        if length > settings.CC_CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            return Response({"error": f"Chunks may be at most {settings.CC_CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes."}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        expected_sha256 = None
+        checksum = request.headers.get('Upload-Checksum', '')
+        if checksum:
+            algorithm, _, value = checksum.partition(' ')
+            if algorithm.lower() != 'sha256' or not _SHA256_HEX_RE.match(value.strip()):
+                return Response({"error": "Upload-Checksum must be 'sha256 <hex digest>'."}, status=status.HTTP_400_BAD_REQUEST)
+            expected_sha256 = value.strip()
+
+        # The chunk is claimed with a short conditional UPDATE, then streamed with no transaction
+        # open: a slow client holds neither a row lock nor a database connection's transaction.
+        now = timezone.now()
+        stale_before = now - timedelta(seconds=settings.CC_CHUNKED_UPLOAD_CHUNK_TIMEOUT)
+        claimed = ChunkedUpload.objects.filter(
+            Q(chunk_started_at__isnull=True) | Q(chunk_started_at__lt=stale_before),
+            pk=upload_id, user=request.user, status=ChunkedUpload.STATUS_UPLOADING,
+            expires_at__gt=now, received_bytes=offset, total_size__gte=offset + length,
+        ).update(chunk_started_at=now, expires_at=chunked_upload_expiry())
+        upload = self._get_upload(request, upload_id)
+        if not claimed:
+            if upload.status != ChunkedUpload.STATUS_UPLOADING:
+                return Response({"error": "Upload is already complete."}, status=status.HTTP_409_CONFLICT)
+            if upload.expires_at <= now:
+                return Response({"error": "Upload expired; start a new one."}, status=status.HTTP_410_GONE)
+            if offset != upload.received_bytes:
+                # The client resumes from received_bytes.
+                return Response({"error": "Upload-Offset does not match the bytes received so far.", "received_bytes": upload.received_bytes}, status=status.HTTP_409_CONFLICT)
+            if offset + length > upload.total_size:
+                return Response({"error": "Chunk extends past the declared total_size."}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"error": "Another chunk of this upload is being written.", "received_bytes": upload.received_bytes}, status=status.HTTP_409_CONFLICT)
+
+        own_claim = ChunkedUpload.objects.filter(pk=upload.pk, chunk_started_at=now)
+        try:
+            received_bytes = write_chunk(upload, request.stream, offset, length, expected_sha256)
+        except ChunkError as e:
+            own_claim.update(chunk_started_at=None)
+            return Response({"error": str(e), "received_bytes": upload.received_bytes}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            own_claim.update(chunk_started_at=None)
+            raise
+        upload.received_bytes, upload.expires_at, upload.chunk_started_at = received_bytes, chunked_upload_expiry(), None
+        if not own_claim.update(received_bytes=received_bytes, expires_at=upload.expires_at, chunk_started_at=None, updated_at=timezone.now()):
+            # The claim went stale and a retry took this offset over, or the upload was aborted.
+            return Response({"error": "Chunk was superseded by another request.", "received_bytes": offset}, status=status.HTTP_409_CONFLICT)
+        return Response(ChunkedUploadSerializer(upload).data)
+
+    def delete(self, request, upload_id, *args, **kwargs):
+        upload = self._get_upload(request, upload_id)
+        if upload.status == ChunkedUpload.STATUS_UPLOADING:
+            discard(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ChunkedUploadCompleteView(APIView):
+    """
+    Verifies the assembled file, turns it into a ConfluenceUpload and dispatches the import
+    in the requested mode ({"mode": "SYNC", "delete_missing": true} for an incremental resync,
+    {"mode": "ANALYZE"} for the dry-run analysis).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id, *args, **kwargs):
+        mode = request.data.get('mode') or ConfluenceUpload.MODE_IMPORT
+        if mode not in dict(ConfluenceUpload.MODE_CHOICES):
+            return Response({"error": f"Invalid mode '{mode}'."}, status=status.HTTP_400_BAD_REQUEST)
+        delete_missing = str(request.data.get('delete_missing', '')).lower() in ('1', 'true', 'yes')
+        with transaction.atomic():
+            upload = get_object_or_404(ChunkedUpload.objects.select_for_update(), pk=upload_id, user=request.user)
+            if upload.status != ChunkedUpload.STATUS_UPLOADING:
+                return Response({"error": "Upload is already complete.", "upload_id": upload.confluence_upload_id}, status=status.HTTP_409_CONFLICT)
+            if upload.expires_at <= timezone.now():
+                return Response({"error": "Upload expired; start a new one."}, status=status.HTTP_410_GONE)
+            if upload.received_bytes != upload.total_size:
+                return Response({"error": "Upload is incomplete.", "received_bytes": upload.received_bytes, "total_size": upload.total_size}, status=status.HTTP_409_CONFLICT)
+
+            # The whole-file sha256 is verified by the import task (importer.chunked.checksum_matches),
+            # not here: hashing gigabytes would hold this row lock and the request for minutes.
+            confluence_upload = ConfluenceUpload(
+                user=request.user, target_workspace=upload.target_workspace, target_space=upload.target_space,
+                mode=mode, delete_missing=delete_missing, expected_sha256=upload.sha256,
+            )
+            # Rows first, file last: if a save fails, the rollback leaves the staging file where
+            # a retry of complete expects it; if the move fails, the rows roll back with it.
+            confluence_upload.file.name = storage_name(upload)
+            confluence_upload.save()
+            upload.status = ChunkedUpload.STATUS_COMPLETE
+            upload.confluence_upload = confluence_upload
+            upload.save(update_fields=['status', 'confluence_upload', 'updated_at'])
+            stored_name = move_into_storage(upload, confluence_upload.file.name)
+            if stored_name != confluence_upload.file.name:
+                confluence_upload.file.name = stored_name
+                confluence_upload.save(update_fields=['file'])
+            transaction.on_commit(lambda: _dispatch_upload(confluence_upload))
+
+        print(f"ChunkedUploadCompleteView: Upload {upload.pk} assembled as record ID {confluence_upload.id}, User: {request.user.username}")
+        return Response({
+            "message": _dispatch_message(confluence_upload),
+            "data": ConfluenceUploadSerializer(confluence_upload, context={'request': request}).data
+        }, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,209 @@
+"""
+Structural diff between two ProseMirror documents (PageVersion.content_json).
+
+The diff works on the top-level blocks of the document:
+1. Every block is reduced to a stable hash of its canonical JSON, so comparing blocks is O(1).
+2. The common prefix and suffix are trimmed (the usual case is a small edit in a large page).
+3. The remaining middle is aligned patience-style: blocks whose hash is unique in both
+   documents act as anchors, the longest increasing run of anchors is kept, and the gaps
+   between anchors are diffed recursively. Only small anchor-free gaps fall back to difflib.
+4. Within each unmatched gap, blocks of the same type are aligned and reported as 'modify'
+   operations carrying a word-level text diff; the rest are inserts/deletes.
+
+This module has no Django dependencies so it can be unit-tested and reused by tasks.
+"""
+import bisect
+import difflib
+import hashlib
+import json
+import re
+
+# Gaps without unique anchors larger than this are reported as plain delete/insert runs
+# instead of being handed to difflib, which is quadratic in the worst case.
+MAX_FALLBACK_GAP = 2000
+
+_WORD_RE = re.compile(r'\s+|[^\s]+')
+
+
+def node_hash(node):
+    """Stable hash of a ProseMirror node (key order independent)."""
+    canonical = json.dumps(node, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def node_text(node):
+    """Plain text of a ProseMirror node, in document order."""
+    parts = []
+
+    def walk(n):
+        if not isinstance(n, dict):
+            return
+        if n.get('type') == 'text' and 'text' in n:
+            parts.append(n['text'])
+        for child in n.get('content') or []:
+            walk(child)
+
+    walk(node)
+    return ''.join(parts)
+
+
+def _blocks(doc):
+    if not isinstance(doc, dict):
+        return []
+    return [b for b in (doc.get('content') or []) if isinstance(b, dict)]
+
+
+def _longest_increasing_subsequence(pairs):
+    """Pairs are (a_index, b_index) sorted by a_index; returns the LIS by b_index. O(n log n)."""
+    tails = []          # b_index values
+    tail_positions = []  # index into pairs for each tail
+    predecessors = [None] * len(pairs)
+    for i, (_, b_index) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, b_index)
+        if pos == len(tails):
+            tails.append(b_index)
+            tail_positions.append(i)
+        else:
+            tails[pos] = b_index
+            tail_positions[pos] = i
+        predecessors[i] = tail_positions[pos - 1] if pos > 0 else None
+    result = []
+    i = tail_positions[-1] if tail_positions else None
+    while i is not None:
+        result.append(pairs[i])
+        i = predecessors[i]
+    result.reverse()
+    return result
+
+
+def _match_blocks(a, b, a_lo, a_hi, b_lo, b_hi, matches):
+    """Appends matching (a_index, b_index) pairs for a[a_lo:a_hi] vs b[b_lo:b_hi], in order."""
+    # Trim common prefix / suffix.
+    while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+        matches.append((a_lo, b_lo))
+        a_lo += 1
+        b_lo += 1
+    suffix = []
+    while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+        a_hi -= 1
+        b_hi -= 1
+        suffix.append((a_hi, b_hi))
+    if a_lo < a_hi and b_lo < b_hi:
+        # Patience anchors: hashes occurring exactly once on each side.
+        a_counts, b_counts = {}, {}
+        for i in range(a_lo, a_hi):
+            a_counts[a[i]] = a_counts.get(a[i], 0) + 1
+        b_positions = {}
+        for j in range(b_lo, b_hi):
+            b_counts[b[j]] = b_counts.get(b[j], 0) + 1
+            b_positions[b[j]] = j
+        anchors = [
+            (i, b_positions[a[i]]) for i in range(a_lo, a_hi)
+            if a_counts[a[i]] == 1 and b_counts.get(a[i]) == 1
+        ]
+        anchors = _longest_increasing_subsequence(anchors)
+        if anchors:
+            prev_a, prev_b = a_lo, b_lo
+            for anchor_a, anchor_b in anchors:
+                _match_blocks(a, b, prev_a, anchor_a, prev_b, anchor_b, matches)
+                matches.append((anchor_a, anchor_b))
+                prev_a, prev_b = anchor_a + 1, anchor_b + 1
+            _match_blocks(a, b, prev_a, a_hi, prev_b, b_hi, matches)
+        elif (a_hi - a_lo) + (b_hi - b_lo) <= MAX_FALLBACK_GAP:
+            matcher = difflib.SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=False)
+            for block in matcher.get_matching_blocks():
+                for k in range(block.size):
+                    matches.append((a_lo + block.a + k, b_lo + block.b + k))
+    matches.extend(reversed(suffix))
+
+
+def diff_text(old_text, new_text):
+    """Word-level diff of two strings as a list of {'op': 'equal'|'insert'|'delete', 'text': ...}."""
+    old_tokens = _WORD_RE.findall(old_text or '')
+    new_tokens = _WORD_RE.findall(new_text or '')
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    changes = []
+
+    def emit(op, tokens):
+        if not tokens:
+            return
+        text = ''.join(tokens)
+        if changes and changes[-1]['op'] == op:
+            changes[-1]['text'] += text
+        else:
+            changes.append({'op': op, 'text': text})
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            emit('equal', old_tokens[i1:i2])
+        else:
+            emit('delete', old_tokens[i1:i2])
+            emit('insert', new_tokens[j1:j2])
+    return changes
+
+
+def _emit_gap(old_blocks, new_blocks, a_lo, a_hi, b_lo, b_hi, ops):
+    """Turns an unmatched region into modify/delete/insert operations."""
+    if a_lo == a_hi and b_lo == b_hi:
+        return
+    # Blocks of the same type aligned within a gap are edits of the same paragraph/heading/etc.
+    old_types = [n.get('type') for n in old_blocks[a_lo:a_hi]]
+    new_types = [n.get('type') for n in new_blocks[b_lo:b_hi]]
+    if len(old_types) + len(new_types) <= MAX_FALLBACK_GAP:
+        opcodes = difflib.SequenceMatcher(None, old_types, new_types, autojunk=False).get_opcodes()
+    else:
+        opcodes = [('replace', 0, len(old_types), 0, len(new_types))]
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            for k in range(i2 - i1):
+                old_node, new_node = old_blocks[a_lo + i1 + k], new_blocks[b_lo + j1 + k]
+                ops.append({
+                    'op': 'modify',
+                    'type': new_node.get('type'),
+                    'old_index': a_lo + i1 + k,
+                    'new_index': b_lo + j1 + k,
+                    'old': old_node,
+                    'new': new_node,
+                    'text_changes': diff_text(node_text(old_node), node_text(new_node)),
+                })
+            continue
+        for k in range(a_lo + i1, a_lo + i2):
+            ops.append({'op': 'delete', 'type': old_blocks[k].get('type'), 'old_index': k, 'old': old_blocks[k]})
+        for k in range(b_lo + j1, b_lo + j2):
+            ops.append({'op': 'insert', 'type': new_blocks[k].get('type'), 'new_index': k, 'new': new_blocks[k]})
+
+
+def diff_documents(old_doc, new_doc):
+    """
+    Computes a block-level diff between two ProseMirror documents.
+
+    Returns a dict with:
+    - 'operations': ordered list of operations. Unchanged blocks are collapsed into
+      {'op': 'equal', 'old_index', 'new_index', 'count'} runs; changed blocks are
+      'insert', 'delete' or 'modify' (the latter with a word-level 'text_changes' list).
+    - 'stats': counts of equal/inserted/deleted/modified blocks.
+    """
+    old_blocks = _blocks(old_doc)
+    new_blocks = _blocks(new_doc)
+    a = [node_hash(b) for b in old_blocks]
+    b = [node_hash(b) for b in new_blocks]
+
+    matches = []
+    _match_blocks(a, b, 0, len(a), 0, len(b), matches)
+
+    ops = []
+    prev_a, prev_b = 0, 0
+    for match_a, match_b in matches + [(len(a), len(b))]:
+        _emit_gap(old_blocks, new_blocks, prev_a, match_a, prev_b, match_b, ops)
+        if match_a < len(a):
+            last = ops[-1] if ops else None
+            if last and last['op'] == 'equal' and last['old_index'] + last['count'] == match_a and last['new_index'] + last['count'] == match_b:
+                last['count'] += 1
+            else:
+                ops.append({'op': 'equal', 'old_index': match_a, 'new_index': match_b, 'count': 1})
+        prev_a, prev_b = match_a + 1, match_b + 1
+
+    stats = {'equal': 0, 'insert': 0, 'delete': 0, 'modify': 0}
+    for op in ops:
+        stats[op['op']] += op.get('count', 1)
+    return {'operations': ops, 'stats': stats}
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0008_populate_existing_search_vectors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageRender',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField()),
+                ('renderer_version', models.IntegerField(default=1)),
+                ('html', models.TextField(blank=True, default='')),
+                ('plain_text', models.TextField(blank=True, default='')),
+                ('rendered_at', models.DateTimeField(auto_now=True)),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renders', to='pages.page')),
+            ],
+            options={
+                'verbose_name': 'Page Render',
+                'verbose_name_plural': 'Page Renders',
+                'unique_together': {('page', 'version')},
+            },
+        ),
+    ]
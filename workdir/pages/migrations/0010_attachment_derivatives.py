@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0009_page_render'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies of image attachments (see core.image_derivatives).'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0010_attachment_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='import_content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the Confluence source this page was last imported from; unchanged pages are skipped by incremental syncs.', max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pagerender',
+            name='renderer_version',
+            field=models.IntegerField(default=2),
+        ),
+    ]
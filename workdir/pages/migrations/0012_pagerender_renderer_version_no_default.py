@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0011_page_import_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pagerender',
+            name='renderer_version',
+            field=models.IntegerField(),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0012_pagerender_renderer_version_no_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='source_fingerprint',
+            field=models.CharField(blank=True, default='', help_text="'size:crc32' of the export file this attachment was imported from; a sync replaces the attachment when it changes.", max_length=32),
+        ),
+    ]
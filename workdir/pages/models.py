@@ -2,7 +2,9 @@ from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify # Added for slug generation
+import threading
 import uuid # Added for ensuring unique slugs and FallbackMacro
+from contextlib import contextmanager
 
 # Assuming workspaces.models.Space is correctly importable
 # It's better to put this in a try-except if there's any doubt,
@@ -12,9 +14,13 @@ from workspaces.models import Space
 # For SearchVectorField and GIN index
 from django.contrib.postgres.search import SearchVectorField
 from django.contrib.postgres.indexes import GinIndex
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.postgres.search import SearchVector
+from django.db import transaction
+
+from .rendering import RENDERER_VERSION, render_html, render_plain_text
+from core import response_cache
 
 
 User = get_user_model()
@@ -55,6 +61,12 @@ class Page(models.Model):
         blank=True,
         help_text="Original ID from Confluence, if applicable."
     )
+    import_content_hash = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="SHA-256 of the Confluence source this page was last imported from; unchanged pages are skipped by incremental syncs."
+    )
     imported_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -84,6 +96,17 @@ class Page(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Object permissions held on the page's space also apply to the page, so access is granted
+    # once per space instead of once per page. Permissions assigned on the page itself still
+    # apply on top (per-page overrides). Resolved by core.backends.CachedObjectPermissionBackend
+    # and core.permissions.filter_queryset_by_object_permission.
+    inherit_permissions_from = 'space'
+    inherited_permissions = {
+        'view_space': {'view_page'},
+        'edit_space_content': {'view_page', 'change_page'},
+        'admin_space': {'view_page', 'change_page', 'delete_page'},
+    }
+
     class Meta:
         ordering = ['title']
         verbose_name = "Page"
@@ -95,6 +118,15 @@ class Page(models.Model):
         # unique_together = (('space', 'slug'), ('parent', 'slug'))
         # For now, global unique slug is fine as per unique=True on field.
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'parent_id' in field_names and 'space_id' in field_names:
+            instance._loaded_location = (instance.parent_id, instance.space_id) # Read by page_remember_previous_location
+        if 'title' in field_names and 'slug' in field_names:
+            instance._loaded_label = (instance.title, instance.slug) # Read by page_bump_response_cache
+        return instance
+
     def __str__(self):
         return self.title
 
@@ -215,6 +247,51 @@ def page_post_save(sender, instance, created, **kwargs):
     )
 
 
+# --- Response cache invalidation (core.response_cache) ---
+# 'page:<pk>' covers a page's detail representation (including its parent's title, its
+# children, tags and attachments); 'space-pages:<space_pk>' covers the page tree of a space.
+
+@receiver(pre_save, sender=Page)
+def page_remember_previous_location(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._previous_location = None
+        return
+    loaded = getattr(instance, '_loaded_location', None)
+    if loaded is None: # Not loaded from the database, or with parent/space deferred
+        loaded = Page.objects.filter(pk=instance.pk).values_list('parent_id', 'space_id').first()
+    instance._previous_location = loaded
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+def page_bump_response_cache(sender, instance, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    namespaces = {f'page:{instance.pk}', f'space-pages:{instance.space_id}'}
+    if instance.parent_id:
+        namespaces.add(f'page:{instance.parent_id}') # Parent embeds this page in its children
+    previous = getattr(instance, '_previous_location', None)
+    if previous:
+        previous_parent_id, previous_space_id = previous
+        if previous_parent_id:
+            namespaces.add(f'page:{previous_parent_id}')
+        namespaces.add(f'space-pages:{previous_space_id}')
+    if not kwargs.get('created', True) and getattr(instance, '_loaded_label', None) != (instance.title, instance.slug):
+        # Children embed this page's title; unknown previous values count as changed.
+        namespaces.update(f'page:{pk}' for pk in instance.children.values_list('pk', flat=True))
+    instance._loaded_location = (instance.parent_id, instance.space_id) # The next save moves from here
+    instance._loaded_label = (instance.title, instance.slug)
+    response_cache.bump(*namespaces)
+
+
+@receiver(pre_delete, sender=Page)
+def page_bump_children_response_cache(sender, instance, **kwargs):
+    # Deleting sets the children's parent to NULL with a queryset update, which sends no signals.
+    child_pks = list(instance.children.values_list('pk', flat=True))
+    if child_pks:
+        response_cache.bump(*(f'page:{pk}' for pk in child_pks))
+
+
 class PageVersion(models.Model):
     page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name='versions')
     version_number = models.IntegerField()
@@ -230,6 +307,110 @@ class PageVersion(models.Model):
         verbose_name_plural = "Page Versions"
         unique_together = ('page', 'version_number')
 
+class PageRender(models.Model):
+    """
+    Cached HTML and plain-text rendering of a page at a given version.
+    Versions are immutable, so a row stays valid until the renderer itself changes
+    (tracked by renderer_version). Filled by the render_page_version task after a save,
+    or lazily by PageRender.get_for_page() on a cache miss.
+    """
+    page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name='renders')
+    version = models.IntegerField()
+    renderer_version = models.IntegerField() # Set by render_and_store(); no field default, so a bump needs no migration
+    html = models.TextField(blank=True, default='')
+    plain_text = models.TextField(blank=True, default='')
+    rendered_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): return f"Render of page {self.page_id} v{self.version}"
+
+    class Meta:
+        verbose_name = "Page Render"
+        verbose_name_plural = "Page Renders"
+        unique_together = ('page', 'version')
+
+    @staticmethod
+    def image_variants(page_id):
+        """Image src -> srcset data for the page's attachments that have resized derivatives."""
+        variants = {}
+        for attachment in Attachment.objects.filter(page_id=page_id).exclude(derivatives={}).only('file', 'derivatives'):
+            widths = sorted(attachment.derivatives.get('widths', {}).values(), key=lambda entry: entry['width'])
+            if not widths:
+                continue
+            storage = attachment.file.storage
+            srcset = [f"{storage.url(entry['name'])} {entry['width']}w" for entry in widths]
+            srcset.append(f"{attachment.file.url} {attachment.derivatives['source_width']}w")
+            default = widths[-1]
+            variants[attachment.file.url] = {
+                'src': storage.url(default['name']), 'srcset': ', '.join(srcset),
+                'width': default['width'], 'height': default['height'],
+            }
+        return variants
+
+    @classmethod
+    def render_and_store(cls, page_id, version, content_json):
+        render, _ = cls.objects.update_or_create(
+            page_id=page_id, version=version,
+            defaults={
+                'renderer_version': RENDERER_VERSION,
+                'html': render_html(content_json, cls.image_variants(page_id)),
+                'plain_text': render_plain_text(content_json),
+            }
+        )
+        return render
+
+    @classmethod
+    def get_for_page(cls, page, version=None):
+        """
+        Returns the render for `page` at `version` (default: the current version),
+        rendering and storing it on a miss. Returns None if the version does not exist.
+        """
+        version = page.version if version is None else version
+        render = cls.objects.filter(page_id=page.pk, version=version, renderer_version=RENDERER_VERSION).first()
+        if render is not None:
+            return render
+        if version == page.version:
+            content_json = page.content_json
+        else:
+            content_json = PageVersion.objects.filter(page_id=page.pk, version_number=version).values_list('content_json', flat=True).first()
+            if content_json is None:
+                return None
+        return cls.render_and_store(page.pk, version, content_json)
+
+
+_render_state = threading.local()
+
+
+@contextmanager
+def deferred_page_renders():
+    """
+    Page saves inside the block queue no render task each; the caller renders the pages it
+    wrote in batches afterwards (pages.tasks.render_pages), e.g. once an import has finished.
+    """
+    previous = getattr(_render_state, 'deferred', False)
+    _render_state.deferred = True
+    try:
+        yield
+    finally:
+        _render_state.deferred = previous
+
+
+@receiver(post_save, sender=Page)
+def page_schedule_render(sender, instance, created, **kwargs):
+    # Pre-render the new current version once the transaction commits so read-heavy pages
+    # never render on the request path. Disabled via CC_PAGE_RENDER_ON_SAVE, and per block of
+    # bulk writes via deferred_page_renders().
+    if kwargs.get('raw', False) or not getattr(settings, 'CC_PAGE_RENDER_ON_SAVE', True):
+        return
+    if getattr(_render_state, 'deferred', False):
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'content_json' not in update_fields and 'version' not in update_fields:
+        return
+    from .tasks import render_page_version # Local import: tasks imports models
+    page_id, version = instance.pk, instance.version
+    transaction.on_commit(lambda: render_page_version.delay(page_id, version))
+
+
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True, db_index=True)
     pages = models.ManyToManyField(Page, related_name='tags', blank=True)
@@ -268,6 +449,17 @@ class Attachment(models.Model):
         related_name='imported_attachments',
         help_text="User who imported this attachment."
     )
+    derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Resized copies of image attachments (see core.image_derivatives)."
+    )
+    source_fingerprint = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        help_text="'size:crc32' of the export file this attachment was imported from; a sync replaces the attachment when it changes."
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -283,3 +475,29 @@ class Attachment(models.Model):
 # For now, assuming it's correctly placed in importer/models.py based on previous context.
 # If it needs to be moved here, that's a separate refactoring.
 # The prompt does not ask to move FallbackMacro.
+
+
+@receiver(post_save, sender=Attachment)
+@receiver(post_delete, sender=Attachment)
+def attachment_bump_response_cache(sender, instance, **kwargs):
+    if not kwargs.get('raw', False):
+        response_cache.bump(f'page:{instance.page_id}')
+
+
+@receiver(post_save, sender=Tag)
+def tag_bump_response_cache(sender, instance, created, **kwargs):
+    # A renamed tag changes the representation of every page carrying it.
+    if not created and not kwargs.get('raw', False):
+        response_cache.bump(*(f'page:{pk}' for pk in instance.pages.values_list('pk', flat=True)))
+
+
+@receiver(m2m_changed, sender=Tag.pages.through)
+def tag_pages_bump_response_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Page):
+        response_cache.bump(f'page:{instance.pk}')
+    elif action == 'pre_clear':
+        response_cache.bump(*(f'page:{pk}' for pk in instance.pages.values_list('pk', flat=True)))
+    else:
+        response_cache.bump(*(f'page:{pk}' for pk in pk_set or ()))
@@ -0,0 +1,192 @@
+"""
+Server-side rendering of ProseMirror documents (Page.content_json / PageVersion.content_json)
+to HTML and plain text.
+
+Node names are accepted in both the importer's snake_case form ('bullet_list') and the
+editor's camelCase form ('bulletList'). Unknown nodes are rendered as their children so
+new node types degrade gracefully instead of dropping content.
+"""
+from html import escape
+import re
+
+# Bump when the rendering output changes so stale PageRender rows are recomputed.
+RENDERER_VERSION = 2
+
+_SAFE_HREF_RE = re.compile(r'^(https?:|mailto:|/|#)', re.IGNORECASE)
+
+_BLOCK_TAGS = {
+    'paragraph': 'p',
+    'blockquote': 'blockquote',
+    'bullet_list': 'ul',
+    'ordered_list': 'ol',
+    'list_item': 'li',
+    'task_list': 'ul',
+    'table': 'table',
+    'table_row': 'tr',
+    'table_header': 'th',
+    'table_cell': 'td',
+}
+
+_MARK_TAGS = {
+    'bold': 'strong',
+    'strong': 'strong',
+    'italic': 'em',
+    'em': 'em',
+    'code': 'code',
+    'underline': 'u',
+    'strike': 's',
+}
+
+# Nodes after which a line break is emitted in the plain-text rendering.
+_TEXT_BLOCK_TYPES = {
+    'paragraph', 'heading', 'code_block', 'list_item', 'task_item', 'table_row',
+    'horizontal_rule', 'image', 'fallback_macro_placeholder',
+}
+
+
+def _normalize_type(node_type):
+    """'bulletList' -> 'bullet_list'; snake_case names are returned unchanged."""
+    if not node_type:
+        return ''
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', node_type).lower()
+
+
+def _render_marks(text, marks):
+    html = escape(text)
+    # Apply marks inside-out so the first mark is the outermost tag.
+    for mark in reversed(marks or []):
+        mark_type = _normalize_type(mark.get('type'))
+        if mark_type == 'link':
+            href = (mark.get('attrs') or {}).get('href') or ''
+            if _SAFE_HREF_RE.match(href):
+                html = f'<a href="{escape(href)}">{html}</a>'
+        elif mark_type in _MARK_TAGS:
+            tag = _MARK_TAGS[mark_type]
+            html = f'<{tag}>{html}</{tag}>'
+    return html
+
+
+def _render_html_nodes(nodes, out, images):
+    for node in nodes or []:
+        if isinstance(node, dict):
+            _render_html_node(node, out, images)
+
+
+def _render_html_node(node, out, images):
+    node_type = _normalize_type(node.get('type'))
+    attrs = node.get('attrs') or {}
+    content = node.get('content')
+
+    if node_type == 'text':
+        out.append(_render_marks(node.get('text', ''), node.get('marks')))
+    elif node_type == 'doc':
+        _render_html_nodes(content, out, images)
+    elif node_type == 'heading':
+        level = attrs.get('level', 1)
+        level = level if level in (1, 2, 3, 4, 5, 6) else 1
+        out.append(f'<h{level}>')
+        _render_html_nodes(content, out, images)
+        out.append(f'</h{level}>')
+    elif node_type == 'code_block':
+        language = attrs.get('language')
+        class_attr = f' class="language-{escape(str(language))}"' if language else ''
+        out.append(f'<pre><code{class_attr}>')
+        out.append(escape(''.join(c.get('text', '') for c in content or [] if isinstance(c, dict))))
+        out.append('</code></pre>')
+    elif node_type == 'hard_break':
+        out.append('<br>')
+    elif node_type == 'horizontal_rule':
+        out.append('<hr>')
+    elif node_type == 'image':
+        src = attrs.get('src') or ''
+        variant = images.get(src)
+        if variant:
+            # Resized derivatives of an attachment: the browser picks the width it needs.
+            parts = [
+                f'src="{escape(variant["src"])}"', f'srcset="{escape(variant["srcset"])}"',
+                'sizes="(max-width: 800px) 100vw, 800px"', 'loading="lazy"',
+                f'width="{variant["width"]}"', f'height="{variant["height"]}"',
+            ]
+        else:
+            parts = [f'src="{escape(src)}"']
+        if attrs.get('alt') is not None:
+            parts.append(f'alt="{escape(str(attrs["alt"]))}"')
+        if attrs.get('title') is not None:
+            parts.append(f'title="{escape(str(attrs["title"]))}"')
+        out.append(f'<img {" ".join(parts)}>')
+    elif node_type == 'task_item':
+        checked = ' checked' if attrs.get('checked') else ''
+        out.append(f'<li><input type="checkbox" disabled{checked}> ')
+        _render_html_nodes(content, out, images)
+        out.append('</li>')
+    elif node_type == 'fallback_macro_placeholder':
+        macro_name = escape(str(attrs.get('macroName') or 'unknown'))
+        out.append(f'<div class="fallback-macro" data-macro-name="{macro_name}">[{macro_name} macro]</div>')
+    elif node_type in _BLOCK_TAGS:
+        tag = _BLOCK_TAGS[node_type]
+        attr_html = ''
+        if node_type == 'blockquote' and attrs.get('panelType'):
+            attr_html = f' data-panel-type="{escape(str(attrs["panelType"]))}"'
+        elif node_type in ('table_header', 'table_cell'):
+            for span in ('colspan', 'rowspan'):
+                if isinstance(attrs.get(span), int):
+                    attr_html += f' {span}="{attrs[span]}"'
+        out.append(f'<{tag}{attr_html}>')
+        _render_html_nodes(content, out, images)
+        out.append(f'</{tag}>')
+    else:
+        # Unknown node: keep its content.
+        _render_html_nodes(content, out, images)
+
+
+def render_html(content_json, images=None):
+    """
+    Renders a ProseMirror document to an HTML fragment. `images` optionally maps image srcs to
+    {'src', 'srcset', 'width', 'height'} of their resized derivatives (PageRender.image_variants).
+    """
+    if not isinstance(content_json, dict):
+        return ''
+    out = []
+    _render_html_node(content_json, out, images or {})
+    return ''.join(out)
+
+
+def render_plain_text(content_json):
+    """
+    Renders a ProseMirror document to plain text, one line per text block.
+    Unlike prosemirror_json_to_text (used for the search vector) this keeps block boundaries,
+    which makes it suitable for snippets and exports.
+    """
+    if not isinstance(content_json, dict):
+        return ''
+    lines = []
+    current = []
+
+    def flush():
+        line = ''.join(current).strip()
+        if line:
+            lines.append(line)
+        current.clear()
+
+    def walk(node):
+        if not isinstance(node, dict):
+            return
+        node_type = _normalize_type(node.get('type'))
+        if node_type == 'text':
+            current.append(node.get('text', ''))
+            return
+        if node_type == 'hard_break':
+            flush()
+            return
+        if node_type == 'image':
+            alt = (node.get('attrs') or {}).get('alt')
+            if alt:
+                current.append(str(alt))
+        for child in node.get('content') or []:
+            walk(child)
+        if node_type in _TEXT_BLOCK_TYPES:
+            flush()
+
+    walk(content_json)
+    flush()
+    return '\n'.join(lines)
@@ -1,14 +1,28 @@
 from rest_framework import serializers
-from .models import Page, Attachment, Tag, PageVersion # Ensure all models are imported
+from .models import Page, Attachment, Tag, PageVersion, PageRender # Ensure all models are imported
 from workspaces.models import Workspace, Space
 
+class SparseFieldsetMixin:
+    """
+    Drops every field not named in context['fields'] (a set of field names, as parsed by
+    pages.views.SparseFieldsetViewMixin from ?fields=/?omit=). Without it, all fields are kept.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('fields')
+        if selected is not None:
+            for name in list(self.fields):
+                if name not in selected:
+                    self.fields.pop(name)
+
+
 # --- Serializer for PageViewSet (CRUD operations) ---
 class TagSerializer(serializers.ModelSerializer): # Re-added from original
     class Meta:
         model = Tag
         fields = ['id', 'name']
 
-class PageSerializer(serializers.ModelSerializer): # This is for PageViewSet (CRUD)
+class PageSerializer(SparseFieldsetMixin, serializers.ModelSerializer): # This is for PageViewSet (CRUD)
     author_username = serializers.ReadOnlyField(source='author.username', allow_null=True)
     tags = TagSerializer(many=True, read_only=True) # Keep tags read-only for basic CRUD, managed by actions
     space_key = serializers.CharField(source='space.key', read_only=True, allow_null=True) # Display space key
@@ -45,6 +59,26 @@ class PageVersionSerializer(serializers.ModelSerializer): # Re-added from origin
         model = PageVersion
         fields = ['id', 'page', 'version_number', 'content_json', 'schema_version', 'author', 'author_username', 'commit_message', 'created_at']
 
+class PageRenderSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PageRender
+        fields = ['page', 'version', 'html', 'plain_text', 'rendered_at']
+        read_only_fields = fields
+
+
+class PageVersionListSerializer(serializers.ModelSerializer):
+    """
+    Metadata-only representation of a PageVersion for history listings.
+    Expects the queryset to defer 'content_json' and annotate 'content_size'.
+    """
+    author_username = serializers.ReadOnlyField(source='author.username', allow_null=True)
+    content_size = serializers.IntegerField(read_only=True, allow_null=True) # Populated by queryset annotation
+
+    class Meta:
+        model = PageVersion
+        fields = ['id', 'page', 'version_number', 'schema_version', 'author', 'author_username', 'commit_message', 'created_at', 'content_size']
+        read_only_fields = fields
+
 
 # --- Serializers for new PageDetailView (Read-only Detail) ---
 class WorkspaceRelatedField(serializers.RelatedField):
@@ -67,10 +101,20 @@ class ParentPageRelatedField(serializers.RelatedField):
 
 class AttachmentSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
+    derivative_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = Attachment
-        fields = ['id', 'original_filename', 'file_url', 'mime_type', 'created_at']
+        fields = ['id', 'original_filename', 'file_url', 'derivative_urls', 'mime_type', 'created_at']
+
+    def get_derivative_urls(self, obj):
+        """Width -> URL of each resized copy of an image attachment (core.image_derivatives)."""
+        request = self.context.get('request')
+        urls = {}
+        for key, entry in (obj.derivatives or {}).get('widths', {}).items():
+            url = obj.file.storage.url(entry['name'])
+            urls[key] = request.build_absolute_uri(url) if request else url
+        return urls
 
     def get_file_url(self, obj):
         request = self.context.get('request')
@@ -80,7 +124,7 @@ class AttachmentSerializer(serializers.ModelSerializer):
             return obj.file.url
         return None
 
-class PageDetailSerializer(serializers.ModelSerializer):
+class PageDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     workspace = WorkspaceRelatedField(read_only=True, source='space.workspace')
     space = SpaceRelatedField(read_only=True)
     parent = ParentPageRelatedField(read_only=True, allow_null=True) # Allow null for top-level pages
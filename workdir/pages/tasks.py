@@ -0,0 +1,76 @@
+from celery import shared_task
+from django.apps import apps
+
+from .rendering import RENDERER_VERSION
+
+
+@shared_task(bind=True)
+def render_page_version(self, page_id, version):
+    """
+    Renders the current content of a page into PageRender and drops this page's renders
+    produced by an older renderer. Renders of older page versions stay valid (versions are immutable).
+    """
+    Page = apps.get_model('pages', 'Page')
+    PageRender = apps.get_model('pages', 'PageRender')
+    page = Page.objects.filter(pk=page_id).only('id', 'version', 'content_json').first()
+    if page is None:
+        print(f"[Celery Task] render_page_version: page {page_id} no longer exists.")
+        return
+    if page.version != version:
+        # A newer save already scheduled its own render.
+        return
+    PageRender.render_and_store(page.pk, page.version, page.content_json)
+    PageRender.objects.filter(page_id=page.pk).exclude(renderer_version=RENDERER_VERSION).delete()
+    return f"Rendered page {page_id} v{version}."
+
+
+@shared_task(bind=True)
+def render_pages(self, page_ids):
+    """
+    Renders the current version of each page, for bulk writers that saved pages inside
+    pages.models.deferred_page_renders() (one task per batch instead of one per page).
+    """
+    Page = apps.get_model('pages', 'Page')
+    PageRender = apps.get_model('pages', 'PageRender')
+    rendered = 0
+    for page in Page.objects.filter(pk__in=page_ids).only('id', 'version', 'content_json').iterator():
+        PageRender.render_and_store(page.pk, page.version, page.content_json)
+        rendered += 1
+    PageRender.objects.filter(page_id__in=page_ids).exclude(renderer_version=RENDERER_VERSION).delete()
+    return f"Rendered {rendered} of {len(page_ids)} pages."
+
+
+@shared_task(bind=True)
+def generate_page_attachment_derivatives(self, attachment_ids):
+    """
+    Generates resized derivatives for imported image attachments (pages.Attachment), then
+    re-renders the affected pages so their stored HTML references the smaller images.
+    Imported files come from user-supplied exports and have no scan_status, so each one is
+    scanned here first (attachments.scanning); only clean files reach the image decoder.
+    """
+    from attachments.scanning import get_scanner
+    from core import response_cache
+    from core.image_derivatives import build_for_queryset
+
+    Attachment = apps.get_model('pages', 'Attachment')
+    Page = apps.get_model('pages', 'Page')
+    scanner = get_scanner()
+    clean_ids = []
+    for attachment in Attachment.objects.filter(pk__in=attachment_ids).only('id', 'file'):
+        try:
+            with attachment.file.open('rb') as fh:
+                result = scanner.scan(fh)
+        except Exception as e:
+            print(f"[Celery Task] Could not scan imported attachment {attachment.pk}: {e}")
+            continue
+        if result.verdict == 'clean':
+            clean_ids.append(attachment.pk)
+        else:
+            print(f"[Celery Task] Imported attachment {attachment.pk} scan verdict '{result.verdict}', no derivatives: {result.detail}")
+    updated = build_for_queryset(Attachment.objects.filter(pk__in=clean_ids))
+    page_ids = {attachment.page_id for attachment in updated}
+    if page_ids:
+        response_cache.bump(*(f'page:{page_id}' for page_id in page_ids)) # bulk_update sends no signals
+        for page_id, version in Page.objects.filter(pk__in=page_ids).values_list('pk', 'version'):
+            render_page_version.delay(page_id, version)
+    return f"Generated derivatives for {len(updated)} of {len(attachment_ids)} attachments."
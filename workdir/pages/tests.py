@@ -249,3 +249,507 @@ class PageDetailViewTests(APITestCase):
         url = reverse('pages:page-detail', kwargs={'slug': 'non-existent-slug-blah'})
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
+
+class PageVersionHistoryViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from pages.models import PageVersion
+        cls.user = get_user_model().objects.create_user(username='page_history_user', password='password')
+        cls.workspace = Workspace.objects.create(name="History Test WS", owner=cls.user)
+        cls.space = Space.objects.create(name="History Test Space", key="HTS", workspace=cls.workspace, owner=cls.user)
+        cls.page = Page.objects.create(title="History Page", space=cls.space, author=cls.user)
+        cls.v1_content = {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "First"}]}]}
+        cls.v2_content = {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "Second"}]}]}
+        cls.v1 = PageVersion.objects.create(page=cls.page, version_number=1, content_json=cls.v1_content, author=cls.user)
+        cls.v2 = PageVersion.objects.create(page=cls.page, version_number=2, content_json=cls.v2_content, author=cls.user)
+
+    def test_version_list_omits_content_json(self):
+        response = self.client.get(reverse('pageversion-list'), {'page': self.page.pk})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([v['version_number'] for v in results], [2, 1])
+        for version_data in results:
+            self.assertNotIn('content_json', version_data)
+            self.assertIn('content_size', version_data)
+            self.assertEqual(version_data['author_username'], self.user.username)
+
+    def test_version_retrieve_includes_content_json(self):
+        response = self.client.get(reverse('pageversion-detail', kwargs={'pk': self.v1.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content_json'], self.v1_content)
+
+    def test_version_diff(self):
+        response = self.client.get(reverse('pageversion-diff'), {'page': self.page.pk, 'from': 1, 'to': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stats']['modify'], 1)
+        modify_op = response.data['operations'][0]
+        self.assertEqual(modify_op['op'], 'modify')
+        self.assertEqual(modify_op['text_changes'], [{'op': 'delete', 'text': 'First'}, {'op': 'insert', 'text': 'Second'}])
+
+    def test_version_diff_missing_version(self):
+        response = self.client.get(reverse('pageversion-diff'), {'page': self.page.pk, 'from': 1, 'to': 9})
+        self.assertEqual(response.status_code, 404)
+
+
+class PageDiffTests(TestCase):
+    def _doc(self, *blocks):
+        return {"type": "doc", "content": list(blocks)}
+
+    def _para(self, text):
+        return {"type": "paragraph", "content": [{"type": "text", "text": text}]}
+
+    def test_identical_documents_collapse_to_one_equal_run(self):
+        from pages.diff import diff_documents
+        doc = self._doc(self._para("a"), self._para("b"), self._para("c"))
+        result = diff_documents(doc, doc)
+        self.assertEqual(result['operations'], [{'op': 'equal', 'old_index': 0, 'new_index': 0, 'count': 3}])
+
+    def test_insert_delete_and_modify(self):
+        from pages.diff import diff_documents
+        old = self._doc(self._para("intro"), self._para("one two three"), self._para("removed"), self._para("outro"))
+        new = self._doc(self._para("intro"), {"type": "heading", "content": [{"type": "text", "text": "New"}]}, self._para("one 2 three"), self._para("outro"))
+        result = diff_documents(old, new)
+        self.assertEqual(result['stats'], {'equal': 2, 'insert': 1, 'delete': 1, 'modify': 1})
+        modify_op = next(op for op in result['operations'] if op['op'] == 'modify')
+        self.assertEqual((modify_op['old_index'], modify_op['new_index']), (1, 2))
+
+    def test_moved_block_is_anchored(self):
+        from pages.diff import diff_documents
+        old = self._doc(self._para("a"), self._para("b"), self._para("c"), self._para("d"))
+        new = self._doc(self._para("b"), self._para("c"), self._para("d"), self._para("a"))
+        result = diff_documents(old, new)
+        self.assertEqual(result['stats'], {'equal': 3, 'insert': 1, 'delete': 1, 'modify': 0})
+
+    def test_word_level_text_diff(self):
+        from pages.diff import diff_text
+        self.assertEqual(diff_text("the quick fox", "the slow fox"), [
+            {'op': 'equal', 'text': 'the '}, {'op': 'delete', 'text': 'quick'},
+            {'op': 'insert', 'text': 'slow'}, {'op': 'equal', 'text': ' fox'},
+        ])
+
+
+class PageRenderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from pages.models import PageVersion
+        cls.user = get_user_model().objects.create_user(username='page_render_user', password='password')
+        cls.workspace = Workspace.objects.create(name="Render Test WS", owner=cls.user)
+        cls.space = Space.objects.create(name="Render Test Space", key="RTS", workspace=cls.workspace, owner=cls.user)
+        cls.v1_content = {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "Old"}]}]}
+        cls.page = Page.objects.create(
+            title="Render Page", space=cls.space, author=cls.user, version=2,
+            content_json={"type": "doc", "content": [
+                {"type": "heading", "attrs": {"level": 2}, "content": [{"type": "text", "text": "Title <1>"}]},
+                {"type": "paragraph", "content": [{"type": "text", "text": "bold", "marks": [{"type": "bold"}]}, {"type": "text", "text": " text"}]},
+            ]},
+        )
+        PageVersion.objects.create(page=cls.page, version_number=1, content_json=cls.v1_content, author=cls.user)
+
+    def test_render_html_and_plain_text(self):
+        from pages.rendering import render_html, render_plain_text
+        self.assertEqual(render_html(self.page.content_json), '<h2>Title &lt;1&gt;</h2><p><strong>bold</strong> text</p>')
+        self.assertEqual(render_plain_text(self.page.content_json), 'Title <1>\nbold text')
+
+    def test_render_html_drops_unsafe_links(self):
+        from pages.rendering import render_html
+        doc = {"type": "doc", "content": [{"type": "paragraph", "content": [
+            {"type": "text", "text": "x", "marks": [{"type": "link", "attrs": {"href": "javascript:alert(1)"}}]}]}]}
+        self.assertEqual(render_html(doc), '<p>x</p>')
+
+    def test_get_for_page_renders_lazily_and_reuses_row(self):
+        from pages.models import PageRender
+        render = PageRender.get_for_page(self.page)
+        self.assertEqual(render.version, 2)
+        self.assertIn('<strong>bold</strong>', render.html)
+        self.assertEqual(PageRender.get_for_page(self.page).pk, render.pk)
+
+    def test_get_for_page_historical_version(self):
+        from pages.models import PageRender
+        self.assertEqual(PageRender.get_for_page(self.page, 1).plain_text, 'Old')
+        self.assertIsNone(PageRender.get_for_page(self.page, 5))
+
+    def test_render_task_stores_current_version(self):
+        from pages.models import PageRender
+        from pages.tasks import render_page_version
+        render_page_version(self.page.pk, self.page.version)
+        self.assertTrue(PageRender.objects.filter(page=self.page, version=2).exists())
+        render_page_version(self.page.pk, 1) # Stale request is ignored
+        self.assertFalse(PageRender.objects.filter(page=self.page, version=1).exists())
+
+    def test_deferred_page_renders_skip_per_save_task(self):
+        from unittest import mock
+        from pages.models import PageRender, deferred_page_renders
+        from pages.tasks import render_pages
+        with override_settings(CC_PAGE_RENDER_ON_SAVE=True), mock.patch('pages.tasks.render_page_version.delay') as mock_delay:
+            with self.captureOnCommitCallbacks(execute=True), deferred_page_renders():
+                Page.objects.filter(pk=self.page.pk).first().save()
+        mock_delay.assert_not_called()
+        render_pages([self.page.pk])
+        self.assertTrue(PageRender.objects.filter(page=self.page, version=2).exists())
+
+    def test_imported_images_are_scanned_before_derivatives(self):
+        from unittest import mock
+        from attachments.scanning import EICAR_SIGNATURE
+        from pages.models import Attachment as PageAttachment
+        from pages.tasks import generate_page_attachment_derivatives
+        clean = PageAttachment.objects.create(page=self.page, original_filename='ok.png', mime_type='image/png', file=SimpleUploadedFile('ok.png', b'png'))
+        infected = PageAttachment.objects.create(page=self.page, original_filename='bad.png', mime_type='image/png', file=SimpleUploadedFile('bad.png', EICAR_SIGNATURE))
+        for attachment in (clean, infected):
+            self.addCleanup(attachment.file.delete, save=False)
+        with mock.patch('core.image_derivatives.build_for_queryset', return_value=[]) as mock_build:
+            generate_page_attachment_derivatives([clean.pk, infected.pk])
+        self.assertEqual(list(mock_build.call_args.args[0].values_list('pk', flat=True)), [clean.pk])
+
+    def test_images_with_derivatives_get_srcset(self):
+        from pages.models import Attachment as PageAttachment, PageRender
+        attachment = PageAttachment.objects.create(
+            page=self.page, original_filename='shot.png', mime_type='image/png',
+            file=SimpleUploadedFile('shot.png', b'png'),
+            derivatives={'version': 'v1', 'source_width': 2000, 'source_height': 1000, 'format': 'webp',
+                         'widths': {'800': {'name': 'page_attachments/shot.w800.webp', 'width': 800, 'height': 400, 'size': 1}}},
+        )
+        self.addCleanup(attachment.file.delete, save=False)
+        content = {"type": "doc", "content": [{"type": "image", "attrs": {"src": attachment.file.url, "alt": "Shot"}}]}
+        html = PageRender.render_and_store(self.page.pk, 3, content).html
+        self.assertIn('src="/media/page_attachments/shot.w800.webp"', html)
+        self.assertIn(f'srcset="/media/page_attachments/shot.w800.webp 800w, {attachment.file.url} 2000w"', html)
+        self.assertIn('width="800" height="400"', html)
+
+
+class PageListPermissionFilterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import Group
+        from guardian.shortcuts import assign_perm
+        cls.owner = get_user_model().objects.create_user(username='perm_filter_owner', password='password')
+        cls.reader = get_user_model().objects.create_user(username='perm_filter_reader', password='password')
+        cls.workspace = Workspace.objects.create(name="Perm Filter WS", owner=cls.owner)
+        cls.space = Space.objects.create(name="Perm Filter Space", key="PFS", workspace=cls.workspace, owner=cls.owner)
+        cls.direct_page = Page.objects.create(title="Direct Grant", space=cls.space, author=cls.owner)
+        cls.group_page = Page.objects.create(title="Group Grant", space=cls.space, author=cls.owner)
+        cls.hidden_page = Page.objects.create(title="Hidden", space=cls.space, author=cls.owner)
+        group = Group.objects.create(name='perm-filter-readers')
+        cls.reader.groups.add(group)
+        assign_perm('pages.view_page', cls.reader, cls.direct_page)
+        assign_perm('pages.view_page', group, cls.group_page)
+
+    def test_filter_returns_user_and_group_grants_only(self):
+        from core.permissions import filter_queryset_by_object_permission
+        visible = filter_queryset_by_object_permission(Page.objects.all(), self.reader, 'pages.view_page')
+        self.assertEqual(set(visible), {self.direct_page, self.group_page})
+
+    def test_filter_is_a_single_query(self):
+        from core.permissions import filter_queryset_by_object_permission
+        reader = get_user_model().objects.get(pk=self.reader.pk)
+        reader.has_perm('pages.view_page') # Warm the global permission cache
+        queryset = filter_queryset_by_object_permission(Page.objects.all(), reader, 'pages.view_page')
+        with self.assertNumQueries(1):
+            list(queryset)
+
+    def test_superuser_sees_everything(self):
+        from core.permissions import filter_queryset_by_object_permission
+        admin = get_user_model().objects.create_superuser(username='perm_filter_admin', password='password')
+        self.assertEqual(filter_queryset_by_object_permission(Page.objects.all(), admin, 'pages.view_page').count(), 3)
+
+    def test_page_list_endpoint_is_filtered(self):
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get('/api/v1/pages/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual({p['id'] for p in results}, {self.direct_page.id, self.group_page.id})
+
+
+class PageSpacePermissionInheritanceTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import Group
+        from guardian.shortcuts import assign_perm
+        cls.owner = get_user_model().objects.create_user(username='inherit_owner', password='password')
+        cls.editor = get_user_model().objects.create_user(username='inherit_editor', password='password')
+        cls.viewer = get_user_model().objects.create_user(username='inherit_viewer', password='password')
+        cls.workspace = Workspace.objects.create(name="Inherit WS", owner=cls.owner)
+        cls.space = Space.objects.create(name="Inherit Space", key="INH", workspace=cls.workspace, owner=cls.owner)
+        cls.other_space = Space.objects.create(name="Other Space", key="OTH", workspace=cls.workspace, owner=cls.owner)
+        cls.page = Page.objects.create(title="Inherited", space=cls.space, author=cls.owner)
+        cls.other_page = Page.objects.create(title="Elsewhere", space=cls.other_space, author=cls.owner)
+        editors = Group.objects.create(name='inherit-editors')
+        cls.editor.groups.add(editors)
+        assign_perm('workspaces.edit_space_content', editors, cls.space)
+        assign_perm('workspaces.view_space', cls.viewer, cls.space)
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear() # Cached permission sets would outlive the previous test's rollback
+
+    def test_space_grants_imply_page_permissions(self):
+        editor = get_user_model().objects.get(pk=self.editor.pk)
+        viewer = get_user_model().objects.get(pk=self.viewer.pk)
+        self.assertTrue(editor.has_perm('pages.change_page', self.page))
+        self.assertFalse(editor.has_perm('pages.delete_page', self.page))
+        self.assertTrue(viewer.has_perm('pages.view_page', self.page))
+        self.assertFalse(viewer.has_perm('pages.change_page', self.page))
+        self.assertFalse(viewer.has_perm('pages.view_page', self.other_page))
+
+    def test_per_page_grant_still_applies(self):
+        from guardian.shortcuts import assign_perm
+        assign_perm('pages.view_page', self.viewer, self.other_page)
+        viewer = get_user_model().objects.get(pk=self.viewer.pk)
+        self.assertTrue(viewer.has_perm('pages.view_page', self.other_page))
+
+    def test_queryset_filter_includes_inherited_pages(self):
+        from core.permissions import filter_queryset_by_object_permission
+        self.assertEqual(list(filter_queryset_by_object_permission(Page.objects.all(), self.viewer, 'pages.view_page')), [self.page])
+        self.assertEqual(list(filter_queryset_by_object_permission(Page.objects.all(), self.editor, 'pages.change_page')), [self.page])
+        self.assertEqual(list(filter_queryset_by_object_permission(Page.objects.all(), self.viewer, 'pages.delete_page')), [])
+
+    def test_revoking_space_grant_revokes_page_access(self):
+        from guardian.shortcuts import remove_perm
+        viewer = get_user_model().objects.get(pk=self.viewer.pk)
+        self.assertTrue(viewer.has_perm('pages.view_page', self.page))
+        remove_perm('workspaces.view_space', self.viewer, self.space)
+        self.assertFalse(viewer.has_perm('pages.view_page', self.page))
+
+
+class PageConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from guardian.shortcuts import assign_perm
+        cls.user = get_user_model().objects.create_user(username='etag_user', password='password')
+        cls.workspace = Workspace.objects.create(name="ETag WS", owner=cls.user)
+        cls.space = Space.objects.create(name="ETag Space", key="ETS", workspace=cls.workspace, owner=cls.user)
+        cls.page = Page.objects.create(title="ETag Page", space=cls.space, author=cls.user, content_json={"type": "doc", "content": []})
+        assign_perm('pages.view_page', cls.user, cls.page)
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear() # Cached responses would outlive the previous test's rollback
+        self.client.force_authenticate(user=self.user)
+
+    def _get_detail_by_slug(self, **headers):
+        # PageDetailView is not routed in pages/urls.py; exercise it directly.
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from pages.views import PageDetailView
+        request = APIRequestFactory().get(f'/pages/{self.page.slug}/', **headers)
+        force_authenticate(request, user=self.user)
+        return PageDetailView.as_view()(request, slug=self.page.slug)
+
+    def test_detail_by_slug_returns_304_for_matching_etag(self):
+        first = self._get_detail_by_slug()
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+        self.assertTrue(first.has_header('Last-Modified'))
+        second = self._get_detail_by_slug(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_detail_etag_changes_with_children(self):
+        etag = self._get_detail_by_slug()['ETag']
+        Page.objects.create(title="Child", space=self.space, parent=self.page, author=self.user)
+        self.assertEqual(self._get_detail_by_slug(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_etag_changes_with_parent(self):
+        parent = Page.objects.create(title="Parent", space=self.space, author=self.user)
+        Page.objects.filter(pk=self.page.pk).update(parent=parent)
+        etag = self._get_detail_by_slug()['ETag']
+        parent.title = "Parent renamed"
+        parent.save()
+        response = self._get_detail_by_slug(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['parent']['title'], "Parent renamed")
+
+    def test_viewset_retrieve_and_list_conditional(self):
+        detail_url = f'/api/v1/pages/{self.page.pk}/'
+        etag = self.client.get(detail_url)['ETag']
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Page.objects.filter(pk=self.page.pk).update(version=2)
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        list_etag = self.client.get('/api/v1/pages/')['ETag']
+        self.assertEqual(self.client.get('/api/v1/pages/', HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+
+    def test_matching_etag_does_not_bypass_permissions(self):
+        other = get_user_model().objects.create_user(username='etag_other', password='password')
+        etag = self.client.get(f'/api/v1/pages/{self.page.pk}/')['ETag']
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f'/api/v1/pages/{self.page.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404) # No view permission: DRF hides the object
+
+
+class ResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from guardian.shortcuts import assign_perm
+        cls.user = get_user_model().objects.create_user(username='rc_user', password='password')
+        cls.workspace = Workspace.objects.create(name="RC WS", owner=cls.user)
+        cls.space = Space.objects.create(name="RC Space", key="RCS", workspace=cls.workspace, owner=cls.user)
+        cls.root = Page.objects.create(title="Root", space=cls.space, author=cls.user)
+        cls.child = Page.objects.create(title="Child", space=cls.space, parent=cls.root, author=cls.user)
+        assign_perm('pages.view_page', cls.user, cls.root)
+        assign_perm('pages.view_page', cls.user, cls.child)
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def _get_detail(self, page):
+        # PageDetailView is not routed in pages/urls.py; exercise it directly.
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from pages.views import PageDetailView
+        request = APIRequestFactory().get(f'/pages/{page.slug}/')
+        force_authenticate(request, user=self.user)
+        response = PageDetailView.as_view()(request, slug=page.slug)
+        response.render()
+        return response
+
+    def test_page_detail_hit_skips_database(self):
+        from core import metrics
+        hits_before = metrics.get_value('conflu_response_cache_requests_total', endpoint='page_detail', result='hit')
+        first = self._get_detail(self.root)
+        with self.assertNumQueries(0):
+            second = self._get_detail(self.root)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(
+            metrics.get_value('conflu_response_cache_requests_total', endpoint='page_detail', result='hit'), hits_before + 1
+        )
+
+    def test_page_detail_invalidated_by_writes(self):
+        self._get_detail(self.root)
+        self.root.title = "Root renamed"
+        self.root.save()
+        self.assertEqual(self._get_detail(self.root).data['title'], "Root renamed")
+
+        # Changes to a child show up in the parent's embedded children.
+        etag = self._get_detail(self.root)['ETag']
+        Page.objects.create(title="Second child", space=self.space, parent=self.root, author=self.user)
+        self.assertNotEqual(self._get_detail(self.root)['ETag'], etag)
+
+        from core import metrics
+        self._get_detail(self.root)
+        misses_before = metrics.get_value('conflu_response_cache_requests_total', endpoint='page_detail', result='miss')
+        tag = Tag.objects.create(name='rc-tag')
+        tag.pages.add(self.root)
+        self._get_detail(self.root)
+        self.assertEqual(
+            metrics.get_value('conflu_response_cache_requests_total', endpoint='page_detail', result='miss'), misses_before + 1
+        )
+
+    def test_parent_rename_invalidates_children(self):
+        self.assertEqual(self._get_detail(self.child).data['parent']['title'], "Root")
+        root = Page.objects.get(pk=self.root.pk)
+        root.title = "Root renamed"
+        root.save()
+        self.assertEqual(self._get_detail(self.child).data['parent']['title'], "Root renamed")
+
+        self._get_detail(self.child)
+        Page.objects.get(pk=self.root.pk).delete()
+        self.assertIsNone(self._get_detail(self.child).data['parent'])
+
+    def test_move_invalidates_previous_parent_without_reading_it_back(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        other_root = Page.objects.create(title="Other root", space=self.space, author=self.user)
+        etag = self._get_detail(self.root)['ETag']
+        child = Page.objects.get(pk=self.child.pk)
+        child.parent = other_root
+        with CaptureQueriesContext(connection) as queries:
+            child.save()
+        self.assertFalse(any(query['sql'].startswith('SELECT "pages_page"."parent_id"') for query in queries))
+        self.assertNotEqual(self._get_detail(self.root)['ETag'], etag) # Old parent no longer lists the child
+
+        etag = self._get_detail(other_root)['ETag']
+        child.parent = self.root
+        child.save() # Second move from the same instance: the previous parent is other_root
+        self.assertNotEqual(self._get_detail(other_root)['ETag'], etag)
+
+    def test_page_tree_nested_filtered_and_invalidated(self):
+        from guardian.shortcuts import assign_perm
+        url = f'/api/v1/spaces/{self.space.key}/page-tree/'
+        hidden = Page.objects.create(title="Hidden", space=self.space, author=self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['pages']), 1)
+        self.assertEqual(response.data['pages'][0]['id'], self.root.pk)
+        self.assertEqual(response.data['pages'][0]['children'][0]['id'], self.child.pk)
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        # A permission grant changes what the requester may see.
+        assign_perm('pages.view_page', self.user, hidden)
+        self.assertEqual(len(self.client.get(url).data['pages']), 2)
+
+        self.child.is_deleted = True
+        self.child.save()
+        root_node = next(node for node in self.client.get(url).data['pages'] if node['id'] == self.root.pk)
+        self.assertEqual(root_node['children'], [])
+
+    def test_space_list_hit_skips_database(self):
+        first = self.client.get('/api/v1/spaces/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/v1/spaces/')
+        self.assertEqual(second.data, first.data)
+
+    def test_space_list_invalidated_by_space_change(self):
+        first = self.client.get('/api/v1/spaces/')
+        self.assertEqual(first.status_code, 200)
+        self.space.name = "RC Space renamed"
+        self.space.save()
+        names = [space['name'] for space in self.client.get('/api/v1/spaces/').data['results']]
+        self.assertIn("RC Space renamed", names)
+
+
+class PageSparseFieldsetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from guardian.shortcuts import assign_perm
+        cls.user = get_user_model().objects.create_user(username='sparse_user', password='password')
+        cls.workspace = Workspace.objects.create(name="Sparse WS", owner=cls.user)
+        cls.space = Space.objects.create(name="Sparse Space", key="SPS", workspace=cls.workspace, owner=cls.user)
+        cls.page = Page.objects.create(
+            title="Sparse Page", space=cls.space, author=cls.user,
+            content_json={"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "Body"}]}]},
+        )
+        assign_perm('pages.view_page', cls.user, cls.page)
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear() # Cached responses would outlive the previous test's rollback
+        self.client.force_authenticate(user=self.user)
+
+    def test_fields_limits_output_and_defers_columns(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/pages/', {'fields': 'id,title,space_key'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'space_key'})
+        page_selects = [q['sql'] for q in queries if 'FROM "pages_page"' in q['sql'] and 'COUNT' not in q['sql'] and 'MAX' not in q['sql']]
+        self.assertTrue(page_selects)
+        self.assertFalse(any('"content_json"' in sql for sql in page_selects))
+        self.assertFalse(any('"pages_tag"' in q['sql'] for q in queries)) # tags not requested, not prefetched
+
+    def test_omit_content_json_on_retrieve(self):
+        full = self.client.get(f'/api/v1/pages/{self.page.pk}/')
+        sparse = self.client.get(f'/api/v1/pages/{self.page.pk}/', {'omit': 'content_json'})
+        self.assertIn('content_json', full.data)
+        self.assertNotIn('content_json', sparse.data)
+        self.assertEqual(sparse.data['title'], "Sparse Page")
+        self.assertIn('tags', sparse.data)
+        self.assertNotEqual(full['ETag'], sparse['ETag'])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/v1/pages/', {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', str(response.data['fields']))
+
+    def test_detail_view_fields(self):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from pages.views import PageDetailView
+        request = APIRequestFactory().get(f'/pages/{self.page.slug}/', {'fields': 'id,title,children'})
+        force_authenticate(request, user=self.user)
+        response = PageDetailView.as_view()(request, slug=self.page.slug)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'id', 'title', 'children'})
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.db import transaction
 # from django.shortcuts import get_object_or_404 # Not directly used, but common
@@ -6,12 +8,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes, inline_serializer
 from guardian.shortcuts import assign_perm
-from .models import Page, PageVersion, Tag
+from .models import Attachment, Page, PageVersion, PageRender, Tag
+from .diff import diff_documents
 # Removed Space import, not directly used here. Workspace/Space imported in serializers.py
 
 # Updated serializer imports
-from .serializers import PageSerializer, PageVersionSerializer, TagSerializer, PageDetailSerializer
-from core.permissions import ExtendedDjangoObjectPermissionsOrAnonReadOnly
+from .serializers import PageSerializer, PageVersionSerializer, PageVersionListSerializer, PageRenderSerializer, TagSerializer, PageDetailSerializer
+from core.permissions import ExtendedDjangoObjectPermissionsOrAnonReadOnly, filter_queryset_by_object_permission
+from core.conditional import build_etag, not_modified_response, set_validators
+from core import response_cache
 
 # New imports for PageDetailView & PageSearchView
 from rest_framework.generics import RetrieveAPIView, ListAPIView
@@ -19,12 +24,91 @@ from rest_framework.permissions import IsAuthenticatedOrReadOnly
 
 # For Search
 from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank, SearchHeadline
-from django.db.models import F, Q
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum, TextField
+from django.shortcuts import get_object_or_404
+from django.db.models.functions import Cast, Length
+from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.postgres.search import TrigramSimilarity # For fuzzy matching
 from .serializers import PageSearchSerializer # Import the new search serializer
 
 
-class PageViewSet(viewsets.ModelViewSet):
+SPARSE_FIELDSET_PARAMETERS = [
+    OpenApiParameter('fields', OpenApiTypes.STR, description="Comma-separated fields to include (default: all)."),
+    OpenApiParameter('omit', OpenApiTypes.STR, description="Comma-separated fields to leave out, e.g. 'content_json'."),
+]
+# Columns every read loads regardless of the fieldset: validators, permission checks and lookups use them.
+# Relations are never deferred (they are select_related, and only an integer column each).
+SPARSE_ALWAYS_LOADED = {'id', 'slug', 'version', 'updated_at'}
+
+
+class SparseFieldsetViewMixin:
+    """
+    ?fields=a,b / ?omit=c for read actions on Page views. The selected fields are passed to the
+    serializer (SparseFieldsetMixin) and the queryset defers every Page column, and drops every
+    prefetch, that no selected field reads -- so a listing without content_json never loads it.
+    """
+    sparse_fieldset_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        """The selected serializer field names, or None if all fields are requested."""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            if getattr(self, 'action', 'retrieve') in self.sparse_fieldset_actions:
+                self._sparse_fields = _parse_sparse_fields(self.request, self.get_serializer_class())
+        return self._sparse_fields
+
+    def get_sparse_fields_token(self):
+        """Stable representation of the fieldset for ETags and cache keys."""
+        selected = self.get_sparse_fields()
+        return '*' if selected is None else ','.join(sorted(selected))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
+
+    def apply_sparse_fieldset(self, queryset):
+        if getattr(self, 'action', 'retrieve') not in self.sparse_fieldset_actions:
+            return queryset
+        # search_vector is only used by search; the select_related parent is rendered as a reference only.
+        queryset = queryset.defer('search_vector', 'parent__search_vector', 'parent__content_json')
+        selected = self.get_sparse_fields()
+        if selected is None:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        sources = {_field_source_root(serializer_class, name) for name in selected} | selected
+        deferred = [
+            field.name for field in Page._meta.concrete_fields
+            if not field.is_relation and field.name not in sources and field.name not in SPARSE_ALWAYS_LOADED
+        ]
+        prefetches = [lookup for lookup in queryset._prefetch_related_lookups if str(lookup).split('__')[0] in sources]
+        return queryset.defer(*deferred).prefetch_related(None).prefetch_related(*prefetches)
+
+
+def _parse_sparse_fields(request, serializer_class):
+    available = list(serializer_class.Meta.fields)
+    fields_param = request.query_params.get('fields', '')
+    omit_param = request.query_params.get('omit', '')
+    if not fields_param and not omit_param:
+        return None
+    requested = {name.strip() for name in fields_param.split(',') if name.strip()} if fields_param else set(available)
+    omitted = {name.strip() for name in omit_param.split(',') if name.strip()}
+    unknown = (requested | omitted) - set(available)
+    if unknown:
+        raise serializers.ValidationError({
+            'fields': f"Unknown field(s): {', '.join(sorted(unknown))}. Available: {', '.join(available)}."
+        })
+    return requested - omitted
+
+
+def _field_source_root(serializer_class, name):
+    """First model attribute a serializer field reads ('space' for source='space.key')."""
+    declared = serializer_class._declared_fields.get(name)
+    source = getattr(declared, 'source', None) or name
+    return name if source == '*' else source.split('.')[0]
+
+
+class PageViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Pages.
     Provides CRUD operations, versioning, and tagging for pages.
@@ -35,13 +119,47 @@ class PageViewSet(viewsets.ModelViewSet):
     serializer_class = PageSerializer # Use the CRUD-capable PageSerializer
     permission_classes = [ExtendedDjangoObjectPermissionsOrAnonReadOnly]
 
+    def get_queryset(self):
+        queryset = self.apply_sparse_fieldset(super().get_queryset())
+        if self.action == 'list':
+            # Detail routes check 'pages.view_page' per object; the listing applies the same rule in SQL.
+            queryset = filter_queryset_by_object_permission(queryset, self.request.user, 'pages.view_page')
+        return queryset
+
+    @extend_schema(parameters=SPARSE_FIELDSET_PARAMETERS)
+    def retrieve(self, request, *args, **kwargs):
+        # Conditional GET: validate against a metadata-only row before loading/serializing the page.
+        meta = get_object_or_404(_page_validator_queryset(), pk=kwargs[self.lookup_url_kwarg or self.lookup_field])
+        self.check_object_permissions(request, meta)
+        etag, last_modified = _page_validators(meta, 'page', self.get_sparse_fields_token())
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    @extend_schema(parameters=SPARSE_FIELDSET_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        # The list ETag covers the requester (results are permission-filtered), the query string
+        # (filters/pagination) and an aggregate over the filtered rows, computed in one query.
+        queryset = self.filter_queryset(self.get_queryset())
+        stamp = queryset.order_by().aggregate(count=Count('id'), last_modified=Max('updated_at'), versions=Sum('version'))
+        etag = build_etag('page-list', request.user.pk, request.get_full_path(), stamp['count'], stamp['versions'], stamp['last_modified'])
+        not_modified = not_modified_response(request, etag, stamp['last_modified'])
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, stamp['last_modified'])
+
     def perform_create(self, serializer):
         with transaction.atomic():
             page = serializer.save(author=self.request.user, version=1) # Slug auto-generated in model's save()
             user = self.request.user
-            assign_perm('pages.view_page', user, page)
-            assign_perm('pages.change_page', user, page)
-            assign_perm('pages.delete_page', user, page)
+            # Only grant what the author does not already inherit from the space (Page.inherited_permissions),
+            # so the object-permission table grows with spaces rather than pages.
+            for perm in ('pages.view_page', 'pages.change_page', 'pages.delete_page'):
+                if not user.has_perm(perm, page):
+                    assign_perm(perm, user, page)
 
             page_content_for_version = serializer.validated_data.get('content_json', {})
 
@@ -105,6 +223,7 @@ class PageViewSet(viewsets.ModelViewSet):
         except Tag.DoesNotExist:
             return Response({'error': f'Tag "{tag_name_or_id}" not found.'}, status=status.HTTP_404_NOT_FOUND)
         page.tags.add(tag)
+        _touch_page(page) # Tags are part of the page representation; refresh its validators
         return Response(PageSerializer(page, context={'request': request}).data, status=status.HTTP_200_OK)
 
 
@@ -129,6 +248,7 @@ class PageViewSet(viewsets.ModelViewSet):
         if not page.tags.filter(pk=tag.pk).exists():
             return Response({'error': f'Tag "{tag_pk_or_name}" is not associated with this page.'}, status=status.HTTP_400_BAD_REQUEST)
         page.tags.remove(tag)
+        _touch_page(page)
         return Response(PageSerializer(page, context={'request': request}).data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -172,11 +292,95 @@ class PageViewSet(viewsets.ModelViewSet):
         return Response(PageSerializer(page, context={'request': request}).data, status=status.HTTP_200_OK)
 
 
+    @extend_schema(
+        parameters=[OpenApiParameter(name='version', description='Optional: version number to render. Defaults to the current version.', required=False, type=OpenApiTypes.INT)],
+        responses={200: PageRenderSerializer},
+        description="Returns the server-side HTML and plain-text rendering of the page, served from the PageRender cache."
+    )
+    @action(detail=True, methods=['get'], url_path='rendered')
+    def rendered(self, request, pk=None):
+        page = self.get_object()
+        version = request.query_params.get('version')
+        if version is not None:
+            try:
+                version = int(version)
+            except ValueError:
+                return Response({'error': 'Invalid version number format.'}, status=status.HTTP_400_BAD_REQUEST)
+        render = PageRender.get_for_page(page, version)
+        if render is None:
+            return Response({'error': f'Version {version} not found for this page.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PageRenderSerializer(render).data, status=status.HTTP_200_OK)
+
+
 class PageVersionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only access to page history.
+    The list action is a metadata-only history listing (filter with '?page=<id>');
+    it never loads 'content_json'. Content is served per version by the retrieve action.
+    """
     queryset = PageVersion.objects.all().select_related('page', 'author')
     serializer_class = PageVersionSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['page']
+
+    def get_queryset(self):
+        if self.action == 'list':
+            # History listing: skip the JSON body and the page row, report the body size instead.
+            return PageVersion.objects.all().select_related('author').defer('content_json').annotate(
+                content_size=Length(Cast('content_json', output_field=TextField()))
+            ).order_by('page_id', '-version_number')
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PageVersionListSerializer
+        return super().get_serializer_class()
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='page', description='ID of the page whose versions are compared.', required=True, type=OpenApiTypes.INT),
+            OpenApiParameter(name='from', description='Base version number.', required=True, type=OpenApiTypes.INT),
+            OpenApiParameter(name='to', description='Target version number.', required=True, type=OpenApiTypes.INT),
+        ],
+        description="Returns a structural (block and word level) diff between two versions of the same page."
+    )
+    @action(detail=False, methods=['get'], url_path='diff')
+    def diff(self, request):
+        try:
+            page_id = int(request.query_params.get('page', ''))
+            from_number = int(request.query_params.get('from', ''))
+            to_number = int(request.query_params.get('to', ''))
+        except ValueError:
+            return Response({'error': "Query parameters 'page', 'from' and 'to' must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Resolve the version numbers to PKs first; the content is only loaded on a cache miss.
+        version_pks = dict(
+            PageVersion.objects.filter(page_id=page_id, version_number__in=[from_number, to_number]).values_list('version_number', 'id')
+        )
+        missing = [n for n in (from_number, to_number) if n not in version_pks]
+        if missing:
+            return Response({'error': f'Version(s) {missing} not found for page {page_id}.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Versions are immutable, so a diff for a (from, to) pair never goes stale.
+        cache_key = f'page_version_diff:{version_pks[from_number]}:{version_pks[to_number]}'
+        result = cache.get(cache_key)
+        if result is None:
+            contents = dict(
+                PageVersion.objects.filter(pk__in=version_pks.values()).values_list('id', 'content_json')
+            )
+            result = diff_documents(contents[version_pks[from_number]], contents[version_pks[to_number]])
+            cache.set(cache_key, result, timeout=settings.CC_PAGE_DIFF_CACHE_TIMEOUT)
+
+        return Response({
+            'page': page_id,
+            'from_version': from_number,
+            'to_version': to_number,
+            **result,
+        }, status=status.HTTP_200_OK)
+
+
 class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -184,7 +388,7 @@ class TagViewSet(viewsets.ModelViewSet):
 
 
 # --- New PageDetailView ---
-class PageDetailView(RetrieveAPIView):
+class PageDetailView(SparseFieldsetViewMixin, RetrieveAPIView):
     """
     API view to retrieve a single Page instance with detailed nested data.
     """
@@ -197,6 +401,89 @@ class PageDetailView(RetrieveAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug' # Changed from 'pk' to 'slug'
 
+    def get_queryset(self):
+        return self.apply_sparse_fieldset(super().get_queryset())
+
+    @extend_schema(parameters=SPARSE_FIELDSET_PARAMETERS)
+    def retrieve(self, request, *args, **kwargs):
+        slug = kwargs[self.lookup_field]
+        fields_token = self.get_sparse_fields_token()
+
+        # Response cache: the representation does not depend on the requester (read access is
+        # not object-scoped here), so a hit is served without touching the database.
+        page_pk = cache.get(_slug_cache_key(slug))
+        if page_pk is not None:
+            entry = response_cache.get_entry('page_detail', _page_detail_cache_key(page_pk, slug, fields_token))
+            if entry is not None:
+                not_modified = not_modified_response(request, entry['etag'], entry['last_modified'])
+                if not_modified is not None:
+                    return not_modified
+                return set_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
+
+        # A 304 skips the select/prefetch of space, children, attachments and tags entirely.
+        meta = get_object_or_404(_page_validator_queryset(with_detail_relations=True), slug=slug)
+        self.check_object_permissions(request, meta)
+        etag, last_modified = _page_validators(meta, 'page-detail', fields_token)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        # Versions are read before the full load, so a concurrent write makes this entry unreachable.
+        cache_key = _page_detail_cache_key(meta.pk, slug, fields_token)
+        response = super().retrieve(request, *args, **kwargs)
+        response_cache.set_entry(cache_key, {'data': response.data, 'etag': etag, 'last_modified': last_modified})
+        cache.set(_slug_cache_key(slug), meta.pk, timeout=None)
+        return set_validators(response, etag, last_modified)
+
+
+def _slug_cache_key(slug):
+    return f'respcache:page-slug:{slug}'
+
+
+def _page_detail_cache_key(page_pk, slug, fields_token):
+    # The slug is part of the key: a stale slug->pk mapping can only ever miss.
+    return response_cache.build_key('page_detail', [f'page:{page_pk}', 'spaces', 'users'], page_pk, slug, fields_token)
+
+
+def _touch_page(page):
+    page.updated_at = timezone.now()
+    Page.objects.filter(pk=page.pk).update(updated_at=page.updated_at)
+
+
+def _page_validator_queryset(with_detail_relations=False):
+    """
+    Minimal Page rows for conditional GET: the fields the ETag is built from plus what
+    permission checks need (pk, space_id). For the detail view, subquery annotations also
+    summarise the parent, children and attachments it embeds, still in a single query.
+    """
+    queryset = Page.objects.only('id', 'version', 'updated_at', 'space_id', 'slug')
+    if with_detail_relations:
+        children = Page.objects.filter(parent=OuterRef('pk')).order_by().values('parent')
+        attachments = Attachment.objects.filter(page=OuterRef('pk')).order_by().values('page')
+        queryset = queryset.annotate(
+            parent_updated_at=Subquery(Page.objects.filter(pk=OuterRef('parent_id')).values('updated_at')),
+            children_count=Subquery(children.annotate(c=Count('id')).values('c')),
+            children_updated_at=Subquery(children.annotate(m=Max('updated_at')).values('m')),
+            attachments_count=Subquery(attachments.annotate(c=Count('id')).values('c')),
+            attachments_max_id=Subquery(attachments.annotate(m=Max('id')).values('m')),
+        )
+    return queryset
+
+
+def _page_validators(meta, kind, fields_token='*'):
+    """(ETag, Last-Modified) for a page fetched with _page_validator_queryset(); sparse fieldsets get their own ETag."""
+    last_modified = meta.updated_at
+    parent_updated_at = getattr(meta, 'parent_updated_at', None)
+    children_updated_at = getattr(meta, 'children_updated_at', None)
+    for related_updated_at in (parent_updated_at, children_updated_at):
+        if related_updated_at and related_updated_at > last_modified:
+            last_modified = related_updated_at
+    etag = build_etag(
+        kind, fields_token, meta.id, meta.version, meta.updated_at.isoformat(), parent_updated_at,
+        getattr(meta, 'children_count', None), children_updated_at,
+        getattr(meta, 'attachments_count', None), getattr(meta, 'attachments_max_id', None),
+    )
+    return etag, last_modified
+
 
 # --- New PageSearchView ---
 class PageSearchView(ListAPIView):
@@ -222,6 +509,8 @@ class PageSearchView(ListAPIView):
         search_query = SearchQuery(query_string, search_type='websearch') # 'websearch' is good for multiple terms
 
         queryset = Page.objects.filter(is_deleted=False) # Exclude deleted pages
+        # Only pages the requester may view ('pages.view_page'), resolved in the same SQL query.
+        queryset = filter_queryset_by_object_permission(queryset, self.request.user, 'pages.view_page')
 
         if space_key:
             queryset = queryset.filter(space__key=space_key)
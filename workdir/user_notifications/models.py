@@ -3,6 +3,8 @@ from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 class Notification(models.Model):
     """
@@ -34,11 +36,40 @@ class Notification(models.Model):
             models.Index(fields=['recipient', 'read']),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'read' in field_names:
+            instance._counted_unread = not instance.read # What the unread counter holds for this row
+        return instance
+
     def __str__(self):
         if self.target:
             return f'{self.actor} {self.verb} {self.target} for {self.recipient.username}'
         return f'{self.actor} {self.verb} for {self.recipient.username}' # Fallback if no direct target
 
+
+# Unread badge counters (user_notifications.unread). QuerySet.update() sends no signals;
+# NotificationViewSet.mark_all_as_read adjusts the counter itself.
+@receiver(post_save, sender=Notification)
+def notification_post_save(sender, instance, created, **kwargs):
+    from . import unread # Not at module level: unread imports this module
+    was_unread = False if created else getattr(instance, '_counted_unread', None)
+    if was_unread is None:
+        return # Loaded without 'read'; the periodic reconcile catches any change
+    is_unread = not instance.read
+    if is_unread != was_unread:
+        unread.adjust(instance.recipient_id, 1 if is_unread else -1)
+    instance._counted_unread = is_unread
+
+
+@receiver(post_delete, sender=Notification)
+def notification_post_delete(sender, instance, **kwargs):
+    from . import unread
+    if getattr(instance, '_counted_unread', False):
+        unread.adjust(instance.recipient_id, -1)
+
+
 class Activity(models.Model):
     """
     Represents an action performed by a user within the system (activity stream).
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from .unread import reconcile_unread_counts
+
+
+@shared_task
+def reconcile_unread_notification_counts():
+    """Periodic (CELERY_BEAT_SCHEDULE): drops cached unread counters that drifted from the database."""
+    dropped = reconcile_unread_counts()
+    if dropped:
+        print(f"[Celery Task] Dropped {dropped} stale unread notification counter(s).")
+    return dropped
@@ -1,3 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from pages.models import Page
+from workspaces.models import Space, Workspace
+from .models import Activity, Notification
+
+User = get_user_model()
+
+
+class GenericRelationListQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='recipient', password='password')
+        cls.actors = [User.objects.create_user(username=f'actor{n}', password='password') for n in range(3)]
+        cls.workspace = Workspace.objects.create(name='Notify WS', owner=cls.user)
+        cls.space = Space.objects.create(name='Notify Space', key='NTFY', workspace=cls.workspace, owner=cls.user)
+        cls.pages = [Page.objects.create(title=f'Page {n}', space=cls.space, author=cls.user) for n in range(5)]
+        for n in range(10):
+            target = cls.space if n % 3 == 0 else cls.pages[n % 5]
+            Notification.objects.create(recipient=cls.user, verb='mentioned you in', actor=cls.actors[n % 3], target=target)
+            Activity.objects.create(actor=cls.actors[n % 3], verb='edited', target=cls.pages[n % 5], context=cls.space if n % 2 else cls.workspace)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_notification_list_loads_generic_objects_per_content_type(self):
+        url = reverse('notification-list')
+        self.client.get(url) # Warms the ContentType cache
+        # count, notifications, then actors (users) and targets (pages, spaces): one query per content type
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        results = response.data['results']
+        self.assertEqual(len(results), 10)
+        space_target = next(item['target_detail'] for item in results if item['target_detail']['type'] == 'space')
+        self.assertEqual(space_target, {'type': 'space', 'id': self.space.pk, 'str': str(self.space)})
+        self.assertEqual({item['actor_detail']['str'] for item in results}, {'actor0', 'actor1', 'actor2'})
+
+    def test_activity_list_loads_generic_objects_per_content_type(self):
+        url = reverse('activity-list')
+        self.client.get(url)
+        # count, activities with actors, pages, then spaces and workspaces for the context
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        results = response.data['results']
+        self.assertEqual(len(results), 10)
+        self.assertEqual({item['target_detail']['str'] for item in results}, {page.title for page in self.pages})
+        self.assertEqual({item['context_detail']['str'] for item in results}, {str(self.space), str(self.workspace)})
+
+
+class UnreadCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='badge_user', password='password')
+        self.other = User.objects.create_user(username='badge_other', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('notification-unread-count')
+
+    def _notify(self, recipient, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [Notification.objects.create(recipient=recipient, verb='mentioned you in') for _ in range(count)]
+
+    def _unread_count(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(self.url).data['unread_count']
+
+    def test_counter_follows_create_read_and_delete_without_queries(self):
+        notifications = self._notify(self.user, 3)
+        self._notify(self.other)
+        self.assertEqual(self._unread_count(), 3) # Miss: counted from the database, then cached
+        self._notify(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data['unread_count'], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('notification-mark-as-read', kwargs={'pk': notifications[0].pk}))
+        self.assertEqual(self._unread_count(), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('notification-detail', kwargs={'pk': notifications[1].pk}))
+            self.client.delete(reverse('notification-detail', kwargs={'pk': notifications[0].pk})) # Already read
+        self.assertEqual(self._unread_count(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('notification-mark-all-as-read'))
+        self.assertEqual(self._unread_count(), 0)
+        self.assertEqual(self.client.post(reverse('notification-list'), {'verb': 'x'}).status_code, 405)
+
+    def test_reconcile_drops_drifted_counters(self):
+        from .tasks import reconcile_unread_notification_counts
+        from .unread import get_unread_count
+        self._notify(self.user, 2)
+        self._notify(self.other, 1)
+        self.assertEqual((get_unread_count(self.user.pk), get_unread_count(self.other.pk)), (2, 1))
+        Notification.objects.filter(recipient=self.user).update(read=True) # Bypasses the signals
+
+        self.assertEqual(reconcile_unread_notification_counts(), 1)
+        self.assertEqual((get_unread_count(self.user.pk), get_unread_count(self.other.pk)), (0, 1))
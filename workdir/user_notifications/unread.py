@@ -0,0 +1,83 @@
+# user_notifications/unread.py
+"""
+Unread notification counters, one cache entry per user (Redis in deployments).
+
+The header badge reads get_unread_count(), a single cache lookup however many notifications
+the user has. On a miss the count comes from the (recipient, read) index and is cached
+without expiry. After that it is only adjusted: +1 when an unread notification is
+created, -1 when one is read or deleted (Notification signals), -N for mark-all-as-read.
+Adjustments are applied on commit, so a rolled-back write never moves a counter.
+incr/decr are atomic, so concurrent writers do not lose updates.
+
+A counter can still drift: a write can land between a miss's database count and its
+cache.add(), and queryset.update() calls outside the viewset skip the signals.
+reconcile_unread_counts() (Celery beat, CC_NOTIFICATION_UNREAD_RECONCILE_INTERVAL) drops
+every counter that disagrees with the database; the next read counts it again.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Notification
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _count_from_db(user_id):
+    return Notification.objects.filter(recipient_id=user_id, read=False).count()
+
+
+def get_unread_count(user_id):
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = _count_from_db(user_id)
+        cache.add(_key(user_id), count, timeout=None) # add(): never overwrite a counter set meanwhile
+    return max(count, 0)
+
+
+def _adjust_now(user_id, delta):
+    try:
+        cache.incr(_key(user_id), delta)
+    except ValueError:
+        pass # Not cached; the next read counts from the database
+
+
+def adjust(user_id, delta):
+    """Adds `delta` to the user's cached counter once the current transaction commits."""
+    if delta:
+        transaction.on_commit(lambda: _adjust_now(user_id, delta))
+
+
+def reconcile_unread_counts():
+    """Drops cached counters that disagree with the database; returns how many were dropped."""
+    user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+    dropped = 0
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=RECONCILE_BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) == RECONCILE_BATCH_SIZE:
+            dropped += _reconcile_batch(batch)
+            batch = []
+    if batch:
+        dropped += _reconcile_batch(batch)
+    return dropped
+
+
+def _reconcile_batch(user_ids):
+    cached = cache.get_many([_key(user_id) for user_id in user_ids])
+    if not cached:
+        return 0
+    cached_ids = [user_id for user_id in user_ids if _key(user_id) in cached]
+    counts = dict(
+        Notification.objects.filter(recipient_id__in=cached_ids, read=False)
+        .values_list('recipient_id').annotate(unread=Count('pk')).order_by()
+    )
+    stale = [_key(user_id) for user_id in cached_ids if cached[_key(user_id)] != counts.get(user_id, 0)]
+    if stale:
+        cache.delete_many(stale)
+    return len(stale)
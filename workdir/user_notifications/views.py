@@ -1,9 +1,12 @@
 
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.response import Response
+from core.generic_relations import display_prefetch
 from .models import Notification, Activity
 from .serializers import NotificationSerializer, ActivitySerializer
+from . import unread
 
 class NotificationViewSet(viewsets.ModelViewSet):
     """
@@ -16,14 +19,20 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # Users should only see their own notifications
         return Notification.objects.filter(recipient=self.request.user).select_related(
-            'recipient', 'actor_content_type', 'content_type' # Optimize GFK lookups if possible, though actor/target still separate
+            'recipient', 'actor_content_type', 'content_type'
+        ).prefetch_related(
+            display_prefetch('actor'), display_prefetch('target') # One query per content type for the whole page
         )
 
     # Prevent creating notifications directly via this API for now
     # Notifications should be created by the system in response to events.
     # Allow update for marking as read (though bulk action is better)
     # Allow destroy for user to delete notification.
-    http_method_names = ['get', 'put', 'patch', 'delete', 'head', 'options']
+    # POST is only for the mark-as-read actions below; create() refuses it.
+    http_method_names = ['get', 'post', 'put', 'patch', 'delete', 'head', 'options']
+
+    def create(self, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
 
 
     @action(detail=False, methods=['post'], url_path='mark-all-as-read')
@@ -32,8 +41,17 @@ class NotificationViewSet(viewsets.ModelViewSet):
         Marks all unread notifications for the current user as read.
         """
         updated_count = Notification.objects.filter(recipient=request.user, read=False).update(read=True)
+        unread.adjust(request.user.pk, -updated_count) # update() sends no post_save
         return Response({'status': 'all notifications marked as read', 'updated_count': updated_count})
 
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Number of unread notifications of the current user, for the header badge. Served from a
+        cached counter (user_notifications.unread), not by counting rows.
+        """
+        return Response({'unread_count': unread.get_unread_count(request.user.pk)})
+
     @action(detail=True, methods=['post'], url_path='mark-as-read')
     def mark_as_read(self, request, pk=None):
         """
@@ -65,4 +83,6 @@ class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
         # Example: return Activity.objects.filter(actor=self.request.user)
         return Activity.objects.all().select_related(
             'actor', 'target_content_type', 'context_content_type' # Optimize GFK lookups
-        ).prefetch_related('target', 'context') # Prefetch actual generic objects
+        ).prefetch_related(
+            display_prefetch('target'), display_prefetch('context') # Prefetch actual generic objects, only what str() needs
+        )
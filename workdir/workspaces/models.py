@@ -1,5 +1,9 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import response_cache
 
 class Workspace(models.Model):
     name = models.CharField(max_length=200, unique=True)
@@ -58,3 +62,13 @@ class Space(models.Model):
             ("edit_space_content", "Can add/edit pages within the space"), # More specific than generic "edit_space"
             ("admin_space", "Can administer space (manage permissions, settings)"),
         ]
+
+
+# Spaces and workspaces are embedded in page details and the space list (core.response_cache).
+@receiver(post_save, sender=Workspace)
+@receiver(post_delete, sender=Workspace)
+@receiver(post_save, sender=Space)
+@receiver(post_delete, sender=Space)
+def space_bump_response_cache(sender, instance, **kwargs):
+    if not kwargs.get('raw', False):
+        response_cache.bump('spaces')
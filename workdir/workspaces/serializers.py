@@ -111,3 +111,55 @@ class AssignGroupPermissionSerializer(AssignPermissionSerializer):
         if not Group.objects.filter(pk=value).exists():
             raise serializers.ValidationError("Group with this ID does not exist.")
         return value
+
+
+class BulkSpacePermissionSerializer(serializers.Serializer):
+    """
+    Payload for the bulk grant/revoke endpoints:
+    { "space_keys": [...], "user_ids": [...], "group_ids": [...], "permission_codenames": [...] }
+    Unlike AssignPermissionSerializer, codenames are validated strictly because the bulk
+    endpoints write guardian's tables directly.
+    """
+    space_keys = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    group_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    permission_codenames = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        help_text="List of Space permission codenames (e.g., 'view_space', 'edit_space_content')."
+    )
+
+    def validate(self, attrs):
+        from django.contrib.auth.models import Group
+        from .bulk_permissions import get_space_permissions
+
+        if not attrs['user_ids'] and not attrs['group_ids']:
+            raise serializers.ValidationError("At least one of 'user_ids' or 'group_ids' must be provided.")
+
+        codenames = set(attrs['permission_codenames'])
+        permissions = get_space_permissions(codenames)
+        unknown = codenames - {p.codename for p in permissions}
+        if unknown:
+            raise serializers.ValidationError({'permission_codenames': f"Unknown Space permission codenames: {sorted(unknown)}."})
+
+        space_keys = set(attrs['space_keys'])
+        spaces = list(Space.objects.filter(key__in=space_keys, is_deleted=False).only('id', 'key'))
+        missing_keys = space_keys - {s.key for s in spaces}
+        if missing_keys:
+            raise serializers.ValidationError({'space_keys': f"Spaces not found: {sorted(missing_keys)}."})
+
+        user_ids = set(attrs['user_ids'])
+        missing_users = user_ids - set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        if missing_users:
+            raise serializers.ValidationError({'user_ids': f"Users not found: {sorted(missing_users)}."})
+
+        group_ids = set(attrs['group_ids'])
+        missing_groups = group_ids - set(Group.objects.filter(pk__in=group_ids).values_list('pk', flat=True))
+        if missing_groups:
+            raise serializers.ValidationError({'group_ids': f"Groups not found: {sorted(missing_groups)}."})
+
+        attrs['spaces'] = spaces
+        attrs['permissions'] = permissions
+        attrs['user_ids'] = sorted(user_ids)
+        attrs['group_ids'] = sorted(group_ids)
+        return attrs
@@ -1,5 +1,6 @@
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.urls import reverse
@@ -30,6 +31,7 @@ class SpaceAPITests(APITestCase):
 
     def setUp(self):
         # Users are created in setUpTestData
+        cache.clear() # Cached responses would outlive the previous test's rollback
         self.client = APIClient()
         self.client.force_authenticate(user=self.user1)
         self.space1_data = dict(key='SPACE1', name='Space One') # Using dict()
@@ -81,3 +83,85 @@ class SpaceAPITests(APITestCase):
         self.client.force_authenticate(user=None)
         response = self.client.post(reverse('space-list'), dict(key='ANON', name='Anon Space'), format='json') # Using dict()
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED) # Expect 401 for unauthenticated POST
+
+
+class BulkSpacePermissionTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import Group
+        from guardian.shortcuts import assign_perm
+        from .models import Workspace
+        cls.admin = User.objects.create_user(username='bulk_admin', password='password123')
+        cls.members = [User.objects.create_user(username=f'bulk_member_{i}', password='password123') for i in range(3)]
+        cls.group = Group.objects.create(name='bulk-group')
+        cls.workspace = Workspace.objects.create(name='Bulk WS', owner=cls.admin)
+        cls.spaces = [Space.objects.create(key=f'BULK{i}', name=f'Bulk {i}', workspace=cls.workspace, owner=cls.admin) for i in range(3)]
+        cls.foreign_space = Space.objects.create(key='FOREIGN', name='Foreign', workspace=cls.workspace, owner=cls.admin)
+        for space in cls.spaces:
+            assign_perm('workspaces.admin_space', cls.admin, space)
+
+    def setUp(self):
+        cache.clear() # Cached permission sets would outlive the previous test's rollback
+        self.client.force_authenticate(user=self.admin)
+        self.payload = {
+            'space_keys': [s.key for s in self.spaces],
+            'user_ids': [u.pk for u in self.members],
+            'group_ids': [self.group.pk],
+            'permission_codenames': ['view_space', 'edit_space_content'],
+        }
+
+    def test_bulk_assign_and_remove(self):
+        from guardian.shortcuts import get_perms
+        response = self.client.post(reverse('workspaces:space-bulk-assign-permissions'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['grants_requested'], (3 + 1) * 3 * 2)
+        for space in self.spaces:
+            self.assertEqual(set(get_perms(self.members[0], space)), {'view_space', 'edit_space_content'})
+            self.assertEqual(set(get_perms(self.group, space)), {'view_space', 'edit_space_content'})
+
+        # Re-assigning is idempotent
+        response = self.client.post(reverse('workspaces:space-bulk-assign-permissions'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.payload['permission_codenames'] = ['edit_space_content']
+        response = self.client.post(reverse('workspaces:space-bulk-remove-permissions'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['grants_removed'], (3 + 1) * 3)
+        member = User.objects.get(pk=self.members[0].pk)
+        self.assertTrue(member.has_perm('workspaces.view_space', self.spaces[0]))
+        self.assertFalse(member.has_perm('workspaces.edit_space_content', self.spaces[0]))
+
+    def test_bulk_remove_deletes_without_loading_grants(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.post(reverse('workspaces:space-bulk-assign-permissions'), self.payload, format='json')
+        self.assertTrue(User.objects.get(pk=self.members[0].pk).has_perm('workspaces.view_space', self.spaces[1])) # Cached
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('workspaces:space-bulk-remove-permissions'), self.payload, format='json')
+        self.assertEqual(response.data['grants_removed'], (3 + 1) * 3 * 2)
+        grant_queries = [query['sql'] for query in queries if 'objectpermission"' in query['sql'].split(' WHERE ')[0]]
+        self.assertEqual([sql.split(' ')[0] for sql in grant_queries], ['DELETE', 'DELETE']) # One per principal type, no SELECT
+        self.assertFalse(User.objects.get(pk=self.members[0].pk).has_perm('workspaces.view_space', self.spaces[1]))
+
+    def test_bulk_assign_query_count_does_not_grow_with_principals(self):
+        url = reverse('workspaces:space-bulk-assign-permissions')
+        self.payload['user_ids'] = [self.members[0].pk]
+        self.client.post(url, self.payload, format='json') # Warm content type / permission caches
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(url, self.payload, format='json')
+        self.payload['user_ids'] = [u.pk for u in self.members]
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(url, self.payload, format='json')
+        self.assertEqual(len(few), len(many))
+
+    def test_requires_admin_on_every_space(self):
+        self.payload['space_keys'].append(self.foreign_space.key)
+        response = self.client.post(reverse('workspaces:space-bulk-assign-permissions'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rejects_unknown_codename(self):
+        self.payload['permission_codenames'] = ['view_space', 'fly_space']
+        response = self.client.post(reverse('workspaces:space-bulk-assign-permissions'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -6,7 +6,9 @@ from .views import (
     AssignUserSpacePermissionView,
     AssignGroupSpacePermissionView,
     RemoveUserSpacePermissionsView,
-    RemoveGroupSpacePermissionsView
+    RemoveGroupSpacePermissionsView,
+    BulkAssignSpacePermissionsView,
+    BulkRemoveSpacePermissionsView
 )
 
 app_name = 'workspaces'
@@ -15,6 +17,10 @@ router = DefaultRouter()
 router.register(r'spaces', SpaceViewSet, basename='space')
 
 urlpatterns = [
+    # Bulk permission endpoints (before the router so 'permissions' is not taken for a space key)
+    path('spaces/permissions/bulk-assign/', BulkAssignSpacePermissionsView.as_view(), name='space-bulk-assign-permissions'),
+    path('spaces/permissions/bulk-remove/', BulkRemoveSpacePermissionsView.as_view(), name='space-bulk-remove-permissions'),
+
     # Routes for SpaceViewSet (e.g., /api/v1/workspaces/spaces/, /api/v1/workspaces/spaces/{space_key}/)
     path('', include(router.urls)),
 
@@ -1,23 +1,28 @@
 
+from django.core.cache import cache
 from django.utils import timezone
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes as drf_permission_classes # Renamed to avoid clash
+from rest_framework.decorators import action, api_view, permission_classes as drf_permission_classes # Renamed to avoid clash
 from rest_framework.permissions import IsAuthenticated # For permission management views
 
 from guardian.shortcuts import assign_perm, remove_perm, get_users_with_perms, get_groups_with_perms
 from django.contrib.auth.models import User, Group # Direct import for User and Group
 from django.shortcuts import get_object_or_404
 
-from core.permissions import DjangoObjectPermissionsOrAnonReadOnly
+from core import response_cache
+from core.permissions import DjangoObjectPermissionsOrAnonReadOnly, filter_queryset_by_object_permission
+from pages.models import Page
 from .models import Space
 from .serializers import (
     SpaceSerializer,
     SpaceUserPermissionSerializer,
     SpaceGroupPermissionSerializer,
     AssignUserPermissionSerializer,
-    AssignGroupPermissionSerializer
+    AssignGroupPermissionSerializer,
+    BulkSpacePermissionSerializer
 )
+from .bulk_permissions import bulk_assign_space_permissions, bulk_remove_space_permissions, get_space_permissions
 
 
 class SpaceViewSet(viewsets.ModelViewSet):
@@ -35,6 +40,51 @@ class SpaceViewSet(viewsets.ModelViewSet):
     lookup_field = 'key'
     permission_classes = [DjangoObjectPermissionsOrAnonReadOnly]
 
+    def list(self, request, *args, **kwargs):
+        # The listing is not permission-filtered, so one cached copy per query string serves everyone.
+        cache_key = response_cache.build_key('space_list', ['spaces', 'users'], request.get_full_path())
+        data = response_cache.get_entry('space_list', cache_key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        response_cache.set_entry(cache_key, response.data)
+        return response
+
+    @action(detail=True, methods=['get'], url_path='page-tree')
+    def page_tree(self, request, key=None):
+        """
+        Nested tree of the space's pages ({id, title, slug, children}) visible to the requester.
+        Cached per space and user; any page change in the space or permission change invalidates it.
+        """
+        user = request.user
+        user_part = user.pk if user.is_authenticated else 'anon'
+        space_pk = cache.get(_space_key_cache_key(key))
+        if space_pk is not None:
+            cached = response_cache.get_entry('page_tree', _page_tree_cache_key(space_pk, key, user_part))
+            if cached is not None:
+                return Response(cached)
+
+        space = self.get_object()
+        # Versions are read before the pages are loaded, so a concurrent write makes this entry unreachable.
+        cache_key = _page_tree_cache_key(space.pk, key, user_part)
+        pages = filter_queryset_by_object_permission(
+            Page.objects.filter(space=space, is_deleted=False), user, 'pages.view_page'
+        ).order_by('title').values('id', 'title', 'slug', 'parent_id')
+
+        nodes = {}
+        for page in pages:
+            nodes[page['id']] = {'id': page['id'], 'title': page['title'], 'slug': page['slug'], 'children': [], '_parent_id': page['parent_id']}
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node.pop('_parent_id'))
+            # Pages whose parent is hidden from the requester are shown at the top level.
+            (parent['children'] if parent is not None else roots).append(node)
+
+        data = {'space': space.key, 'pages': roots}
+        response_cache.set_entry(cache_key, data)
+        cache.set(_space_key_cache_key(key), space.pk, timeout=None)
+        return Response(data)
+
     def perform_create(self, serializer):
         # Docstring for method
         """Sets the owner of the space and assigns object permissions to the owner."""
@@ -52,6 +102,16 @@ class SpaceViewSet(viewsets.ModelViewSet):
         instance.deleted_at = timezone.now()
         instance.save()
 
+def _space_key_cache_key(space_key):
+    return f'respcache:space-key:{space_key}'
+
+
+def _page_tree_cache_key(space_pk, space_key, user_part):
+    return response_cache.build_key(
+        'page_tree', [f'space-pages:{space_pk}', 'spaces'], space_pk, space_key, user_part,
+        include_permissions=True,
+    )
+
 # --- APIViews for Space Permissions Management ---
 
 class SpacePermissionBaseView(generics.GenericAPIView):
@@ -125,10 +185,11 @@ class AssignUserSpacePermissionView(SpacePermissionBaseView):
         # For now, let's assume an additive approach or that client handles removal if "set" is desired.
         # A more robust approach might be a PUT to replace all permissions.
 
-        for perm_codename in permission_codenames:
-            assign_perm(f"workspaces.{perm_codename}", user_to_assign, space) # Assuming perms are app-prefixed if not custom
-            # If codenames are exactly as in Meta (e.g. "view_space"), then "workspaces." might not be needed if model is Space
-            # assign_perm(perm_codename, user_to_assign, space) # Use this if codenames are direct
+        with bulk_permission_changes(): # One cache invalidation for the whole batch
+            for perm_codename in permission_codenames:
+                assign_perm(f"workspaces.{perm_codename}", user_to_assign, space) # Assuming perms are app-prefixed if not custom
+                # If codenames are exactly as in Meta (e.g. "view_space"), then "workspaces." might not be needed if model is Space
+                # assign_perm(perm_codename, user_to_assign, space) # Use this if codenames are direct
 
         return Response({
             "message": f"Permissions {permission_codenames} assigned to user {user_to_assign.username} for space {space.key}."
@@ -157,9 +218,10 @@ class AssignGroupSpacePermissionView(SpacePermissionBaseView):
         except Group.DoesNotExist:
             return Response({"error": f"Group with ID {group_id} not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        for perm_codename in permission_codenames:
-            assign_perm(f"workspaces.{perm_codename}", group_to_assign, space)
-            # assign_perm(perm_codename, group_to_assign, space) # if codenames are direct
+        with bulk_permission_changes(): # One cache invalidation for the whole batch
+            for perm_codename in permission_codenames:
+                assign_perm(f"workspaces.{perm_codename}", group_to_assign, space)
+                # assign_perm(perm_codename, group_to_assign, space) # if codenames are direct
 
         return Response({
             "message": f"Permissions {permission_codenames} assigned to group {group_to_assign.name} for space {space.key}."
@@ -181,21 +243,8 @@ class RemoveUserSpacePermissionsView(SpacePermissionBaseView):
         except User.DoesNotExist:
             return Response({"error": f"User with ID {user_id_to_remove} not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Get all permissions for the Space model to remove them comprehensively
-        content_type = ContentType.objects.get_for_model(Space)
-        space_permissions = Permission.objects.filter(content_type=content_type)
-
-        removed_any = False
-        for perm in space_permissions:
-            if user_to_remove.has_perm(perm.codename, space) or user_to_remove.has_perm(f"{perm.content_type.app_label}.{perm.codename}", space):
-                 # remove_perm expects codename without app_label for object perms usually
-                remove_perm(perm.codename, user_to_remove, space)
-                removed_any = True
-
-        # A more direct way if you know all possible perms:
-        # for perm_codename in ["view_space", "edit_space_content", "admin_space", "delete_space", "change_space", "add_space"]: # etc.
-        #    remove_perm(perm_codename, user_to_remove, space)
-        # This requires knowing all relevant codenames including built-ins.
+        # All direct grants of the user on this space, removed with one filtered DELETE.
+        removed_any = bulk_remove_space_permissions([space], get_space_permissions(), user_ids=[user_to_remove.pk]) > 0
 
         if removed_any:
             return Response({"message": f"All direct permissions for user {user_to_remove.username} on space {space.key} removed."}, status=status.HTTP_200_OK)
@@ -241,16 +290,70 @@ class RemoveGroupSpacePermissionsView(SpacePermissionBaseView):
         # Fetch all permissions assigned to the group for this specific space object
         obj_perms = get_perms(group_to_remove, space) # Get perms group has on object
         if obj_perms:
-            for perm_codename in list(obj_perms): # list() to avoid issues if collection changes
-                remove_perm(perm_codename, group_to_remove, space)
-                removed_any = True
+            with bulk_permission_changes(): # One cache invalidation for the whole batch
+                for perm_codename in list(obj_perms): # list() to avoid issues if collection changes
+                    remove_perm(perm_codename, group_to_remove, space)
+                    removed_any = True
 
         if removed_any:
             return Response({"message": f"All permissions for group {group_to_remove.name} on space {space.key} removed."}, status=status.HTTP_200_OK)
         else:
             return Response({"message": f"Group {group_to_remove.name} had no permissions on space {space.key} to remove."}, status=status.HTTP_200_OK)
 
+class BulkSpacePermissionBaseView(generics.GenericAPIView):
+    """Base view for the bulk grant/revoke endpoints; requires 'admin_space' on every targeted space."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = BulkSpacePermissionSerializer
+
+    def get_validated_data(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        # One query for all spaces instead of one has_perm per space.
+        administered = set(filter_queryset_by_object_permission(
+            Space.objects.filter(pk__in=[s.pk for s in data['spaces']]), request.user, 'workspaces.admin_space'
+        ).values_list('key', flat=True))
+        not_administered = sorted({s.key for s in data['spaces']} - administered)
+        if not_administered:
+            self.permission_denied(request, message=f"You do not have admin permissions for spaces: {not_administered}.")
+        return data
+
+
+class BulkAssignSpacePermissionsView(BulkSpacePermissionBaseView):
+    """
+    POST /api/v1/workspaces/spaces/permissions/bulk-assign/
+    Grants the given permissions on all given spaces to all given users and groups in one transaction.
+    Requires 'admin_space' permission on every space.
+    Payload: { "space_keys": [...], "user_ids": [...], "group_ids": [...], "permission_codenames": [...] }
+    """
+    def post(self, request, *args, **kwargs):
+        data = self.get_validated_data(request)
+        requested = bulk_assign_space_permissions(data['spaces'], data['permissions'], data['user_ids'], data['group_ids'])
+        return Response({
+            "message": f"Permissions {sorted(p.codename for p in data['permissions'])} assigned on {len(data['spaces'])} space(s).",
+            "grants_requested": requested,
+        }, status=status.HTTP_200_OK)
+
+
+class BulkRemoveSpacePermissionsView(BulkSpacePermissionBaseView):
+    """
+    POST /api/v1/workspaces/spaces/permissions/bulk-remove/
+    Revokes the given permissions on all given spaces from all given users and groups in one transaction.
+    Requires 'admin_space' permission on every space.
+    Payload: same as bulk-assign.
+    """
+    def post(self, request, *args, **kwargs):
+        data = self.get_validated_data(request)
+        removed = bulk_remove_space_permissions(data['spaces'], data['permissions'], data['user_ids'], data['group_ids'])
+        return Response({
+            "message": f"Permissions {sorted(p.codename for p in data['permissions'])} removed on {len(data['spaces'])} space(s).",
+            "grants_removed": removed,
+        }, status=status.HTTP_200_OK)
+
+
 # Need to import ContentType and Permission for the delete views if not already imported
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import Permission
 from guardian.shortcuts import get_perms # For RemoveGroupSpacePermissionsView
+from core.permission_cache import bulk_permission_changes